@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from run import benchmark, corpus
+from vat import addresscmp
+
+@benchmark('addresscmp.compare')
+def bench_compare():
+    pairs = [(e['address'], e['variant']) for e in corpus()]
+    return (lambda p: addresscmp.compare(p[0], p[1])), pairs
+
+@benchmark('addresscmp.compare[country]')
+def bench_compare_country():
+    pairs = [(e['address'], e['variant'], e['country']) for e in corpus()]
+    return (lambda p: addresscmp.compare(p[0], p[1], p[2])), pairs
+
+@benchmark('addresscmp.compare[fingerprint]')
+def bench_compare_fingerprint():
+    pairs = [(addresscmp.fingerprint(e['address'], e['country']),
+              addresscmp.fingerprint(e['variant'], e['country']))
+             for e in corpus()]
+    return (lambda p: addresscmp.compare(p[0], p[1])), pairs
+
+@benchmark('addresscmp._transliterate')
+def bench_transliterate():
+    return addresscmp._transliterate, [e['address'] for e in corpus()]
+
+@benchmark('addresscmp._tokenize')
+def bench_tokenize():
+    texts = [addresscmp._strip_punct(addresscmp._transliterate(e['address']))
+             for e in corpus()]
+    return addresscmp._tokenize, texts
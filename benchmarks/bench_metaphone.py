@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import atexit
+import os
+import tempfile
+
+from run import benchmark, corpus
+from vat import addresscmp, metaphone
+from vat.metaphone.dictionary import PhoneticDictionary, build
+from vat.metaphone.word import Word, _ascii_re
+
+def words():
+    """The distinct words in the corpus, as addresscmp would encode them."""
+    result = set()
+    for e in corpus():
+        text = addresscmp._strip_punct(addresscmp._transliterate(e['address']))
+        for tok in addresscmp._token_re.split(text):
+            if addresscmp._word_re.match(tok):
+                result.add(tok)
+    return sorted(result)
+
+@benchmark('metaphone.doublemetaphone')
+def bench_doublemetaphone():
+    return metaphone.doublemetaphone, words()
+
+@benchmark('metaphone.doublemetaphone[uncached]')
+def bench_doublemetaphone_uncached():
+    return metaphone.metaphone.DoubleMetaphone().parse, words()
+
+@benchmark('metaphone.doublemetaphone_many[x1000]')
+def bench_doublemetaphone_many():
+    vocabulary = words()
+    batch = [vocabulary[(n * 7) % len(vocabulary)] for n in range(1000)]
+    def encode(batch):
+        for codes in metaphone.doublemetaphone_many(batch):
+            pass
+    return encode, [batch]
+
+@benchmark('metaphone.Word[ascii]')
+def bench_word_ascii():
+    return Word, words()
+
+@benchmark('metaphone.Word[non-ascii]')
+def bench_word_non_ascii():
+    raw = set()
+    for e in corpus():
+        raw.update(w for w in e['address'].split() if not _ascii_re.match(w))
+    return Word, sorted(raw)
+
+@benchmark('metaphone.PhoneticDictionary.lookup')
+def bench_dictionary_lookup():
+    fd, path = tempfile.mkstemp(suffix='.dmd')
+    os.close(fd)
+    atexit.register(os.remove, path)
+    build(words(), path)
+    return PhoneticDictionary(path).lookup, words()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import atexit
+import datetime
+from decimal import Decimal as D
+import os
+import shutil
+import tempfile
+
+from run import benchmark
+from vat import member_states, memberstate, rates, sharedrates, vrws
+
+def warm_cache():
+    """A RateCache holding made-up rates for every member state, so that
+    nothing is fetched while benchmarking."""
+    cache = rates.RateCache()
+    today = datetime.date.today()
+    for n, ms in enumerate(member_states):
+        rate = D(17 + n % 10)
+        cache.rates[ms.code] = (vrws.Rates(
+            {vrws.STANDARD: [vrws.Rate(rate - 2, datetime.date(2009, 1, 1)),
+                             vrws.Rate(rate, datetime.date(2014, 1, 1))]},
+            {vrws.ESERVICES: [vrws.Rate(rate, datetime.date(2015, 1, 1))]},
+            {}), today)
+    return cache
+
+def invoice_lines(count):
+    lines = []
+    for n in range(count):
+        ms = member_states[(n * 7) % len(member_states)].code
+        kind = vrws.ESERVICES if n % 3 else vrws.STANDARD
+        lines.append((ms, kind))
+    return lines
+
+@benchmark('rates.category_rate[x10000]')
+def bench_category_rate():
+    cache = warm_cache()
+    lines = invoice_lines(10000)
+    def price(lines):
+        for ms, kind in lines:
+            if kind == vrws.STANDARD:
+                cache.standard_rate(ms)
+            else:
+                cache.category_rate(ms, kind)
+    return price, [lines]
+
+@benchmark('rates.resolve_rates[x10000]')
+def bench_resolve_rates():
+    cache = warm_cache()
+    lines = invoice_lines(10000)
+    return cache.resolve_rates, [lines]
+
+@benchmark('rates.MemberState.standard_rate')
+def bench_member_state_standard_rate():
+    memberstate._rate_cache = warm_cache()
+    return (lambda ms: ms.standard_rate), list(member_states)
+
+@benchmark('rates.RateTable.get')
+def bench_rate_table():
+    table = warm_cache().table()
+    return (lambda ms: table.get(ms)), [ms.code for ms in member_states]
+
+@benchmark('rates.SharedRates.get')
+def bench_shared_rates():
+    tmpdir = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, tmpdir)
+    path = os.path.join(tmpdir, 'rates')
+    sharedrates.publish(warm_cache(), path)
+    shared = sharedrates.SharedRates(path)
+    return (lambda ms: shared.get(ms)), [ms.code for ms in member_states]
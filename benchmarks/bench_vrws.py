@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from decimal import Decimal as D
+import io
+
+from lxml import etree
+
+from run import benchmark
+from vat import member_states, ratestore, vrws
+
+def large_response(history=20):
+    """A ratesResponse-shaped reply covering every member state, with
+    regions, categories and ``history`` years of rate changes, standing in
+    for a large recorded changesResponse."""
+    kinds = [('type', vrws.STANDARD), ('type', vrws.REDUCED),
+             ('category', vrws.ESERVICES), ('category', vrws.TELECOMS),
+             ('category', vrws.BROADCASTING)]
+    rates = []
+    for n, ms in enumerate(member_states):
+        regions = [None] + (['Region %d' % r for r in range(3)]
+                            if n % 4 == 0 else [])
+        for region in regions:
+            for element, name in kinds:
+                for year in range(2015 - history, 2015):
+                    parts = ['<memberState>%s</memberState>' % ms.code]
+                    if element == 'category':
+                        parts.append('<type>%s</type>' % vrws.STANDARD)
+                        parts.append('<category>%s</category>' % name)
+                    else:
+                        parts.append('<type>%s</type>' % name)
+                    parts.append('<value>%d.0</value>' % (15 + n % 10))
+                    parts.append('<applicationDate>%d-01-01</applicationDate>'
+                                 % year)
+                    if region is not None:
+                        parts.append('<region>%s</region>' % region)
+                    if name == vrws.REDUCED:
+                        parts.append('<detail>Foodstuffs</detail>')
+                    rates.append('<rate>%s</rate>' % ''.join(parts))
+    return ('''<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+ <soap:Body>
+  <ns2:changesResponse
+    xmlns:ns2="urn:ec.europa.eu:taxud:tic:services:VatRateWebService"
+    xmlns="urn:ec.europa.eu:taxud:tic:services:VatRateWebService:types">
+   <rates>%s</rates>
+  </ns2:changesResponse>
+ </soap:Body>
+</soap:Envelope>''' % '\n'.join(rates)).encode('utf-8')
+
+@benchmark('vrws.parse_response[large]')
+def bench_parse_response():
+    data = large_response()
+    def parse(data):
+        return vrws.parse_response(io.BytesIO(data), 'changesResponse',
+                                   by_member_state=True)
+    return parse, [data]
+
+def parse_tree(response, kind):
+    """The tree-based parser that parse_response() replaced, as a
+    baseline."""
+    ns = vrws.VRWS_NS
+    root = etree.parse(response).getroot()
+    resp = root.find('./' + vrws.SOAP_NS + 'Body/' + vrws.VRWS_NSM + kind)
+    by_ms = {}
+    for rate in resp.iter(ns + 'rate'):
+        robj = vrws.Rate(D(rate.find('./' + ns + 'value').text),
+                         vrws._parse_date(
+                             rate.find('./' + ns + 'applicationDate').text),
+                         rate.findtext('./' + ns + 'detail'))
+        ms = rate.find('./' + ns + 'memberState').text
+        result = by_ms.get(ms, None)
+        if result is None:
+            result = by_ms[ms] = vrws._new_rates()
+        vrws._add_rate(result, robj, rate.find('./' + ns + 'type').text,
+                       rate.findtext('./' + ns + 'category'),
+                       rate.findtext('./' + ns + 'region'))
+    return dict((ms, vrws._make_rates(parts)) for ms, parts in by_ms.items())
+
+@benchmark('vrws.parse_response[large, tree]')
+def bench_parse_response_tree():
+    data = large_response()
+    def parse(data):
+        return parse_tree(io.BytesIO(data), 'changesResponse')
+    return parse, [data]
+
+@benchmark('vrws.Rates[history, decode]')
+def bench_rates_history():
+    """Rebuild a multi-year rate history for every member state from its
+    stored form, as SQLiteRateStore and the snapshot loader do; the memory
+    figure is dominated by the Rate and Rates objects kept."""
+    parsed = vrws.parse_response(io.BytesIO(large_response()),
+                                 'changesResponse', by_member_state=True)
+    data = dict((ms, ratestore._encode_rates(r)) for ms, r in parsed.items())
+    def decode(data):
+        return dict((ms, ratestore._decode_rates(r)) for ms, r in data.items())
+    return decode, [data]
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Generate the synthetic address corpus used by the benchmarks.
+
+The corpus is checked in as corpus/addresses.json, so you only need to run
+this if you change it; the output is deterministic.  Every member state is
+covered, as is every script in vat.addresscmp._mappings.  Each address comes
+with a variant (abbreviated, misspelt or reordered) so that comparisons have
+something realistic to do.
+
+The corpus is written to standard output unless -o is given; to update the
+checked-in copy, run
+
+  python benchmarks/make_corpus.py -o benchmarks/corpus/addresses.json
+"""
+from __future__ import unicode_literals, print_function
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from vat import addresscmp, member_states
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'corpus',
+                           'addresses.json')
+
+# country: (script, address template, streets, (postcode, city) pairs)
+_countries = {
+    'BE': ('latin', '{street} {number}, {postcode} {city}',
+           ['Rue de la Loi', 'Avenue Louise', 'Chaussée de Wavre',
+            'Boulevard Général Jacques'],
+           [('1040', 'Etterbeek'), ('1000', 'Bruxelles'), ('4000', 'Liège')]),
+    'BG': ('ru', '{city} {postcode}, {street} {number}',
+           ['бул. Витоша', 'ул. Граф Игнатиев', 'бул. Цар Освободител',
+            'ул. Шишман'],
+           [('1000', 'София'), ('4000', 'Пловдив'), ('9000', 'Варна')]),
+    'CZ': ('cs', '{street} {number}, {postcode} {city}',
+           ['Václavské náměstí', 'Národní třída', 'Křižíkova',
+            'Dlouhá'],
+           [('110 00', 'Praha'), ('602 00', 'Brno'), ('301 00', 'Plzeň')]),
+    'DK': ('latin', '{street} {number}, {postcode} {city}',
+           ['Nørrebrogade', 'Østergade', 'Åboulevard', 'Vesterbrogade'],
+           [('2200', 'København N'), ('8000', 'Århus C'), ('5000', 'Odense C')]),
+    'DE': ('de', '{street} {number}, {postcode} {city}',
+           ['Hauptstraße', 'Königsallee', 'Schloßstraße', 'Münchener Straße'],
+           [('41061', 'Mönchengladbach'), ('80331', 'München'),
+            ('50667', 'Köln')]),
+    'EE': ('latin', '{street} {number}, {postcode} {city}',
+           ['Pärnu mnt', 'Tartu mnt', 'Rävala pst', 'Jõe'],
+           [('10141', 'Tallinn'), ('51004', 'Tartu'), ('80010', 'Pärnu')]),
+    'EL': ('el', '{street} {number}, {postcode} {city}',
+           ['Λεωφόρος Βασιλίσσης Σοφίας', 'Οδός Ερμού', 'Οδός Αθηνάς',
+            'Λεωφόρος Συγγρού'],
+           [('106 74', 'Αθήνα'), ('546 24', 'Θεσσαλονίκη'),
+            ('262 21', 'Πάτρα')]),
+    'ES': ('latin', '{street}, {number}, {postcode} {city}',
+           ['Calle de Alcalá', 'Paseo de la Castellana', 'Avenida Diagonal',
+            'Calle Mayor'],
+           [('28014', 'Madrid'), ('08019', 'Barcelona'), ('39004', 'Santander')]),
+    'FR': ('latin', '{number} {street}, {postcode} {city}',
+           ['Rue de Rivoli', 'Avenue des Champs-Élysées', 'Boulevard Saint-Germain',
+            'Rue Neuve-Saint-Pierre'],
+           [('75001', 'Paris'), ('69002', 'Lyon'), ('13001', 'Marseille')]),
+    'HR': ('cs', '{street} {number}, {postcode} {city}',
+           ['Ilica', 'Vukovarska', 'Ulica kneza Mislava', 'Šubićeva'],
+           [('10000', 'Zagreb'), ('21000', 'Split'), ('51000', 'Rijeka')]),
+    'IE': ('latin', '{number} {street}, {city} {postcode}',
+           ['Grafton Street', 'O’Connell Street', 'Harcourt Road',
+            'Sráid an Phiarsaigh'],
+           [('D02 X285', 'Dublin 2'), ('T12 R2NC', 'Cork'),
+            ('H91 E2K3', 'Galway')]),
+    'IT': ('latin', '{street} {number}, {postcode} {city}',
+           ['Via Nizza', 'Corso Vittorio Emanuele', 'Via del Corso',
+            'Piazza di Città'],
+           [('10126', 'Torino'), ('00186', 'Roma'), ('20121', 'Milano')]),
+    'CY': ('el', '{street} {number}, {postcode} {city}',
+           ['Λεωφόρος Μακαρίου', 'Οδός Λήδρας', 'Οδός Αρχιεπισκόπου Κυπριανού',
+            'Οδός Αγίου Ανδρέα'],
+           [('1065', 'Λευκωσία'), ('3036', 'Λεμεσός'), ('6021', 'Λάρνακα')]),
+    'LV': ('lv', '{street} {number}, {city}, LV-{postcode}',
+           ['Brīvības iela', 'Krišjāņa Valdemāra iela', 'Ģertrūdes iela',
+            'Elizabetes iela'],
+           [('1010', 'Rīga'), ('3001', 'Jelgava'), ('5401', 'Daugavpils')]),
+    'LT': ('lt', '{street} {number}, LT-{postcode} {city}',
+           ['Gedimino pr.', 'Šeimyniškių g.', 'Laisvės alėja',
+            'Ukmergės g.'],
+           [('01103', 'Vilnius'), ('44240', 'Kaunas'), ('92114', 'Klaipėda')]),
+    'LU': ('latin', '{number}, {street}, L-{postcode} {city}',
+           ['Boulevard Royal', 'Rue de l’Église', 'Avenue de la Liberté',
+            'Grand-Rue'],
+           [('2449', 'Luxembourg'), ('4002', 'Esch-sur-Alzette'),
+            ('9010', 'Ettelbruck')]),
+    'HU': ('latin', '{postcode} {city}, {street} {number}.',
+           ['Andrássy út', 'Váci utca', 'Üllői út', 'Szőlő utca'],
+           [('1061', 'Budapest'), ('4024', 'Debrecen'), ('6720', 'Szeged')]),
+    'MT': ('latin', '{number}, {street}, {city} {postcode}',
+           ['Triq il-Merkanti', 'Triq ir-Repubblika', 'Triq San Pawl',
+            'Triq Santa Luċija'],
+           [('VLT 1117', 'Valletta'), ('SLM 1549', 'Sliema'),
+            ('MSD 1521', 'Msida')]),
+    'NL': ('latin', '{street} {number}, {postcode} {city}',
+           ['Damrak', 'Coolsingel', 'Keizersgracht', 'Lange Voorhout'],
+           [('1012 LG', 'Amsterdam'), ('3011 AD', 'Rotterdam'),
+            ('2514 EA', 'Den Haag')]),
+    'AT': ('de', '{street} {number}, {postcode} {city}',
+           ['Donau-City Straße', 'Kärntner Straße', 'Mariahilfer Straße',
+            'Getreidegasse'],
+           [('1220', 'Wien'), ('5020', 'Salzburg'), ('8010', 'Graz')]),
+    'PL': ('pl', 'ul. {street} {number}, {postcode} {city}',
+           ['Strzegomska', 'Marszałkowska', 'Świętokrzyska', 'Żółkiewskiego'],
+           [('53-611', 'Wrocław'), ('00-624', 'Warszawa'), ('31-042', 'Kraków')]),
+    'PT': ('latin', '{street}, {number}, {postcode} {city}',
+           ['Rua Castilho', 'Avenida da Liberdade', 'Rua Augusta',
+            'Praça do Comércio'],
+           [('1269-073', 'Lisboa'), ('4000-322', 'Porto'),
+            ('3000-214', 'Coimbra')]),
+    'RO': ('ro', '{street} nr. {number}, {city} {postcode}',
+           ['Calea Victoriei', 'Bulevardul Ștefan cel Mare', 'Strada Lipscani',
+            'Șoseaua Kiseleff'],
+           [('010063', 'București'), ('400001', 'Cluj-Napoca'),
+            ('700259', 'Iași')]),
+    'SI': ('cs', '{street} {number}, {postcode} {city}',
+           ['Čopova ulica', 'Slovenska cesta', 'Trubarjeva cesta',
+            'Gosposvetska cesta'],
+           [('1000', 'Ljubljana'), ('2000', 'Maribor'), ('6000', 'Koper')]),
+    'SK': ('cs', '{street} {number}, {postcode} {city}',
+           ['Obchodná', 'Štúrova', 'Hlavná', 'Námestie SNP'],
+           [('811 06', 'Bratislava'), ('040 01', 'Košice'),
+            ('949 01', 'Nitra')]),
+    'FI': ('latin', '{street} {number}, {postcode} {city}',
+           ['Mannerheimintie', 'Hämeenkatu', 'Aleksanterinkatu',
+            'Yliopistonkatu'],
+           [('00100', 'Helsinki'), ('33100', 'Tampere'), ('20100', 'Turku')]),
+    'SE': ('latin', '{street} {number}, {postcode} {city}',
+           ['Drottninggatan', 'Kungsgatan', 'Storgatan', 'Östra Hamngatan'],
+           [('111 51', 'Stockholm'), ('411 14', 'Göteborg'),
+            ('211 22', 'Malmö')]),
+    'GB': ('latin_symbols', '{name}, {number} {street}, {city} {postcode}',
+           ['Carlton Park', 'High Street', 'Station Road', 'Church Lane'],
+           [('LE19 0AL', 'Leicester'), ('SW1A 1AA', 'London'),
+            ('M1 1AE', 'Manchester')]),
+    }
+
+# Scripts that no member state uses natively; these turn up in the addresses
+# of customers who write in their own alphabet.
+_extra = [
+    ('CY', 'tr', '{street} No:{number}, {city}',
+     ['Girne Caddesi', 'Şehit Mustafa Sokağı', 'İnönü Meydanı',
+      'Gazimağusa Yolu'],
+     [('', 'Lefkoşa'), ('', 'Gazimağusa'), ('', 'Güzelyurt')]),
+    ('PL', 'uk', 'вул. {street} {number}, {postcode} {city}',
+     ['Хрещатик', 'Лесі Українки', 'Їжакевича', 'Ґонти'],
+     [('01001', 'Київ'), ('79000', 'Львів'), ('65000', 'Одеса')]),
+    ]
+
+_names = ['Acme® Ltd', 'Widgets™ plc', 'Example© Trading', 'Santander UK plc']
+
+_abbreviations = [
+    ('Straße', 'Str.'), ('straße', 'str.'), ('Street', 'St'),
+    ('Road', 'Rd'), ('Avenue', 'Ave'), ('Boulevard', 'Bd'),
+    ('Avenida', 'Av.'), ('Calle', 'C/'), ('ulica', 'ul.'), ('iela', 'iel.'),
+    ]
+
+def _variant(rng, address):
+    """Make a plausible alternative spelling of an address."""
+    for full, short in _abbreviations:
+        if full in address and rng.random() < 0.7:
+            return address.replace(full, short, 1)
+    words = address.split()
+    n = rng.randrange(len(words))
+    word = words[n]
+    choice = rng.random()
+    if choice < 0.4 and len(word) > 3:
+        # Transpose two letters
+        i = rng.randrange(1, len(word) - 2)
+        word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    elif choice < 0.7 and len(word) > 3:
+        # Drop a letter
+        i = rng.randrange(1, len(word) - 1)
+        word = word[:i] + word[i + 1:]
+    elif len(words) > 3:
+        # Drop the word entirely
+        word = None
+    words[n:n + 1] = [word] if word else []
+    return ' '.join(words)
+
+def generate(per_country=20, seed=1):
+    rng = random.Random(seed)
+    entries = []
+    sources = [(c,) + _countries[c] for c in sorted(_countries)] + _extra
+    for country, script, template, streets, places in sources:
+        for n in range(per_country):
+            postcode, city = rng.choice(places)
+            address = template.format(street=rng.choice(streets),
+                                      number=rng.randint(1, 250),
+                                      postcode=postcode, city=city,
+                                      name=rng.choice(_names))
+            entries.append({ 'country': country,
+                             'script': script,
+                             'address': address.strip(' ,'),
+                             'variant': _variant(rng, address).strip(' ,') })
+    return { 'version': 1, 'seed': seed, 'addresses': entries }
+
+def check(corpus):
+    countries = set(e['country'] for e in corpus['addresses'])
+    missing = set(ms.code for ms in member_states) - countries
+    assert not missing, 'no addresses for %s' % ', '.join(sorted(missing))
+    scripts = set(e['script'] for e in corpus['addresses'])
+    missing = set(addresscmp._mappings) - scripts
+    assert not missing, 'no addresses in %s' % ', '.join(sorted(missing))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Generate the synthetic address corpus used by the '
+        'benchmarks.')
+    parser.add_argument('-o', '--output', default='-',
+                        help='the file to write (by default, standard '
+                        'output); use %s to update the checked-in corpus'
+                        % CORPUS_PATH)
+    parser.add_argument('--per-country', type=int, default=20,
+                        help='addresses per country (default 20)')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='random seed (default 1)')
+    args = parser.parse_args(argv)
+
+    corpus = generate(args.per_country, args.seed)
+    check(corpus)
+    data = json.dumps(corpus, ensure_ascii=False, indent=1, sort_keys=True)
+    if args.output == '-':
+        f = io.open(sys.stdout.fileno(), 'w', encoding='utf-8',
+                    closefd=False)
+    else:
+        f = io.open(args.output, 'w', encoding='utf-8')
+    with f:
+        f.write(data)
+        f.write('\n')
+    if args.output != '-':
+        print('Wrote %d addresses to %s' % (len(corpus['addresses']),
+                                            args.output))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
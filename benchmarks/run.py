@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Run the benchmarks and report (or record) the results.
+
+Usage:
+
+  python benchmarks/run.py [-k PATTERN] [--save FILE] [--baseline FILE]
+                           [--tolerance FRACTION] [--min-time SECONDS]
+
+Benchmarks live in the bench_*.py modules in this directory.  Each one is a
+function decorated with @benchmark(name) that returns a callable and a list of
+inputs; the callable is timed on each input in turn, for at least
+--min-time seconds.
+
+For each benchmark we report operations per second, the 50th and 99th
+percentile time per operation, and (where tracemalloc is available) the mean
+peak memory allocated per operation.  --save writes the results as JSON;
+--baseline compares against a previously saved file, and exits with status 1
+if anything has become slower by more than --tolerance (default 0.1, i.e.
+10%)."""
+from __future__ import unicode_literals, print_function, division
+
+import argparse
+import fnmatch
+import gc
+import glob
+import importlib
+import io
+import json
+import os
+import platform
+import sys
+
+try:
+    from time import perf_counter as _clock
+except ImportError:
+    from time import time as _clock
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, '..'))
+sys.path.insert(0, _here)
+
+_benchmarks = []
+
+def benchmark(name):
+    """Register a benchmark; the decorated function should return a tuple
+    (fn, inputs)."""
+    def decorate(setup):
+        _benchmarks.append((name, setup))
+        return setup
+    return decorate
+
+_corpus = None
+
+def corpus():
+    """Return the list of corpus entries (dictionaries with 'country',
+    'script', 'address' and 'variant' keys)."""
+    global _corpus
+    if _corpus is None:
+        path = os.path.join(_here, 'corpus', 'addresses.json')
+        with io.open(path, 'r', encoding='utf-8') as f:
+            _corpus = json.load(f)['addresses']
+    return _corpus
+
+def _percentile(sorted_times, fraction):
+    n = min(len(sorted_times) - 1, int(len(sorted_times) * fraction))
+    return sorted_times[n]
+
+def _allocations(fn, inputs):
+    if tracemalloc is None or not hasattr(tracemalloc, 'reset_peak'):
+        return None
+    total = 0
+    tracemalloc.start()
+    try:
+        for arg in inputs:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(arg)
+            total += tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return total / len(inputs)
+
+def measure(fn, inputs, min_time=1.0):
+    # Warm up (and fill any caches the code under test keeps, as they
+    # would be in a long-running process)
+    for arg in inputs:
+        fn(arg)
+
+    times = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = _clock()
+        while True:
+            for arg in inputs:
+                t0 = _clock()
+                fn(arg)
+                times.append(_clock() - t0)
+            elapsed = _clock() - start
+            if elapsed >= min_time:
+                break
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    times.sort()
+    return {
+        'ops': len(times),
+        'ops_per_sec': len(times) / sum(times),
+        'p50_us': _percentile(times, 0.5) * 1e6,
+        'p99_us': _percentile(times, 0.99) * 1e6,
+        'alloc_bytes_per_op': _allocations(fn, inputs),
+        }
+
+def load():
+    for path in sorted(glob.glob(os.path.join(_here, 'bench_*.py'))):
+        importlib.import_module(os.path.splitext(os.path.basename(path))[0])
+
+def run(pattern='*', min_time=1.0, out=sys.stdout):
+    results = {}
+    for name, setup in _benchmarks:
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        fn, inputs = setup()
+        result = measure(fn, inputs, min_time)
+        results[name] = result
+        alloc = result['alloc_bytes_per_op']
+        out.write('%-40s %12.0f ops/s  p50 %9.2fus  p99 %9.2fus  %s\n'
+                  % (name, result['ops_per_sec'], result['p50_us'],
+                     result['p99_us'],
+                     '-' if alloc is None else '%.0f B/op' % alloc))
+        out.flush()
+    return {
+        'version': 1,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'benchmarks': results,
+        }
+
+def compare(results, baseline, tolerance, out=sys.stdout):
+    """Compare results against a baseline, returning the names of any
+    benchmarks that have regressed."""
+    regressions = []
+    for name, result in sorted(results['benchmarks'].items()):
+        base = baseline['benchmarks'].get(name, None)
+        if base is None:
+            continue
+        ratio = result['ops_per_sec'] / base['ops_per_sec']
+        flag = ''
+        if ratio < 1.0 - tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        out.write('%-40s %6.2fx baseline%s\n' % (name, ratio, flag))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the vat benchmarks.')
+    parser.add_argument('-k', dest='pattern', default='*',
+                        help='only run benchmarks matching this glob')
+    parser.add_argument('--min-time', type=float, default=1.0,
+                        help='minimum time to spend on each benchmark')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='permitted slowdown relative to the baseline')
+    args = parser.parse_args(argv)
+
+    load()
+    results = run(args.pattern, args.min_time)
+
+    if args.save:
+        with io.open(args.save, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(results, indent=1, sort_keys=True))
+            f.write('\n')
+
+    if args.baseline:
+        with io.open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    # The bench_* modules import us as "run"; make sure they get this copy
+    sys.modules['run'] = sys.modules[__name__]
+    sys.exit(main())
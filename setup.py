@@ -33,7 +33,7 @@ setup(
         'Topic :: Office/Business :: Financial',
         ],
     package_data = {
-        'vat': ['gb/moss/resources/*']
+        'vat': ['gb/moss/resources/*', 'resources/*']
         },
     tests_require=['pytest'],
     cmdclass={
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+from vat.metaphone import metaphone
+from vat.metaphone.dictionary import build, PhoneticDictionary
+
+
+class DictionaryTestCase(unittest.TestCase):
+    """
+    """
+    words = ["Smith", "schmidt", "STREET", "Road", "naïve", "Xavier",
+             "Smith"]
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'words.dmd')
+        self.assertEqual(build(self.words, self.path), 5)
+        self.dictionary = PhoneticDictionary(self.path)
+
+    def tearDown(self):
+        self.dictionary.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_lookup(self):
+        for word in ["SMITH", "smith", b"Schmidt", "street", "xavier"]:
+            self.assertEqual(self.dictionary.lookup(word),
+                             metaphone.DoubleMetaphone().parse(word))
+        self.assertEqual(self.dictionary.lookup("naïve"), None)
+        self.assertEqual(self.dictionary.lookup("Schmitt"), None)
+        self.assertEqual(self.dictionary.lookup(""), None)
+
+    def test_iter(self):
+        self.assertEqual([k for k, p, s in self.dictionary],
+                         ["ROAD", "SCHMIDT", "SMITH", "STREET", "XAVIER"])
+
+    def test_encoder_uses_dictionary(self):
+        metaphone.cache_clear()
+        previous = metaphone.set_dictionary(self.dictionary)
+        try:
+            # Doctor the dictionary so we can see it being used
+            self.dictionary.lookup = lambda word: ('DICT', '')
+            self.assertEqual(metaphone.doublemetaphone("Road"), ('DICT', ''))
+            self.assertEqual(list(metaphone.doublemetaphone_many(["Road"])),
+                             [('DICT', '')])
+        finally:
+            metaphone.set_dictionary(previous)
+            metaphone.cache_clear()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+from vat.metaphone import PhoneticIndex
+
+
+class PhoneticIndexTestCase(unittest.TestCase):
+    """
+    """
+    names = {
+        '1': "John Smith Ltd",
+        '2': "Jon Smyth Limited",
+        '3': "Schmidt GmbH",
+        '4': "Acme Widgets",
+    }
+
+    def setUp(self):
+        self.index = PhoneticIndex()
+        for record_id, name in self.names.items():
+            self.index.add(record_id, name)
+
+    def test_query(self):
+        results = self.index.query("JOHN SMITH")
+        self.assertEqual([r[0] for r in results[:2]], ['1', '2'])
+        self.assertEqual(results[0][1], "John Smith Ltd")
+        self.assertTrue(results[0][2] >= results[1][2] > 0)
+        self.assertEqual(self.index.query("Xylophone"), [])
+        self.assertEqual(self.index.query("Smith", limit=1)[0][0], '1')
+
+    def test_add_remove(self):
+        self.index.add('4', "Acme Gadgets")
+        self.assertEqual(self.index.name('4'), "Acme Gadgets")
+        self.assertEqual(self.index.query("Widgets"), [])
+        self.index.remove('4')
+        self.assertFalse('4' in self.index)
+        self.assertEqual(len(self.index), 3)
+        self.assertRaises(KeyError, self.index.remove, '4')
+
+    def test_max_block_size(self):
+        self.index.max_block_size = 1
+        self.assertEqual([r[0] for r in self.index.query("Smith")], [])
+        self.assertEqual([r[0] for r in self.index.query("Schmidt")], ['3'])
+        self.assertEqual([r[0] for r in self.index.query("Acme")], ['4'])
+
+    def test_save_load(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'names.idx')
+            self.index.save(path)
+            loaded = PhoneticIndex.load(path)
+            try:
+                self.assertEqual(len(loaded), 4)
+                self.assertEqual(loaded.query("John Smith"),
+                                 self.index.query("John Smith"))
+                loaded.remove('1')
+                loaded.add('5', "Smith Trading")
+                self.assertEqual([r[0] for r in loaded.query("Smith")],
+                                 ['2', '5', '3'])
+            finally:
+                loaded.close()
+        finally:
+            shutil.rmtree(tmpdir)
@@ -2,7 +2,8 @@
 from __future__ import unicode_literals
 import unittest
 
-from vat.metaphone.metaphone import doublemetaphone
+from vat.metaphone import metaphone
+from vat.metaphone.metaphone import doublemetaphone, DoubleMetaphone
 
 
 class MetaphoneTestCase(unittest.TestCase):
@@ -275,3 +276,51 @@ class MetaphoneTestCase(unittest.TestCase):
         self.assertEquals(result, ("TMS", ""))
         result = doublemetaphone("Thames")
         self.assertEquals(result, ("TMS", ""))
+
+    def test_encoder_reuse(self):
+        encoder = DoubleMetaphone()
+        self.assertEqual(encoder.parse("Xavier"), ("SF", "SFR"))
+        self.assertEqual(encoder.parse("richard"), ("RXRT", "RKRT"))
+        self.assertEqual(encoder.parse("Xavier"), ("SF", "SFR"))
+
+    def test_unknown_characters(self):
+        # Characters the algorithm doesn't know repeat the previous step
+        self.assertEqual(doublemetaphone("Ab-c"), ("APPK", ""))
+
+    def test_cache(self):
+        metaphone.cache_clear()
+        doublemetaphone("Schmidt")
+        doublemetaphone("Schmidt")
+        info = metaphone.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 1, 1))
+
+        # bytes and text are cached separately, with the same results
+        self.assertEqual(doublemetaphone("naïve".encode('utf-8')),
+                         doublemetaphone("naïve"))
+        self.assertEqual(metaphone.cache_info().currsize, 3)
+
+        metaphone.set_cache_size(2)
+        try:
+            self.assertEqual(metaphone.cache_info().currsize, 2)
+            doublemetaphone("Smith")
+            self.assertEqual(metaphone.cache_info().currsize, 2)
+            metaphone.set_cache_size(0)
+            self.assertEqual(doublemetaphone("Smith"), ("SM0", "XMT"))
+            self.assertEqual(metaphone.cache_info().currsize, 0)
+        finally:
+            metaphone.set_cache_size(4096)
+        metaphone.cache_clear()
+        self.assertEqual(metaphone.cache_info(), (0, 0, 4096, 0))
+
+    def test_many(self):
+        words = ["Smith", "Schmidt", "Smith", "naïve".encode('utf-8'),
+                 "naïve"] * 5
+        expected = [doublemetaphone(w) for w in words]
+        self.assertEqual(list(metaphone.doublemetaphone_many(words,
+                                                             chunksize=3)),
+                         expected)
+        self.assertEqual(list(metaphone.doublemetaphone_many(iter(words),
+                                                             processes=2,
+                                                             chunksize=4)),
+                         expected)
+        self.assertEqual(list(metaphone.doublemetaphone_many([])), [])
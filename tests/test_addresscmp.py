@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+from vat import addresscmp
+
+addresses = [
+    ('santander-it', 'Via Nizza 262/26 10126 Torino'),
+    ('santander-at', 'Donau-City Straße 6 1220 Wien'),
+    ('santander-pl', 'ul. Strzegomska 42c 53-611 Wrocław'),
+    ('santander-pt', 'Rue Castilho, 2 1269-073 Lisboa'),
+    ]
+
+def make_index():
+    index = addresscmp.AddressIndex()
+    for record_id, address in addresses:
+        index.add(record_id, address)
+    return index
+
+def test_index_candidates():
+    index = make_index()
+    assert len(index) == 4
+    found = index.candidates('Via Niza 262 10126 Turin')
+    assert found[0] == ('santander-it', 'Via Nizza 262/26 10126 Torino')
+    assert 'santander-pt' not in [r for r, a in found]
+
+def test_index_search():
+    index = make_index()
+    results = index.search('Donau City Strasse 6, 1220 Wien')
+    assert [r for r, s in results] == ['santander-at']
+
+def test_country_from_other_side():
+    address = 'Tax Department, B1 / F2 Carlton Park, Narborough LE19 0AL'
+    fp = addresscmp.fingerprint(address, 'GB')
+    assert addresscmp.compare(fp, address) == 1.0
+    assert addresscmp.compare(address, fp) == 1.0
+    assert addresscmp.compare(fp, 'Carlton Park LE19 0AA') == 0.0
+
+    index = addresscmp.AddressIndex()
+    index.add('hmrc', address, 'GB')
+    assert index.search(address) == [('hmrc', 1.0)]
+    assert index.search(fp) == [('hmrc', 1.0)]
+
+def test_index_remove():
+    index = make_index()
+    index.remove('santander-it')
+    assert 'santander-it' not in index
+    assert index.candidates('Via Nizza 262/26 10126 Torino') == []
+
+def test_index_save_load(tmpdir):
+    path = str(tmpdir.join('addresses.idx'))
+    make_index().save(path)
+
+    index = addresscmp.AddressIndex.load(path)
+    try:
+        assert len(index) == 4
+        assert index.address('santander-pl') == addresses[2][1]
+        assert index.candidates('Strzegomska 42c')[0][0] == 'santander-pl'
+
+        # Loaded indexes can still be modified, and saved again
+        index.remove('santander-pl')
+        index.add('santander-de', 'Santander-Platz 1 41061 Mönchengladbach')
+        assert index.candidates('Strzegomska 42c') == []
+        index.save(path)
+    finally:
+        index.close()
+
+    index = addresscmp.AddressIndex.load(path)
+    try:
+        assert len(index) == 4
+        assert 'santander-pl' not in index
+        assert index.candidates('Santander Platz 1')[0][0] == 'santander-de'
+
+        # Ids are found by binary search of the sorted id table
+        for record_id in ('santander-at', 'santander-de', 'santander-it',
+                          'santander-pt'):
+            assert record_id in index
+        for record_id in ('', 'santander-a', 'santander-zz', 'santandér'):
+            assert record_id not in index
+    finally:
+        index.close()
+    assert os.listdir(str(tmpdir)) == ['addresses.idx']
+
+def test_postcode_normalisation():
+    tokens = addresscmp._normalize('Carlton Park, LE19 0AL Leicester', 'GB')
+    assert 'LE190AL' in tokens
+    tokens = addresscmp._normalize('ul. Strzegomska 42c 53-611 Wrocław', 'PL')
+    assert addresscmp._postcode(tokens) == '53611'
+
+def test_numbers_match_exactly():
+    # Numbers that differ by one digit are different numbers
+    assert addresscmp.compare('Via Nizza 262 Torino', 'Via Nizza 263 Torino') \
+      < addresscmp.compare('Via Nizza 262 Torino', 'Via Niza 262 Torino')
+
+def test_postcode_mismatch():
+    a = 'Via Nizza 262/26 10126 Torino'
+    b = 'Via Nizza 262/26 10127 Torino'
+    assert addresscmp.compare(a, b) > 0.5
+    assert addresscmp.compare(a, b, 'IT') == 0.0
+    assert addresscmp.compare(a, a, 'IT') == 1.0
+
+def test_house_numbers_are_not_postcodes():
+    # A four or five digit number after the street may be a house number,
+    # so it doesn't contradict a postcode found on the other side
+    assert addresscmp.compare('Hauptstrasse 1234, Wien',
+                              'Hauptstrasse 1234 1010 Wien', 'AT') > 0.5
+    assert addresscmp._postcode(
+        addresscmp._normalize('Hauptstrasse 1234 1010 Wien', 'AT')) == '1010'
+    assert addresscmp.compare('Avenue Louise 1050, Bruxelles',
+                              'Avenue Louise 1050, 1000 Bruxelles', 'BE') \
+      > 0.5
+    assert addresscmp.compare('Industriestrasse 10115 Berlin',
+                              'Industriestrasse 10115, 10117 Berlin', 'DE') \
+      > 0.5
+
+    # Prefixed, leading and post-house-number forms are still recognised
+    for address, country, postcode in [
+            ('Hauptstrasse A-1010 Wien', 'AT', '1010'),
+            ('1040 Etterbeek, Rue de la Loi', 'BE', '1040'),
+            ('12 rue de Rivoli 75001 Paris', 'FR', '75001')]:
+        tokens = addresscmp._normalize(address, country)
+        assert addresscmp._postcode(tokens) == postcode
+
+def test_postcode_after_city():
+    vies = 'СОФИЯ 1000 ул. Витоша 15'
+    tokens = addresscmp._normalize(vies, 'BG')
+    assert addresscmp._postcode(tokens) == '1000'
+    assert addresscmp.compare(vies, 'София 1000, ул. Витоша 15', 'BG') == 1.0
+    assert addresscmp.compare(vies, 'София 1407, ул. Витоша 15', 'BG') == 0.0
+
+def test_dutch_postcodes_are_upper_case():
+    tokens = addresscmp._normalize('Prinsengracht 263, 1016 GV Amsterdam',
+                                   'NL')
+    assert addresscmp._postcode(tokens) == '1016GV'
+    tokens = addresscmp._normalize('Oudezijds Voorburgwal 1015 de Wallen',
+                                   'NL')
+    assert addresscmp._postcode(tokens) is None
+    assert addresscmp.compare('Oudezijds Voorburgwal 1015 de Wallen',
+                              'Oudezijds Voorburgwal 1015, 1012 EJ Amsterdam',
+                              'NL') > 0
+
+def test_fingerprint():
+    address = 'Tax Department, B1 / F2 Carlton Park, Narborough LE19 0AL'
+    fp = addresscmp.fingerprint(address, 'GB')
+    assert fp.country == 'GB'
+    assert addresscmp.compare(fp, address, 'GB') == 1.0
+    assert addresscmp.compare(fp, 'Carlton Park LE19 0AA', 'GB') == 0.0
+
+    data = fp.to_bytes()
+    assert isinstance(data, bytes)
+    copy = addresscmp.Fingerprint.from_bytes(data)
+    assert copy == fp
+    assert addresscmp._postcode(copy.tokens) == 'LE190AL'
+    assert addresscmp.compare(copy, fp) == 1.0
+
+def test_distance_cache():
+    a = 'Donau-City Straße 6 1220 Wien'
+    b = 'Donau City Strasse 6 1220 Vienna'
+    addresscmp.clear_caches()
+    addresscmp.set_distance_cache_size(0)
+    try:
+        uncached = addresscmp.compare(a, b)
+        assert not addresscmp._distance_cache
+    finally:
+        addresscmp.set_distance_cache_size(65536)
+    assert addresscmp.compare(a, b) == uncached
+    assert addresscmp._distance_cache
+    assert addresscmp.compare(a, b) == uncached
+    addresscmp.clear_caches()
+    assert not addresscmp._distance_cache
+
+def test_distance_cache_lru():
+    words = [addresscmp._metaphone(w) for w in ('Donau', 'City', 'Wien')]
+    addresscmp.clear_caches()
+    addresscmp.set_distance_cache_size(2)
+    try:
+        addresscmp._token_difference(words[0], words[1])
+        addresscmp._token_difference(words[0], words[2])
+        # Using the first pair again makes the second the oldest
+        addresscmp._token_difference(words[1], words[0])
+        addresscmp._token_difference(words[1], words[2])
+        assert len(addresscmp._distance_cache) == 2
+        keys = [frozenset(key) for key in addresscmp._distance_cache]
+        assert keys == [frozenset(words[:2]), frozenset(words[1:])]
+    finally:
+        addresscmp.set_distance_cache_size(65536)
+        addresscmp.clear_caches()
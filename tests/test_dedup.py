@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import io
+from vat import addresscmp, dedup
+
+customers = [
+    ('a', 'Via Nizza 262/26 10126 Torino'),
+    ('b', 'Via Niza 262/26, 10126 Turin'),
+    ('c', 'Donau-City Straße 6 1220 Wien'),
+    ('d', 'Donau City Strasse 6, 1220 Wien'),
+    ('e', 'Rue Castilho, 2 1269-073 Lisboa'),
+    ]
+
+def all_pairs():
+    for n, (id_a, a) in enumerate(customers):
+        for id_b, b in customers[n + 1:]:
+            yield id_a, a, id_b, b
+
+def test_score_pairs():
+    matches = list(dedup.score_pairs(all_pairs(), threshold=0.6,
+                                     processes=1, chunksize=3))
+    assert sorted((a, b) for a, b, s in matches) == [('a', 'b'), ('c', 'd')]
+
+def test_score_pairs_pool():
+    out = io.StringIO()
+    progress = dedup.Throughput(stream=out, interval=0)
+    matches = list(dedup.score_pairs(all_pairs(), threshold=0.6,
+                                     processes=2, chunksize=3,
+                                     progress=progress))
+    assert sorted((a, b) for a, b, s in matches) == [('a', 'b'), ('c', 'd')]
+    assert out.getvalue().splitlines()[-1].startswith('10 pairs scored')
+
+def test_score_blocks():
+    blocks = [customers[:2],
+              [(r, addresscmp.fingerprint(a)) for r, a in customers[2:]]]
+    matches = list(dedup.score_blocks(blocks, threshold=0.6, processes=2))
+    assert sorted((a, b) for a, b, s in matches) == [('a', 'b'), ('c', 'd')]
+
+def test_clusters():
+    groups = dedup.clusters([('a', 'b', 1.0), ('c', 'd', 0.9),
+                             ('b', 'e', 0.8)])
+    assert sorted(sorted(g) for g in groups) == [['a', 'b', 'e'], ['c', 'd']]
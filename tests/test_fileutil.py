@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+
+import pytest
+
+from vat import _fileutil
+
+def test_write_atomically(tmpdir):
+    path = str(tmpdir.join('data'))
+    _fileutil.write_atomically(path, b'old')
+    _fileutil.write_atomically(path, [b'new ', b'data'])
+    with open(path, 'rb') as f:
+        assert f.read() == b'new data'
+    assert os.listdir(str(tmpdir)) == ['data']
+
+def test_write_atomically_failure(tmpdir):
+    path = str(tmpdir.join('data'))
+    _fileutil.write_atomically(path, b'old')
+    def chunks():
+        yield b'partial'
+        raise RuntimeError('interrupted')
+    with pytest.raises(RuntimeError):
+        _fileutil.write_atomically(path, chunks())
+    with open(path, 'rb') as f:
+        assert f.read() == b'old'
+    assert os.listdir(str(tmpdir)) == ['data']
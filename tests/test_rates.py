@@ -0,0 +1,569 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import datetime
+import io
+from decimal import Decimal as D
+import threading
+import time
+
+import pytest
+
+import vat
+from vat import rates, snapshot, vrws, tic
+from vat.ratestore import SQLiteRateStore
+
+def fake_rates(rate='20.0'):
+    return vrws.Rates(
+        {vrws.STANDARD: [vrws.Rate(D(rate), datetime.date(2011, 1, 4))]},
+        {}, {})
+
+@pytest.fixture
+def no_snapshot(monkeypatch):
+    """Pretend the bundled rate snapshot is empty."""
+    monkeypatch.setattr(snapshot, '_default',
+                        snapshot.Snapshot(datetime.date(2015, 9, 1), {}))
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Replace the web services with a fake that fails for Malta and Cyprus,
+    and records each member state it is asked for."""
+    calls = []
+    lock = threading.Lock()
+    def get_rates(member_state, date=None):
+        with lock:
+            calls.append(member_state)
+        time.sleep(0.01)
+        if member_state in ('MT', 'CY'):
+            raise vrws.VRWSException('unavailable')
+        return fake_rates()
+    def tic_get_rates(member_state, date=None):
+        raise tic.TICException('unavailable')
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    monkeypatch.setattr(tic, 'get_rates', tic_get_rates)
+    return calls
+
+def test_prefetch(fetches):
+    cache = rates.RateCache()
+    progress = cache.prefetch(max_workers=4)
+    assert progress.done()
+    assert sorted(progress.failed) == ['CY', 'MT']
+    assert isinstance(progress.failed['MT'], tic.TICException)
+    assert sorted(progress.stale) == ['CY', 'MT']
+    assert len(progress.succeeded) == len(vat.member_states) - 2
+    assert progress.pending == []
+
+    del fetches[:]
+    assert cache.standard_rate('DE').rate == D('20.0')
+    assert fetches == []
+
+def test_prefetch_snapshot(monkeypatch):
+    def get_rates(member_state, date=None):
+        raise IOError('network unreachable')
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    monkeypatch.setattr(tic, 'get_rates', get_rates)
+    cache = rates.RateCache()
+    with pytest.warns(rates.SnapshotRatesWarning):
+        progress = cache.prefetch(['FR', 'DE'])
+    assert progress.succeeded == []
+    assert sorted(progress.failed) == sorted(progress.stale) == ['DE', 'FR']
+    assert isinstance(progress.failed['FR'], IOError)
+    assert sorted(cache.stale()) == ['DE', 'FR']
+
+def test_prefetch_subset(fetches):
+    cache = rates.RateCache()
+    progress = cache.warm(['FR', vat.member_states[0], 'FR'], wait=False)
+    assert progress.wait(5)
+    assert sorted(progress.succeeded) == sorted(['FR',
+                                                 vat.member_states[0].code])
+
+def test_prefetch_deadline(monkeypatch):
+    def get_rates(member_state, date=None):
+        time.sleep(0.2)
+        return fake_rates()
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    cache = rates.RateCache()
+    start = time.time()
+    progress = cache.prefetch(max_workers=2, timeout=0.1)
+    assert time.time() - start < 0.2
+    assert not progress.done()
+    assert len(progress.pending) == len(vat.member_states)
+
+changes_response = b'''<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+ <soap:Body>
+  <ns2:changesResponse
+    xmlns:ns2="urn:ec.europa.eu:taxud:tic:services:VatRateWebService"
+    xmlns="urn:ec.europa.eu:taxud:tic:services:VatRateWebService:types">
+   <rates>
+    <rate>
+     <memberState>LU</memberState>
+     <type>Standard</type>
+     <value>17.0</value>
+     <applicationDate>2015-01-01</applicationDate>
+    </rate>
+    <rate>
+     <memberState>PT</memberState>
+     <type>Standard</type>
+     <value>22.0</value>
+     <applicationDate>2012-04-01</applicationDate>
+     <region>Madeira</region>
+    </rate>
+   </rates>
+  </ns2:changesResponse>
+ </soap:Body>
+</soap:Envelope>'''
+
+def test_parse_changes():
+    changes = vrws.parse_response(io.BytesIO(changes_response),
+                                  'changesResponse', by_member_state=True)
+    assert sorted(changes) == ['LU', 'PT']
+    lu = changes['LU'].types[vrws.STANDARD]
+    assert [(r.rate, r.application_date) for r in lu] \
+      == [(D('17.0'), datetime.date(2015, 1, 1))]
+    assert changes['PT'].regions['Madeira'].types[vrws.STANDARD][0].rate \
+      == D('22.0')
+
+    whole = vrws.parse_response(io.BytesIO(changes_response),
+                                'changesResponse')
+    assert len(whole.types[vrws.STANDARD]) == 1
+
+def test_incremental(monkeypatch, fetches):
+    changes_calls = []
+    def get_changes(from_date=None, to_date=None, country=None,
+                    by_member_state=False):
+        changes_calls.append(from_date)
+        return vrws.parse_response(io.BytesIO(changes_response),
+                                   'changesResponse', by_member_state)
+    monkeypatch.setattr(vrws, 'get_changes', get_changes)
+
+    cache = rates.RateCache(incremental=True)
+    cache.prefetch(['LU', 'PT', 'DE'])
+    old_lu = cache.rates['LU'][0]
+
+    # Pretend the rates were fetched a couple of days ago
+    then = datetime.date.today() - datetime.timedelta(days=2)
+    for ms in ('LU', 'PT', 'DE'):
+        cache.rates[ms] = (cache.rates[ms][0], then)
+    del fetches[:]
+
+    assert cache.standard_rate('LU').rate == D('17.0')
+    assert cache.standard_rate('DE').rate == D('20.0')
+    assert cache.standard_rate('PT', 'Madeira').rate == D('22.0')
+    assert changes_calls == [then]
+    assert fetches == []
+
+    # The old Rates object is left alone
+    assert [r.rate for r in old_lu.types[vrws.STANDARD]] == [D('20.0')]
+
+@pytest.mark.parametrize('error', [vrws.VRWSException('unavailable'),
+                                   IOError('network down')])
+def test_incremental_fallback(monkeypatch, fetches, error):
+    def get_changes(from_date=None, to_date=None, country=None,
+                    by_member_state=False):
+        raise error
+    monkeypatch.setattr(vrws, 'get_changes', get_changes)
+
+    cache = rates.RateCache(incremental=True)
+    cache.prefetch(['LU'])
+    then = datetime.date.today() - datetime.timedelta(days=1)
+    cache.rates['LU'] = (cache.rates['LU'][0], then)
+    del fetches[:]
+
+    assert cache.standard_rate('LU').rate == D('20.0')
+    assert fetches == ['LU']
+
+def test_single_flight(monkeypatch, no_snapshot):
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+    def get_rates(member_state, date=None):
+        calls.append(member_state)
+        started.set()
+        release.wait(5)
+        if member_state == 'MT':
+            raise vrws.VRWSException('unavailable')
+        return fake_rates()
+    def tic_get_rates(member_state, date=None):
+        raise tic.TICException('unavailable')
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    monkeypatch.setattr(tic, 'get_rates', tic_get_rates)
+
+    cache = rates.RateCache()
+    for ms in ('IT', 'MT'):
+        del calls[:]
+        started.clear()
+        release.clear()
+        results = []
+        def worker():
+            try:
+                results.append(cache.standard_rate(ms).rate)
+            except tic.TICException as e:
+                results.append(e)
+        threads = [threading.Thread(target=worker) for n in range(10)]
+        for t in threads:
+            t.start()
+        started.wait(5)
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join()
+        assert calls == [ms]
+        assert len(results) == 10
+        if ms == 'IT':
+            assert results == [D('20.0')] * 10
+        else:
+            assert all(isinstance(r, tic.TICException) for r in results)
+    assert cache._flights == {}
+
+def test_refresher_serves_stale(monkeypatch):
+    release = threading.Event()
+    calls = []
+    def get_rates(member_state, date=None):
+        calls.append((member_state, date))
+        release.wait(5)
+        return fake_rates('21.0')
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+
+    today = datetime.date.today()
+    cache = rates.RateCache()
+    cache.rates['NL'] = (fake_rates(), today - datetime.timedelta(days=1))
+    cache.start_refresher(lead_time=0, interval=0.01)
+    try:
+        # Doesn't block, even though the refresher is stuck fetching
+        assert cache.standard_rate('NL').rate == D('20.0')
+        release.set()
+        for n in range(100):
+            if cache.rates['NL'][1] == today:
+                break
+            time.sleep(0.01)
+        assert cache.standard_rate('NL').rate == D('21.0')
+        assert calls == [('NL', today)]
+    finally:
+        cache.stop_refresher()
+
+def test_refresher_ahead(monkeypatch):
+    calls = []
+    def get_rates(member_state, date=None):
+        calls.append((member_state, date))
+        return fake_rates('21.0')
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+
+    today = datetime.date.today()
+    tomorrow = today + datetime.timedelta(days=1)
+    cache = rates.RateCache()
+    cache.rates['NL'] = (fake_rates(), today)
+    cache.start_refresher(lead_time=2 * 86400, interval=0.01)
+    try:
+        for n in range(100):
+            if 'NL' in cache._ahead:
+                break
+            time.sleep(0.01)
+        assert cache._ahead['NL'][1] == tomorrow
+        assert calls == [('NL', tomorrow)]
+        assert cache.standard_rate('NL').rate == D('20.0')
+    finally:
+        cache.stop_refresher()
+
+    # At midnight, the rates fetched ahead are used without a fetch
+    cache._refresher = rates._Refresher(cache, 0, 60)
+    cache.rates['NL'] = (fake_rates(), today - datetime.timedelta(days=1))
+    cache._ahead['NL'] = (fake_rates('21.0'), today)
+    assert cache.standard_rate('NL').rate == D('21.0')
+    assert cache._ahead == {}
+    assert len(calls) == 1
+
+def test_renew_without_fetching(monkeypatch, tmpdir, fetches):
+    def get_changes(from_date=None, to_date=None, country=None,
+                    by_member_state=False):
+        return vrws.parse_response(io.BytesIO(changes_response),
+                                   'changesResponse', by_member_state)
+    monkeypatch.setattr(vrws, 'get_changes', get_changes)
+    today = datetime.date.today()
+    yesterday = today - datetime.timedelta(days=1)
+
+    # Rates another process has stored are used as they are
+    store = SQLiteRateStore(str(tmpdir.join('rates.db')))
+    store.put('NL', today, fake_rates('21.0'))
+    cache = rates.RateCache(store=store)
+    cache.rates['NL'] = (fake_rates(), yesterday)
+    cache._renew('NL', today)
+    assert cache.rates['NL'][1] == today
+    assert cache.standard_rate('NL').rate == D('21.0')
+    assert cache.stats()['NL']['source'] == 'store'
+
+    # An incremental cache applies the changes
+    cache = rates.RateCache(incremental=True)
+    cache.rates['LU'] = (fake_rates(), yesterday)
+    cache._renew('LU', today)
+    assert cache.standard_rate('LU').rate == D('17.0')
+    assert cache.stats()['LU']['source'] == 'changes'
+    assert fetches == []
+
+def test_best_rate():
+    cache = rates.RateCache()
+    rate_list = [vrws.Rate(D('17.5'), datetime.date(1991, 4, 1)),
+                 vrws.Rate(D('20.0'), datetime.date(2011, 1, 4)),
+                 vrws.Rate(D('5.0'), datetime.date(2012, 1, 1), 'Fuel'),
+                 vrws.Rate(D('15.0'), datetime.date(2008, 12, 1))]
+    assert cache._best_rate(rate_list).rate == D('20.0')
+    assert cache._best_rate(rate_list, datetime.date(2009, 6, 1)).rate \
+      == D('15.0')
+    assert cache._best_rate(rate_list, datetime.date(1990, 1, 1)) is None
+
+def test_rate_on(monkeypatch):
+    # GB's standard rate history, as VRWS would report it for a given date
+    history = [(datetime.date(1991, 4, 1), '17.5'),
+               (datetime.date(2008, 12, 1), '15.0'),
+               (datetime.date(2010, 1, 1), '17.5'),
+               (datetime.date(2011, 1, 4), '20.0')]
+    calls = []
+    def get_rates(member_state, date=None):
+        calls.append(date)
+        current = [h for h in history if h[0] <= date]
+        if not current:
+            return vrws.Rates({}, {}, {})
+        current = current[-1]
+        return vrws.Rates(
+            {vrws.STANDARD: [vrws.Rate(D(current[1]), current[0])]},
+            {vrws.ESERVICES: [vrws.Rate(D(current[1]), current[0])]},
+            {})
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+
+    cache = rates.RateCache()
+    today = datetime.date.today()
+    assert cache.rate_on('GB', today).rate == D('20.0')
+    assert cache.rate_on('GB', datetime.date(2012, 5, 1)).rate == D('20.0')
+    assert calls == [today]
+
+    assert cache.rate_on('GB', datetime.date(2009, 3, 1)).rate == D('15.0')
+    assert cache.rate_on('GB', datetime.date(2008, 12, 1)).rate == D('15.0')
+    assert calls == [today, datetime.date(2009, 3, 1)]
+
+    assert cache.rate_on('GB', datetime.date(2010, 6, 1),
+                         category=vrws.ESERVICES).rate == D('17.5')
+    assert cache.rate_on('GB', datetime.date(2010, 1, 1)).rate == D('17.5')
+    assert calls[2:] == [datetime.date(2010, 6, 1)]
+
+    # No reduced rates from VRWS, so we get the built-in table
+    assert cache.rate_on('GB', datetime.date(2016, 1, 1),
+                         rate_type=vrws.REDUCED).rate == D('5.0')
+    assert cache.rate_on('GB', datetime.date(1980, 1, 1)) is None
+    assert cache.rate_on('GB', datetime.date(1980, 1, 1)) is None
+    assert calls[3:] == [datetime.date(1980, 1, 1)]
+
+def test_resolve_rates(monkeypatch):
+    calls = []
+    def get_rates(member_state, date=None):
+        calls.append((member_state, date))
+        rate = {'DE': '19.0', 'FR': '20.0'}[member_state]
+        return vrws.Rates(
+            {vrws.STANDARD: [vrws.Rate(D(rate), datetime.date(2014, 1, 1))]},
+            {vrws.ESERVICES: [vrws.Rate(D(rate), datetime.date(2015, 1, 1))]},
+            {})
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+
+    today = datetime.date.today()
+    cache = rates.RateCache()
+    keys = [('DE', vrws.STANDARD), ('FR', vrws.ESERVICES, None, today),
+            ('DE', vrws.REDUCED, None, None), ('FR', 'Books'),
+            ('DE', vrws.STANDARD)] * 1000
+    result = cache.resolve_rates(iter(keys))
+    assert len(result) == 5000
+    assert [r and r.rate for r in result[:5]] \
+      == [D('19.0'), D('20.0'), D('7.0'), None, D('19.0')]
+    assert result[0] is result[4] is result[4000]
+    assert sorted(calls) == [('DE', today), ('FR', today)]
+
+    assert cache.resolve_rates([('DE', vrws.STANDARD)], fractions=True) \
+      == [D('0.19')]
+
+def test_snapshot_fallback(monkeypatch):
+    online = [False]
+    calls = []
+    def get_rates(member_state, date=None):
+        calls.append(member_state)
+        if not online[0]:
+            raise IOError('network unreachable')
+        return fake_rates('21.0')
+    def tic_get_rates(member_state, date=None):
+        raise IOError('network unreachable')
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    monkeypatch.setattr(tic, 'get_rates', tic_get_rates)
+
+    cache = rates.RateCache()
+    with pytest.warns(rates.SnapshotRatesWarning):
+        assert cache.standard_rate('FR').rate == D('20.0')
+    assert cache.reduced_rate('FR').rate == D('5.5')
+    assert cache.stale() == {'FR': snapshot.default().date}
+    assert calls == ['FR']
+
+    # Once the retry interval has passed, we try the network again
+    online[0] = True
+    cache.snapshot_retry_interval = 0
+    cache._stale['FR'] = (cache._stale['FR'][0], 0, None)
+    assert cache.standard_rate('FR').rate == D('21.0')
+    assert cache.stale() == {}
+    assert calls == ['FR', 'FR']
+
+def test_snapshot_out_of_date(monkeypatch):
+    # With the default snapshot_max_age and no network at all, we still get
+    # rates, but are told that they may be out of date
+    def get_rates(member_state, date=None):
+        raise IOError('network unreachable')
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    monkeypatch.setattr(tic, 'get_rates', get_rates)
+    snap = snapshot.default()
+    cache = rates.RateCache()
+    cache.snapshot_max_age = snap.age() - datetime.timedelta(days=1)
+    with pytest.warns(rates.SnapshotRatesWarning, match='out of date'):
+        assert cache.standard_rate('FR').rate == D('20.0')
+    assert cache.stale() == {'FR': snap.date}
+
+    cache = rates.RateCache()
+    assert cache.snapshot_max_age == datetime.timedelta(days=180)
+    with pytest.warns(rates.SnapshotRatesWarning):
+        assert cache.standard_rate('DE').rate == D('19.0')
+    cache.snapshot_max_age = None
+    with pytest.warns(rates.SnapshotRatesWarning) as record:
+        cache.standard_rate('IT')
+    assert 'out of date' not in str(record[0].message)
+
+def test_snapshot_unknown_member_state(monkeypatch):
+    def get_rates(member_state, date=None):
+        raise vrws.VRWSException('unavailable')
+    def tic_get_rates(member_state, date=None):
+        raise tic.TICException('unavailable')
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    monkeypatch.setattr(tic, 'get_rates', tic_get_rates)
+    cache = rates.RateCache()
+    with pytest.raises(tic.TICException):
+        cache.standard_rate('XX')
+
+def test_rate_table(monkeypatch):
+    def get_rates(member_state, date=None):
+        return vrws.Rates(
+            {vrws.STANDARD: [vrws.Rate(D('19.6'), datetime.date(2000, 4, 1)),
+                             vrws.Rate(D('20.0'), datetime.date(2014, 1, 1)),
+                             vrws.Rate(D('25.0'), datetime.date(9999, 1, 1))],
+             vrws.REDUCED: [vrws.Rate(D('5.5'), datetime.date(2014, 1, 1)),
+                            vrws.Rate(D('10.0'), datetime.date(2014, 1, 1),
+                                      'Alternate'),
+                            vrws.Rate(D('2.1'), datetime.date(2014, 1, 1),
+                                      'Super Reduced')]},
+            {vrws.ESERVICES: [vrws.Rate(D('20.0'),
+                                        datetime.date(2015, 1, 1))]},
+            {'Corsica': vrws.Rates(
+                {vrws.STANDARD: [vrws.Rate(D('20.0'),
+                                           datetime.date(2014, 1, 1))]},
+                {}, None)})
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+
+    cache = rates.RateCache()
+    assert len(cache.table()) == 0
+    table = cache.table(['FR'])
+    assert table is cache.table()
+    assert table.get('FR') == D('0.2')
+    assert table['FR', None, vrws.REDUCED, 'Super Reduced'] == D('0.021')
+    assert table.get('FR', vrws.ESERVICES) == D('0.2')
+    assert table.get('FR', region='Corsica') == D('0.2')
+    assert table.get('FR', vrws.REDUCED, detail='Parking') is None
+    assert table.details('FR', vrws.REDUCED) \
+      == ((None, D('0.055')), ('Alternate', D('0.1')),
+          ('Super Reduced', D('0.021')))
+    assert table.member_states() == frozenset(['FR'])
+
+    # Fetching another member state swaps in a new table, leaving the old
+    # one unchanged
+    new_table = cache.table(['DE'])
+    assert new_table is not table
+    assert new_table.member_states() == frozenset(['FR', 'DE'])
+    assert table.member_states() == frozenset(['FR'])
+
+def test_member_state_rates(monkeypatch):
+    monkeypatch.setattr(vat.memberstate, '_rate_cache', rates.RateCache())
+    def get_rates(member_state, date=None):
+        return vrws.Rates(
+            {vrws.STANDARD: [vrws.Rate(D('21.0'), datetime.date(1996, 1, 1))]},
+            {}, {})
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    be = vat.MemberState.by_code('BE')
+    assert be.standard_rate == D('0.21')
+    # From the built-in table of reduced rates
+    assert be.reduced_rates == (D('0.06'), D('0.12'))
+    assert be.parking_rate == D('0.12')
+    assert be.super_reduced_rate is None
+
+def test_member_state_undetailed_reduced_rates(monkeypatch):
+    monkeypatch.setattr(vat.memberstate, '_rate_cache', rates.RateCache())
+    def get_rates(member_state, date=None):
+        return vrws.Rates(
+            {vrws.STANDARD: [vrws.Rate(D('20.0'), datetime.date(2014, 1, 1))],
+             vrws.REDUCED: [vrws.Rate(D('5.5'), datetime.date(2012, 1, 1)),
+                            vrws.Rate(D('7.0'), datetime.date(2012, 1, 1)),
+                            vrws.Rate(D('10.0'), datetime.date(2014, 1, 1)),
+                            vrws.Rate(D('10.0'), datetime.date(2014, 1, 1)),
+                            vrws.Rate(D('2.1'), datetime.date(2014, 1, 1),
+                                      'Super Reduced')]},
+            {}, {})
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    fr = vat.MemberState.by_code('FR')
+    assert fr.reduced_rates == (D('0.1'), D('0.055'), D('0.07'))
+    assert fr.super_reduced_rate == D('0.021')
+    # The ordinary reduced rate is still the most recent one
+    assert vat.memberstate._rate_cache.table().get('FR', vrws.REDUCED) \
+      == D('0.1')
+
+def test_stats(monkeypatch, fetches, no_snapshot):
+    cache = rates.RateCache()
+    cache.standard_rate('FR')
+    cache.standard_rate('FR')
+    with pytest.raises(tic.TICException):
+        cache.standard_rate('MT')
+
+    stats = cache.stats()
+    fr = stats['FR']
+    assert (fr['hits'], fr['misses'], fr['fetches'], fr['fetch_errors']) \
+      == (1, 1, 1, 0)
+    assert fr['source'] == 'vrws'
+    assert fr['date'] == datetime.date.today()
+    assert fr['age'] >= 0
+    assert fr['fetch_time'] == fr['last_fetch_time'] >= 0.01
+    assert fr['historic_reduced']
+    assert fr['last_error'] is None
+
+    mt = stats['MT']
+    assert (mt['misses'], mt['fetches'], mt['fetch_errors']) == (1, 1, 1)
+    assert isinstance(mt['last_error'], tic.TICException)
+    assert mt['source'] is None and mt['date'] is None and mt['age'] is None
+
+    cache.reset_stats()
+    fr = cache.stats()['FR']
+    assert (fr['hits'], fr['misses'], fr['fetches']) == (0, 0, 0)
+    assert cache.stats()['MT']['last_error'] is None
+    cache.standard_rate('FR')
+    fr = cache.stats()['FR']
+    assert fr['hits'] == 1
+    assert fr['source'] == 'vrws' and fr['age'] >= 0
+
+def test_stats_sources(monkeypatch):
+    def get_rates(member_state, date=None):
+        raise vrws.VRWSException('unavailable')
+    def tic_get_rates(member_state, date=None):
+        if member_state == 'FR':
+            return fake_rates()
+        raise tic.TICException('unavailable')
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    monkeypatch.setattr(tic, 'get_rates', tic_get_rates)
+
+    cache = rates.RateCache()
+    cache.standard_rate('FR')
+    with pytest.warns(rates.SnapshotRatesWarning):
+        cache.standard_rate('DE')
+    stats = cache.stats()
+    assert stats['FR']['source'] == 'tic'
+    assert isinstance(stats['FR']['last_error'], vrws.VRWSException)
+    assert stats['FR']['fetch_errors'] == 0
+    assert stats['DE']['source'] == 'snapshot'
+    assert stats['DE']['fetch_errors'] == 1
+    # The snapshot only has standard rates
+    assert stats['DE']['historic_reduced']
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import datetime
+from decimal import Decimal as D
+import threading
+import time
+
+import pytest
+
+from vat import rates, vrws
+from vat.ratestore import SQLiteRateStore, _encode_rates, _decode_rates
+
+def sample_rates():
+    return vrws.Rates(
+        {vrws.STANDARD: [vrws.Rate(D('20.0'), datetime.date(2011, 1, 4))],
+         vrws.REDUCED: [vrws.Rate(D('5.0'), datetime.date(1997, 9, 1),
+                                  'Fuel')]},
+        {vrws.ESERVICES: [vrws.Rate(D('20.0'), datetime.date(2015, 1, 1))]},
+        {'Madeira': vrws.Rates(
+            {vrws.STANDARD: [vrws.Rate(D('22.0'),
+                                       datetime.date(2012, 4, 1))]},
+            {}, None)})
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+    def get_rates(member_state, date=None):
+        calls.append(member_state)
+        time.sleep(0.05)
+        return sample_rates()
+    monkeypatch.setattr(vrws, 'get_rates', get_rates)
+    return calls
+
+def test_encode_decode():
+    r = sample_rates()
+    decoded = _decode_rates(_encode_rates(r))
+    assert decoded == r
+    assert decoded.types[vrws.STANDARD][0].rate == D('20.0')
+    assert decoded.regions['Madeira'].regions is None
+
+def test_shared_between_caches(tmpdir, fetches):
+    path = str(tmpdir.join('rates.db'))
+    first = rates.RateCache(store=path)
+    assert first.standard_rate('GB').rate == D('20.0')
+
+    # A second process, or this one after a restart, shouldn't refetch
+    second = rates.RateCache(store=SQLiteRateStore(path))
+    assert second.standard_rate('GB').rate == D('20.0')
+    assert second.reduced_rates('GB')[0].detail == 'Fuel'
+    assert fetches == ['GB']
+
+def test_single_fetch(tmpdir, fetches):
+    path = str(tmpdir.join('rates.db'))
+    results = []
+    def worker():
+        cache = rates.RateCache(store=path)
+        results.append(cache.standard_rate('FR').rate)
+    threads = [threading.Thread(target=worker) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [D('20.0')] * 8
+    assert fetches == ['FR']
+
+def test_failed_fetch(tmpdir):
+    store = SQLiteRateStore(str(tmpdir.join('rates.db')))
+    today = datetime.date.today()
+    def fail(member_state, date):
+        raise vrws.VRWSException('no')
+    with pytest.raises(vrws.VRWSException):
+        store.fetch('DE', today, fail)
+    # The claim was released, so we can try again straight away
+    r = store.fetch('DE', today, lambda ms, d: sample_rates())
+    assert store.get('DE', today) == r
+
+def test_old_dates_discarded(tmpdir):
+    store = SQLiteRateStore(str(tmpdir.join('rates.db')))
+    today = datetime.date.today()
+    store.put('DE', today - datetime.timedelta(days=1), sample_rates())
+    assert store.get('DE', today) is None
+    store.put('DE', today, sample_rates())
+    assert store.get('DE', today - datetime.timedelta(days=1)) is None
+    assert store.get('DE', today) is not None
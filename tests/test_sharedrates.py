@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import datetime
+from decimal import Decimal as D
+import os
+
+from vat import rates, sharedrates, vrws
+
+def cache_with(standard):
+    cache = rates.RateCache()
+    today = datetime.date.today()
+    cache.rates['FR'] = (vrws.Rates(
+        {vrws.STANDARD: [vrws.Rate(D('19.6'), datetime.date(2000, 4, 1)),
+                         vrws.Rate(D(standard), datetime.date(2014, 1, 1))],
+         vrws.REDUCED: [vrws.Rate(D('5.5'), datetime.date(2014, 1, 1)),
+                        vrws.Rate(D('2.1'), datetime.date(2014, 1, 1),
+                                  'Super Reduced')]},
+        {vrws.ESERVICES: [vrws.Rate(D(standard), datetime.date(2015, 1, 1))]},
+        {'Corsica': vrws.Rates(
+            {vrws.STANDARD: [vrws.Rate(D('20.0'),
+                                       datetime.date(2014, 1, 1))]},
+            {}, None)}), today)
+    cache.rates['DE'] = (vrws.Rates(
+        {vrws.STANDARD: [vrws.Rate(D('19.0'), datetime.date(2007, 1, 1))]},
+        {}, {}), today)
+    return cache
+
+def test_publish_and_read(tmpdir):
+    path = str(tmpdir.join('rates'))
+    assert sharedrates.publish(cache_with('20.0'), path) == 1
+    shared = sharedrates.SharedRates(path)
+    try:
+        assert shared.member_states() == frozenset(['FR', 'DE'])
+        assert shared.get('FR') == D('0.2')
+        assert shared.get('FR', date=datetime.date(2010, 1, 1)) \
+          == D('0.196')
+        assert shared.get('FR', date=datetime.date(1990, 1, 1)) is None
+        assert shared.get('FR', vrws.REDUCED, detail='Super Reduced') \
+          == D('0.021')
+        assert shared.get('FR', vrws.ESERVICES) == D('0.2')
+        assert shared.get('FR', region='Corsica') == D('0.2')
+        assert shared.get('DE') == D('0.19')
+        assert shared.get('XX') is None
+        # From the built-in table of reduced rates
+        assert shared.get('DE', vrws.REDUCED) == D('0.07')
+        reduced = shared.rates('FR', vrws.REDUCED)
+        assert [(r.rate, r.detail) for r in reduced] \
+          == [(D('5.5'), None), (D('2.1'), 'Super Reduced')]
+
+        # Readers pick up a new generation on their next lookup
+        assert sharedrates.publish(cache_with('21.0'), path) == 2
+        assert shared.get('FR') == D('0.21')
+        assert shared.generation == 2
+
+        sharedrates.publish(cache_with('22.0'), path)
+        assert shared.get('FR') == D('0.22')
+        assert sorted(os.listdir(str(tmpdir))) \
+          == ['rates', 'rates.2', 'rates.3']
+    finally:
+        shared.close()
+
+def test_data_file_removed(tmpdir, monkeypatch):
+    path = str(tmpdir.join('rates'))
+    sharedrates.publish(cache_with('20.0'), path)
+    shared = sharedrates.SharedRates(path)
+    try:
+        sharedrates.publish(cache_with('21.0'), path)
+
+        # The publisher moves on twice, removing generation 2, between the
+        # reader seeing generation 2 and opening its data file
+        real_data = sharedrates._Data
+        raced = []
+        def racing_data(data_path):
+            if not raced:
+                raced.append(data_path)
+                sharedrates.publish(cache_with('22.0'), path)
+                sharedrates.publish(cache_with('23.0'), path)
+            return real_data(data_path)
+        monkeypatch.setattr(sharedrates, '_Data', racing_data)
+
+        assert shared.get('FR') == D('0.23')
+        assert shared.generation == 4
+        assert raced == [path + '.2']
+        assert not os.path.exists(path + '.2')
+    finally:
+        shared.close()
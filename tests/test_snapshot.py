@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import datetime
+from decimal import Decimal as D
+
+import vat
+from vat import snapshot, vrws
+
+def test_bundled_snapshot():
+    snap = snapshot.default()
+    assert snap is snapshot.default()
+    # The UK has left the EU, so VRWS no longer has rates for it
+    assert sorted(snap.rates) == sorted(ms.code for ms in vat.member_states
+                                        if ms.code != 'GB')
+    for ms, rates in snap.rates.items():
+        assert len(rates.types[vrws.STANDARD]) > 0
+    assert snap.age(snap.date + datetime.timedelta(days=3)).days == 3
+
+def test_save_load(tmpdir):
+    path = str(tmpdir.join('snapshot.json'))
+    snap = snapshot.Snapshot(datetime.date(2016, 1, 1), {
+        'RO': vrws.Rates(
+            {vrws.STANDARD: [vrws.Rate(D('20.0'), datetime.date(2016, 1, 1))]},
+            {}, {})})
+    snapshot.save(snap, path)
+    loaded = snapshot.load(path)
+    assert loaded.date == snap.date
+    assert loaded.get('RO').types[vrws.STANDARD][0].rate == D('20.0')
+    assert loaded.get('GB') is None
+
+def test_apply_changes(monkeypatch):
+    def get_changes(from_date=None, to_date=None, country=None,
+                    by_member_state=False):
+        assert from_date == datetime.date(2025, 1, 1)
+        return {'RO': vrws.Rates(
+            {vrws.STANDARD: [vrws.Rate(D('21.0'),
+                                       datetime.date(2025, 8, 1))]},
+            {}, {})}
+    monkeypatch.setattr(vrws, 'get_changes', get_changes)
+    old = snapshot.default()
+    new = snapshot.apply_changes(old, datetime.date(2025, 9, 1))
+    assert new.date == datetime.date(2025, 9, 1)
+    assert [r.rate for r in new.get('RO').types[vrws.STANDARD]] \
+      == [D('19.0'), D('21.0')]
+    assert new.get('FR') is old.get('FR')
+    assert len(old.get('RO').types[vrws.STANDARD]) == 1
@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, print_function
+import datetime
+from decimal import Decimal as D
+import io
+import pickle
 import vat
 import pytest
 from vat import vrws
@@ -16,3 +20,127 @@ def test_vrws():
         else:
             raise
         
+
+rates_response = b'''<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+ <soap:Body>
+  <ns2:ratesResponse
+    xmlns:ns2="urn:ec.europa.eu:taxud:tic:services:VatRateWebService"
+    xmlns="urn:ec.europa.eu:taxud:tic:services:VatRateWebService:types">
+   <memberState>PT</memberState>
+   <rates>
+    <rate>
+     <memberState>PT</memberState>
+     <type>Standard</type>
+     <value>23.0</value>
+     <applicationDate>2011-01-01</applicationDate>
+    </rate>
+    <rate>
+     <memberState>PT</memberState>
+     <type>Reduced</type>
+     <value>6.0</value>
+     <applicationDate>2011-01-01</applicationDate>
+     <detail>Foodstuffs</detail>
+    </rate>
+    <rate>
+     <memberState>PT</memberState>
+     <type>Standard</type>
+     <value>23.0</value>
+     <applicationDate>2011-01-01</applicationDate>
+     <category>E-Services</category>
+    </rate>
+    <rate>
+     <memberState>PT</memberState>
+     <type>Standard</type>
+     <value>22.0</value>
+     <applicationDate>2012-04-01</applicationDate>
+     <region>Madeira</region>
+    </rate>
+    <rate>
+     <memberState>PT</memberState>
+     <type>Standard</type>
+     <value>18.0</value>
+     <applicationDate>2011-01-01</applicationDate>
+     <region>Azores</region>
+     <category>E-Services</category>
+    </rate>
+   </rates>
+  </ns2:ratesResponse>
+ </soap:Body>
+</soap:Envelope>'''
+
+def _flatten(rates):
+    def rate_lists(d):
+        return dict((k, [(r.rate, r.application_date, r.detail) for r in v])
+                    for k, v in d.items())
+    regions = rates.regions
+    if regions is not None:
+        regions = dict((k, _flatten(v)) for k, v in regions.items())
+    return rate_lists(rates.types), rate_lists(rates.categories), regions
+
+def test_parse_response():
+    rates = vrws.parse_response(io.BytesIO(rates_response), 'ratesResponse')
+    assert [(r.rate, r.application_date) for r in rates.types[vrws.STANDARD]] \
+      == [(D('23.0'), datetime.date(2011, 1, 1))]
+    assert rates.types[vrws.REDUCED][0].detail == 'Foodstuffs'
+    assert rates.categories[vrws.ESERVICES][0].rate == D('23.0')
+    assert rates.regions['Madeira'].types[vrws.STANDARD][0].rate == D('22.0')
+    assert rates.regions['Azores'].categories[vrws.ESERVICES][0].rate \
+      == D('18.0')
+    assert rates.regions['Madeira'].regions is None
+
+    standard = [(D('23.0'), datetime.date(2011, 1, 1), None)]
+    expected = ({vrws.STANDARD: standard,
+                 vrws.REDUCED: [(D('6.0'), datetime.date(2011, 1, 1),
+                                 'Foodstuffs')]},
+                {vrws.ESERVICES: standard},
+                {'Madeira': ({vrws.STANDARD: [(D('22.0'),
+                                               datetime.date(2012, 4, 1),
+                                               None)]}, {}, None),
+                 'Azores': ({}, {vrws.ESERVICES: [(D('18.0'),
+                                                   datetime.date(2011, 1, 1),
+                                                   None)]}, None)})
+    assert _flatten(rates) == expected
+    by_ms = vrws.parse_response(io.BytesIO(rates_response), 'ratesResponse',
+                                by_member_state=True)
+    assert list(by_ms) == ['PT']
+    assert _flatten(by_ms['PT']) == expected
+
+def test_parse_response_bad_reply():
+    with pytest.raises(ValueError):
+        vrws.parse_response(io.BytesIO(rates_response), 'changesResponse')
+    with pytest.raises(ValueError):
+        vrws.parse_response(io.BytesIO(b'<ratesResponse/>'), 'ratesResponse')
+    incomplete = rates_response.replace(b'<value>6.0</value>', b'')
+    with pytest.raises(ValueError):
+        vrws.parse_response(io.BytesIO(incomplete), 'ratesResponse')
+
+def test_rate_value_type():
+    a = vrws.Rate(D('20.0'), datetime.date(2014, 1, 1), 'Food' + 'stuffs')
+    b = vrws.Rate(D('20.0'), datetime.date(2014, 1, 1), 'Foodstuffs')
+    c = vrws.Rate(D('20.0'), datetime.date(2014, 1, 1))
+    assert a == b and not a != b
+    assert a != c
+    assert hash(a) == hash(b)
+    assert len(set([a, b, c])) == 2
+    assert a.detail is b.detail
+    with pytest.raises(AttributeError):
+        a.rate = D('21.0')
+    with pytest.raises(AttributeError):
+        a.extra = 1
+    assert not hasattr(a, '__dict__')
+    assert pickle.loads(pickle.dumps(a, 2)) == a
+
+def test_rates_value_type():
+    one = vrws.parse_response(io.BytesIO(rates_response), 'ratesResponse')
+    two = vrws.parse_response(io.BytesIO(rates_response), 'ratesResponse')
+    assert one == two and hash(one) == hash(two)
+    assert one != vrws.Rates({}, {}, {})
+    assert list(one.regions)[0] is list(two.regions)[0]
+    with pytest.raises(AttributeError):
+        one.types = {}
+    with pytest.raises(TypeError):
+        one.types['Other'] = ()
+    with pytest.raises(AttributeError):
+        one.types[vrws.STANDARD].append(vrws.Rate(D('1.0'), None))
+    assert pickle.loads(pickle.dumps(one, 2)) == one
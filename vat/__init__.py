@@ -2,13 +2,15 @@ from .memberstate import member_states, MemberState, Threshold
 from .vat_check import check_details
 from .vies import VIESException, VIESSOAPException, VIESHTTPException, \
      VIESResponseBase, VIESResponse, VIESApproxResponse
-from .rates import RateCache
+from .rates import RateCache, SnapshotRatesWarning
+from .ratestore import SQLiteRateStore
 from .vrws import VRWSException, VRWSSOAPException, VRWSHTTPException, \
      VRWSErrorException, Rate, BROADCASTING, TELECOMS, ESERVICES
 
 __all__ = ['member_states', 'MemberState', 'Threshold', 'check_details',
            'VIESException', 'VIESSOAPException', 'VIESHTTPException',
            'VIESResponseBase', 'VIESResponse', 'VIESApproxResponse',
-           'RateCache', 'Rates', 'Rate',
+           'RateCache', 'SnapshotRatesWarning', 'SQLiteRateStore',
+           'Rates', 'Rate',
            'VRWSException', 'VRWSSOAPException', 'VRWSHTTPException',
            'VRWSErrorException']
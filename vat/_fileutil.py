@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+
+import six
+
+try:
+    _replace = os.replace
+except AttributeError:
+    # Python 2 has no os.replace(); on Windows, os.rename() won't overwrite an
+    # existing file, so go straight to MoveFileEx, which will
+    if os.name == 'nt':
+        import ctypes
+
+        _MOVEFILE_REPLACE_EXISTING = 0x1
+        _MOVEFILE_WRITE_THROUGH = 0x8
+
+        def _replace(src, dst):
+            if not ctypes.windll.kernel32.MoveFileExW(
+                    six.text_type(src), six.text_type(dst),
+                    _MOVEFILE_REPLACE_EXISTING | _MOVEFILE_WRITE_THROUGH):
+                raise ctypes.WinError()
+    else:
+        _replace = os.rename
+
+def write_atomically(path, chunks):
+    """Write the byte strings in ``chunks`` to ``path``, replacing any
+    existing file atomically: readers see either the old file or the whole
+    of the new one, never a partly written file."""
+    if isinstance(chunks, bytes):
+        chunks = [chunks]
+    tmp_path = '%s.tmp%d' % (path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(tmp_path, path)
+    except:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import collections
+import multiprocessing
+
+def submit_bounded(submit, chunks, processes=None):
+    """Run ``submit(pool, chunk)`` for each chunk in ``chunks`` with a pool of
+    ``processes`` worker processes (by default, the number of CPUs), yielding
+    the results in order.  ``submit`` will usually return the result of
+    ``pool.apply_async()``.
+
+    Unlike Pool.imap(), which reads its input as fast as it can, this keeps
+    only a few chunks per process in flight.  The pool is shut down when the
+    generator finishes, fails or is closed."""
+    pool = multiprocessing.Pool(processes)
+    max_pending = 4 * (processes or multiprocessing.cpu_count())
+    pending = collections.deque()
+    try:
+        chunks = iter(chunks)
+        while True:
+            while len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append(submit(pool, chunk))
+            if not pending:
+                break
+            yield pending.popleft()
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import mmap
+import struct
+
+import six
+
+from ._fileutil import write_atomically
+
+# On-disk layout (all integers little-endian):
+#
+#   header      magic (8 bytes), record count (u32), key count (u32)
+#   records     one (blob offset u64, id length u32, payload length u32)
+#               entry per record; the id and payload are stored back to back
+#   keys        one (blob offset u64, key length u32, postings offset u64,
+#               postings count u32) entry per key, sorted by key
+#   ids         one record number (u32) per record, sorted by record id
+#   blob        UTF-8 strings, plus a u32 array of record numbers per key
+#
+# Everything is fixed-size except the blob, so a mapped file can be searched
+# without reading it into memory.
+
+MAGIC = b'VATPIDX2'
+
+_header = struct.Struct(str('<8sII'))
+_record = struct.Struct(str('<QII'))
+_key = struct.Struct(str('<QIQI'))
+_ordinal = struct.Struct(str('<I'))
+
+def _to_bytes(s):
+    return s.encode('utf-8')
+
+def _from_bytes(b):
+    return b.decode('utf-8')
+
+class _MappedPostings(object):
+    """Read-only view of a saved index."""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.record_count, self.key_count \
+          = _header.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError('%s is not an index file' % path)
+        self._records_at = _header.size
+        self._keys_at = self._records_at + self.record_count * _record.size
+        self._ids_at = self._keys_at + self.key_count * _key.size
+
+    def close(self):
+        self._map.close()
+
+    def _record_id(self, ordinal):
+        offset, id_len, payload_len \
+          = _record.unpack_from(self._map, self._records_at
+                                + ordinal * _record.size)
+        return self._map[offset:offset + id_len]
+
+    def _sorted_ordinal(self, n):
+        return _ordinal.unpack_from(self._map,
+                                    self._ids_at + n * _ordinal.size)[0]
+
+    def ordinal(self, ident):
+        """Return the record number of the record with the given id, or
+        None if there isn't one."""
+        ident = _to_bytes(ident)
+        lo = 0
+        hi = self.record_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record_id(self._sorted_ordinal(mid)) < ident:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.record_count:
+            ordinal = self._sorted_ordinal(lo)
+            if self._record_id(ordinal) == ident:
+                return ordinal
+        return None
+
+    def record(self, ordinal):
+        offset, id_len, payload_len \
+          = _record.unpack_from(self._map, self._records_at
+                                + ordinal * _record.size)
+        ident = _from_bytes(self._map[offset:offset + id_len])
+        offset += id_len
+        payload = _from_bytes(self._map[offset:offset + payload_len])
+        return ident, payload
+
+    def _key_entry(self, n):
+        return _key.unpack_from(self._map, self._keys_at + n * _key.size)
+
+    def key(self, n):
+        key_off, key_len, post_off, post_count = self._key_entry(n)
+        return self._map[key_off:key_off + key_len]
+
+    def _find(self, key):
+        key = _to_bytes(key)
+        lo = 0
+        hi = self.key_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.key_count and self.key(lo) == key:
+            return lo
+        return None
+
+    def _postings(self, n):
+        key_off, key_len, post_off, post_count = self._key_entry(n)
+        if not post_count:
+            return ()
+        return struct.unpack_from(str('<%dI' % post_count), self._map, post_off)
+
+    def count(self, key):
+        n = self._find(key)
+        if n is None:
+            return 0
+        return self._key_entry(n)[3]
+
+    def postings(self, key):
+        n = self._find(key)
+        if n is None:
+            return ()
+        return self._postings(n)
+
+    def iterkeys(self):
+        """Yield (key, postings) for every key in the file."""
+        for n in range(self.key_count):
+            yield _from_bytes(self.key(n)), self._postings(n)
+
+class PostingsIndex(object):
+    """An inverted index from string keys to records, where each record is an
+    identifier and a text payload.
+
+    Indexes can be saved to disk and loaded back with :py:meth:`load`, which
+    memory-maps the file rather than reading it.  A loaded index can still be
+    modified; additions and removals are held in memory until the index is
+    next saved."""
+
+    def __init__(self):
+        self._base = None
+        self._deleted = set()
+        self._records = {}
+        self._postings = {}
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a previously saved index."""
+        index = cls()
+        index._base = _MappedPostings(path)
+        return index
+
+    def close(self):
+        """Release the memory map, if any.  A closed index must not be used."""
+        if self._base is not None:
+            self._base.close()
+            self._base = None
+
+    def _base_ordinal(self, ident):
+        if self._base is None:
+            return None
+        ordinal = self._base.ordinal(ident)
+        if ordinal is None or ordinal in self._deleted:
+            return None
+        return ordinal
+
+    def __len__(self):
+        count = len(self._records)
+        if self._base is not None:
+            count += self._base.record_count - len(self._deleted)
+        return count
+
+    def __contains__(self, ident):
+        return (ident in self._records
+                or self._base_ordinal(ident) is not None)
+
+    def add(self, ident, payload, keys):
+        """Add a record, replacing any existing record with the same id."""
+        if ident in self:
+            self.remove(ident)
+        keys = frozenset(keys)
+        self._records[ident] = (payload, keys)
+        for key in keys:
+            self._postings.setdefault(key, set()).add(ident)
+
+    def remove(self, ident):
+        """Remove a record; raises KeyError if there is no such record."""
+        rec = self._records.pop(ident, None)
+        if rec is not None:
+            for key in rec[1]:
+                ids = self._postings[key]
+                ids.discard(ident)
+                if not ids:
+                    del self._postings[key]
+            return
+        ordinal = self._base_ordinal(ident)
+        if ordinal is None:
+            raise KeyError(ident)
+        self._deleted.add(ordinal)
+
+    def payload(self, ident):
+        """Return the payload stored with the given record."""
+        rec = self._records.get(ident, None)
+        if rec is not None:
+            return rec[0]
+        ordinal = self._base_ordinal(ident)
+        if ordinal is None:
+            raise KeyError(ident)
+        return self._base.record(ordinal)[1]
+
+    def count(self, key):
+        """Return the (approximate, for loaded indexes) number of records
+        filed under a key.  This is much cheaper than :py:meth:`lookup`."""
+        count = len(self._postings.get(key, ()))
+        if self._base is not None:
+            count += self._base.count(key)
+        return count
+
+    def lookup(self, key):
+        """Return a list of (id, payload) for the records filed under a key."""
+        result = []
+        if self._base is not None:
+            for ordinal in self._base.postings(key):
+                if ordinal not in self._deleted:
+                    result.append(self._base.record(ordinal))
+        for ident in self._postings.get(key, ()):
+            result.append((ident, self._records[ident][0]))
+        return result
+
+    def save(self, path):
+        """Write the index to disk.  The file is replaced atomically, so it is
+        safe to save over the file a loaded index was mapped from."""
+        records = []
+        renumber = {}
+        postings = {}
+
+        if self._base is not None:
+            for n in range(self._base.record_count):
+                if n not in self._deleted:
+                    renumber[n] = len(records)
+                    records.append(self._base.record(n))
+            for key, ordinals in self._base.iterkeys():
+                ordinals = [renumber[o] for o in ordinals if o in renumber]
+                if ordinals:
+                    postings[key] = ordinals
+
+        for ident, (payload, keys) in six.iteritems(self._records):
+            ordinal = len(records)
+            records.append((ident, payload))
+            for key in keys:
+                postings.setdefault(key, []).append(ordinal)
+
+        keys = sorted((_to_bytes(k), sorted(v))
+                      for k, v in six.iteritems(postings))
+
+        records = [(_to_bytes(ident), _to_bytes(payload))
+                   for ident, payload in records]
+        id_order = sorted(range(len(records)), key=lambda n: records[n][0])
+
+        blob_at = (_header.size + len(records) * _record.size
+                   + len(keys) * _key.size + len(records) * _ordinal.size)
+        record_table = []
+        key_table = []
+        blob = []
+        offset = blob_at
+        for ident, payload in records:
+            record_table.append(_record.pack(offset, len(ident), len(payload)))
+            blob.append(ident)
+            blob.append(payload)
+            offset += len(ident) + len(payload)
+        for key, ordinals in keys:
+            data = struct.pack(str('<%dI' % len(ordinals)), *ordinals)
+            key_table.append(_key.pack(offset, len(key),
+                                       offset + len(key), len(ordinals)))
+            blob.append(key)
+            blob.append(data)
+            offset += len(key) + len(data)
+
+        write_atomically(path, [_header.pack(MAGIC, len(records), len(keys)),
+                                b''.join(record_table),
+                                b''.join(key_table),
+                                struct.pack(str('<%dI' % len(id_order)),
+                                            *id_order),
+                                b''.join(blob)])
+
+class BlockingIndex(object):
+    """Common base for indexes that file records into blocks by key, and
+    find candidate matches for a query by the blocks they share with it.
+
+    Blocks holding more than ``max_block_size`` records are ignored when
+    querying, as they say little about whether two records match.  Indexes
+    can be saved with :py:meth:`save` and memory-mapped back with
+    :py:meth:`load`; a loaded index may still be added to or removed from."""
+
+    def __init__(self, max_block_size=1000):
+        self.max_block_size = max_block_size
+        self._index = PostingsIndex()
+
+    @classmethod
+    def load(cls, path, max_block_size=1000):
+        """Memory-map an index previously written by :py:meth:`save`."""
+        index = cls(max_block_size)
+        index._index = PostingsIndex.load(path)
+        return index
+
+    def save(self, path):
+        """Save the index to disk (replacing the file atomically)."""
+        self._index.save(path)
+
+    def close(self):
+        """Release the memory map held by a loaded index."""
+        self._index.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, record_id):
+        return record_id in self._index
+
+    def remove(self, record_id):
+        """Remove a record; raises KeyError if it isn't in the index."""
+        self._index.remove(record_id)
+
+    def _ranked(self, keys, limit):
+        """Return up to ``limit`` (record_id, payload, shared) tuples for the
+        records sharing blocks with ``keys``, where shared is the number of
+        blocks in common; the most shared come first."""
+        shared = {}
+        payloads = {}
+        for key in keys:
+            if self._index.count(key) > self.max_block_size:
+                continue
+            for record_id, payload in self._index.lookup(key):
+                shared[record_id] = shared.get(record_id, 0) + 1
+                payloads[record_id] = payload
+        best = sorted(shared, key=lambda r: (-shared[r], r))
+        if limit is not None:
+            best = best[:limit]
+        return [(r, payloads[r], shared[r]) for r in best]
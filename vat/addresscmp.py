@@ -1,12 +1,16 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import collections
 import re
+import struct
+import threading
 import unicodedata
 import Levenshtein
 import six
 
 from . import metaphone
+from . import _postings
 
 _mappings = {
     'de': {
@@ -95,6 +99,47 @@ _mappings = {
         'Ų': 'U', 'Ū': 'U', 'Ž': 'Z' }
     }
 
+# Postcode formats, by VAT member state code.  These are matched against
+# addresses *after* transliteration and punctuation stripping, so e.g. the
+# Polish '53-611' arrives as '53611' and the Latvian 'LV-1050' as 'LV1050'.
+# The groups are joined to make the normalised postcode.
+_postcode_formats = {
+    'AT': r'(?:A)?(\d{4})',
+    'BE': r'(?:B)?(\d{4})',
+    'BG': r'(\d{4})',
+    'CY': r'(?:CY)?(\d{4})',
+    'CZ': r'(\d{3}) ?(\d{2})',
+    'DE': r'(?:D)?(\d{5})',
+    'DK': r'(?:DK)?(\d{4})',
+    'EE': r'(\d{5})',
+    'EL': r'(\d{3}) ?(\d{2})',
+    'ES': r'(\d{5})',
+    'FI': r'(?:FI)?(\d{5})',
+    'FR': r'(\d{5})',
+    'HR': r'(?:HR)?(\d{5})',
+    'HU': r'(?:H)?(\d{4})',
+    'IE': r'([AC-FHKNPRTV-Y]\d{2}|D6W) ?([0-9AC-FHKNPRTV-Y]{4})',
+    'IT': r'(\d{5})',
+    'LT': r'(?:LT)?(\d{5})',
+    'LU': r'(?:L)?(\d{4})',
+    'LV': r'(?:LV)?(\d{4})',
+    'MT': r'([A-Z]{3}) ?(\d{4})',
+    'NL': r'(\d{4}) ?([A-Z]{2})',
+    'PL': r'(\d{2})(\d{3})',
+    'PT': r'(\d{4}) ?(\d{3})',
+    'RO': r'(\d{6})',
+    'SE': r'(?:SE)?(\d{3}) ?(\d{2})',
+    'SI': r'(?:SI)?(\d{4})',
+    'SK': r'(\d{3}) ?(\d{2})',
+    'GB': r'([A-Z]{1,2}\d[A-Z\d]?) ?(\d[A-Z]{2})',
+    }
+
+# Formats that are only matched in upper case, because their letters could
+# otherwise be a word ('1015 de Wallen' is not a Dutch postcode)
+_case_sensitive_postcodes = frozenset(['NL'])
+
+_postcode_res = {}
+
 _charmap = {}
 _char_re = None
 _punct_re = re.compile(r'[-.\']')
@@ -138,6 +183,69 @@ def _tokenize(s):
             result.append(tok)
     return result
 
+class _Postcode(six.text_type):
+    """A normalised postcode token."""
+    __slots__ = ()
+
+def _postcode_re(country):
+    if not isinstance(country, six.string_types):
+        country = country.code
+    pc_re = _postcode_res.get(country, None)
+    if pc_re is None:
+        pc_format = _postcode_formats.get(country, None)
+        if pc_format is None:
+            return None
+        flags = re.IGNORECASE
+        if country in _case_sensitive_postcodes:
+            flags = 0
+        pc_re = re.compile(r'\b(?:%s)\b' % pc_format, flags)
+        _postcode_res[country] = pc_re
+    return pc_re
+
+def _is_postcode(s, m):
+    """Decide whether the postcode-like match m in s is clearly a postcode.
+    Prefixed forms (e.g. 'A1010') and formats with letters in them are
+    unambiguous, but a bare number after a street name could as well be a
+    house number ('Hauptstrasse 1234'); it is only clear if it starts the
+    address or the address has already had a number."""
+    if any(c.isalpha() for c in m.group(0)):
+        return True
+    before = s[:m.start()]
+    if not before.strip():
+        return True
+    return any(c.isdigit() for c in before)
+
+def _tokenize_with_postcode(s, country):
+    """Tokenize s, turning the postcode for the given member state into a
+    single normalised :py:class:`_Postcode` token.  The postcode is the last
+    match that is clearly a postcode or, if there is none, the last match
+    wherever it appears ('SOFIYa 1000 UL ...').  Member states we have no
+    postcode format for are ignored."""
+    pc_re = _postcode_re(country)
+    if pc_re is None:
+        return _tokenize(s)
+    matches = list(pc_re.finditer(s))
+    if not matches:
+        return _tokenize(s)
+    clear = [match for match in matches if _is_postcode(s, match)]
+    m = (clear or matches)[-1]
+    postcode = _Postcode(''.join(g for g in m.groups() if g).upper())
+    tokens = []
+    before = s[:m.start()].strip()
+    after = s[m.end():].strip()
+    if before:
+        tokens.extend(_tokenize(before))
+    tokens.append(postcode)
+    if after:
+        tokens.extend(_tokenize(after))
+    return tokens
+
+def _postcode(tokens):
+    for tok in tokens:
+        if isinstance(tok, _Postcode):
+            return tok
+    return None
+
 _infinity = float('inf')
 
 def _word_difference(s, t):
@@ -145,7 +253,7 @@ def _word_difference(s, t):
     if isinstance(s, list) or isinstance(s, tuple):
         min_dist = _infinity
         for w in s:
-            if w is None or w is '':
+            if w is None or w == '':
                 break
             min_dist = min(min_dist, _word_difference(w, t))
         return min_dist
@@ -153,7 +261,7 @@ def _word_difference(s, t):
     if isinstance(t, list) or isinstance(t, tuple):
         min_dist = _infinity
         for w in t:
-            if w is None or w is '':
+            if w is None or w == '':
                 break
             min_dist = min(min_dist, _word_difference(s, w))
         return min_dist
@@ -169,6 +277,50 @@ def _word_difference(s, t):
     max_ed = max(len(s), len(t))
     return float(Levenshtein.distance(s, t)) / max_ed
 
+# Address vocabularies are small compared with the number of comparisons we
+# make, so we cache the distances between pairs of word tokens (tuples of
+# metaphone codes) across calls, discarding the least recently used.
+_distance_lock = threading.Lock()
+_distance_cache = collections.OrderedDict()
+_distance_cache_size = 65536
+
+def set_distance_cache_size(size):
+    """Set the maximum number of token distances cached by :py:func:`compare`
+    (the default is 65536).  A size of 0 disables the cache."""
+    global _distance_cache_size
+    with _distance_lock:
+        _distance_cache_size = size
+        while len(_distance_cache) > size:
+            _distance_cache.popitem(last=False)
+
+def clear_caches():
+    """Discard the token distance cache."""
+    with _distance_lock:
+        _distance_cache.clear()
+
+def _token_difference(s, t):
+    # Words are tokenized as tuples of metaphone codes; anything else contains
+    # digits (house numbers, postcodes and so on) and must match exactly.
+    if isinstance(s, tuple) and isinstance(t, tuple):
+        if not _distance_cache_size:
+            return _word_difference(s, t)
+        key = (s, t) if s < t else (t, s)
+        with _distance_lock:
+            dist = _distance_cache.pop(key, None)
+            if dist is not None:
+                _distance_cache[key] = dist
+                return dist
+        dist = _word_difference(s, t)
+        with _distance_lock:
+            if _distance_cache_size:
+                _distance_cache[key] = dist
+                while len(_distance_cache) > _distance_cache_size:
+                    _distance_cache.popitem(last=False)
+        return dist
+    if s == t:
+        return 0
+    return 1.0
+
 def _edit_distance(s, t):
     m = len(s)
     n = len(t)
@@ -192,7 +344,7 @@ def _edit_distance(s, t):
             else:
                 deleted = d_curr[i - 1] + 1
                 inserted = d_prev[i] + 1
-                substituted = d_prev[i - 1] + _word_difference(s[i - 1], t[j - 1])
+                substituted = d_prev[i - 1] + _token_difference(s[i - 1], t[j - 1])
 
                 d_curr[i] = min(deleted, inserted, substituted)
         d_prev = d_curr
@@ -200,12 +352,254 @@ def _edit_distance(s, t):
 
     return d_prev[m]
 
-def compare(a, b):
-    """Compare two addresses, returning a similarity value between 0 and 1."""
-    s = _tokenize(_strip_punct(_transliterate(a)))
-    t = _tokenize(_strip_punct(_transliterate(b)))
+def _normalize(a, country=None):
+    s = _strip_punct(_transliterate(a))
+    if country is None:
+        return _tokenize(s)
+    return _tokenize_with_postcode(s, country)
+
+def _compare_tokens(s, t):
+    # Different postcodes mean different addresses, whatever else matches,
+    # unless one of them is an ordinary number on the other side, in which
+    # case a house number was probably taken for the postcode
+    s_pc = _postcode(s)
+    if s_pc is not None:
+        t_pc = _postcode(t)
+        if t_pc is not None and s_pc != t_pc \
+          and s_pc not in t and t_pc not in s:
+            return 0.0
 
     max_ed = max(len(s), len(t))
     ed = _edit_distance(s, t)
 
     return 1.0 - (float(ed) / max_ed) ** 2
+
+_FINGERPRINT_VERSION = 1
+_WORD = 0
+_NUMBER = 1
+_POSTCODE = 2
+
+_fp_header = struct.Struct(str('<BH'))
+_fp_length = struct.Struct(str('<H'))
+
+def _pack_string(s):
+    s = s.encode('utf-8')
+    return _fp_length.pack(len(s)) + s
+
+def _unpack_string(data, offset):
+    length, = _fp_length.unpack_from(data, offset)
+    offset += _fp_length.size
+    return data[offset:offset + length].decode('utf-8'), offset + length
+
+class Fingerprint (object):
+    """The precomputed form of an address, as used by :py:func:`compare`.
+
+    Fingerprints are worth making for addresses that are going to be compared
+    many times; they can also be converted to and from bytes with
+    :py:meth:`to_bytes` and :py:meth:`from_bytes`, so that they can be stored
+    alongside the address itself."""
+    __slots__ = ('country', 'text', 'tokens')
+
+    def __init__(self, address, country=None):
+        if country is not None and not isinstance(country, six.string_types):
+            country = country.code
+
+        # The member state code used to normalise the postcode, if any
+        self.country = country
+
+        # The address, transliterated and with punctuation removed
+        self.text = _strip_punct(_transliterate(address))
+
+        # The tokenized address
+        if country is None:
+            self.tokens = tuple(_tokenize(self.text))
+        else:
+            self.tokens = tuple(_tokenize_with_postcode(self.text, country))
+
+    def __repr__(self):
+        return 'Fingerprint(%r, %r)' % (self.text, self.country)
+
+    def __eq__(self, other):
+        if not isinstance(other, Fingerprint):
+            return NotImplemented
+        return (self.country == other.country
+                and self.text == other.text
+                and self.tokens == other.tokens)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash((self.country, self.text, self.tokens))
+
+    def __reduce__(self):
+        return (Fingerprint.from_bytes, (self.to_bytes(),))
+
+    def to_bytes(self):
+        """Return a compact binary representation of this fingerprint."""
+        parts = [_fp_header.pack(_FINGERPRINT_VERSION, len(self.tokens)),
+                 _pack_string(self.country or ''),
+                 _pack_string(self.text)]
+        for tok in self.tokens:
+            if isinstance(tok, tuple):
+                parts.append(six.int2byte(_WORD))
+                parts.append(_pack_string(tok[0]))
+                parts.append(_pack_string(tok[1]))
+            elif isinstance(tok, _Postcode):
+                parts.append(six.int2byte(_POSTCODE))
+                parts.append(_pack_string(tok))
+            else:
+                parts.append(six.int2byte(_NUMBER))
+                parts.append(_pack_string(tok))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Reconstruct a fingerprint from the output of :py:meth:`to_bytes`,
+        without recomputing anything."""
+        data = bytes(data)
+        version, count = _fp_header.unpack_from(data, 0)
+        if version != _FINGERPRINT_VERSION:
+            raise ValueError('unsupported fingerprint version %d' % version)
+        offset = _fp_header.size
+        country, offset = _unpack_string(data, offset)
+        text, offset = _unpack_string(data, offset)
+        tokens = []
+        for n in range(count):
+            kind = six.indexbytes(data, offset)
+            offset += 1
+            if kind == _WORD:
+                primary, offset = _unpack_string(data, offset)
+                secondary, offset = _unpack_string(data, offset)
+                tokens.append((primary, secondary))
+            elif kind == _POSTCODE:
+                tok, offset = _unpack_string(data, offset)
+                tokens.append(_Postcode(tok))
+            else:
+                tok, offset = _unpack_string(data, offset)
+                tokens.append(tok)
+        fp = cls.__new__(cls)
+        fp.country = country or None
+        fp.text = text
+        fp.tokens = tuple(tokens)
+        return fp
+
+def fingerprint(address, country=None):
+    """Return a :py:class:`Fingerprint` for an address."""
+    return Fingerprint(address, country)
+
+def _tokens(a, country):
+    if isinstance(a, Fingerprint):
+        return a.tokens
+    return _normalize(a, country)
+
+def compare(a, b, country=None):
+    """Compare two addresses, returning a similarity value between 0 and 1.
+
+    Either address may be a :py:class:`Fingerprint` rather than a string.
+
+    If ``country`` (a :py:class:`vat.MemberState` or its code) is given,
+    postcodes in that member state's format are recognised and normalised;
+    addresses with different postcodes are then given a score of 0, unless
+    one of them appears as an ordinary number in the other address (and so
+    may really be a house number).
+    Fingerprints already carry their own member state, so ``country`` does not
+    apply to them; if ``country`` is not given and one address is a
+    fingerprint, the other is normalised for the fingerprint's member
+    state."""
+    if country is None:
+        for fp in (a, b):
+            if isinstance(fp, Fingerprint) and fp.country is not None:
+                country = fp.country
+                break
+    return _compare_tokens(_tokens(a, country), _tokens(b, country))
+
+def _block_keys(tokens):
+    """Return the blocking keys for a tokenized address; these are its
+    double metaphone codes, plus any tokens containing digits (house numbers,
+    postcodes and the like)."""
+    keys = set()
+    for tok in tokens:
+        if isinstance(tok, tuple):
+            for code in tok:
+                if code:
+                    keys.add('M' + code)
+        elif tok:
+            keys.add('N' + tok)
+    return keys
+
+class AddressIndex (_postings.BlockingIndex):
+    """An index that finds likely matches for an address amongst a large
+    number of stored addresses, without comparing against all of them.
+
+    Addresses are filed into blocks by their double metaphone codes and
+    numeric tokens; a query returns the stored addresses that share blocks
+    with it, which can then be scored exactly using :py:func:`compare`.
+    Blocks larger than ``max_block_size`` (typically very common words like
+    "STREET") are ignored when looking for candidates.
+
+    Each address may be given a member state (a :py:class:`vat.MemberState`
+    or its code), in which case its postcode is normalised as described for
+    :py:func:`compare`.
+
+    Indexes can be saved with :py:meth:`save` and memory-mapped back with
+    :py:meth:`load`; a loaded index may still be added to or removed from."""
+
+    def add(self, record_id, address, country=None):
+        """Add an address, replacing any existing entry for ``record_id``,
+        which must be a string."""
+        if country is not None and not isinstance(country, six.string_types):
+            country = country.code
+        self._index.add(record_id, '%s\t%s' % (country or '', address),
+                        _block_keys(_normalize(address, country)))
+
+    def _entry(self, payload):
+        country, address = payload.split('\t', 1)
+        return country or None, address
+
+    def address(self, record_id):
+        """Return the address stored for ``record_id``."""
+        return self._entry(self._index.payload(record_id))[1]
+
+    def country(self, record_id):
+        """Return the member state code stored for ``record_id``, if any."""
+        return self._entry(self._index.payload(record_id))[0]
+
+    def _candidates(self, tokens, limit):
+        return [(r, self._entry(payload))
+                for r, payload, shared in self._ranked(_block_keys(tokens),
+                                                       limit)]
+
+    def candidates(self, address, country=None, limit=100):
+        """Return up to ``limit`` (record_id, address) tuples for stored
+        addresses that share blocks with ``address`` (which may be a
+        :py:class:`Fingerprint`), most shared blocks first."""
+        return [(r, e[1])
+                for r, e in self._candidates(_tokens(address, country),
+                                             limit)]
+
+    def search(self, address, country=None, threshold=0.65, limit=100):
+        """Score the candidates for ``address`` using :py:func:`compare`,
+        returning a list of (record_id, score) tuples for those that score
+        at least ``threshold``, best first.  If ``country`` is not given,
+        ``address`` is normalised for each stored address's member state."""
+        tokens = _tokens(address, country)
+        is_fp = isinstance(address, Fingerprint)
+        if country is None and is_fp:
+            country = address.country
+        by_country = {}
+        results = []
+        for record_id, (ms, addr) in self._candidates(tokens, limit):
+            query = tokens
+            if country is None and ms is not None and not is_fp:
+                query = by_country.get(ms, None)
+                if query is None:
+                    query = by_country[ms] = _normalize(address, ms)
+            score = _compare_tokens(query, _normalize(addr, ms or country))
+            if score >= threshold:
+                results.append((record_id, score))
+        results.sort(key=lambda r: (-r[1], r[0]))
+        return results
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, division
+
+import itertools
+import sys
+import time
+
+from . import addresscmp
+from ._pool import submit_bounded
+
+def _score_pairs(chunk, threshold, country):
+    matches = []
+    for id_a, a, id_b, b in chunk:
+        score = addresscmp.compare(a, b, country)
+        if score >= threshold:
+            matches.append((id_a, id_b, score))
+    return len(chunk), matches
+
+def _score_blocks(chunk, threshold, country):
+    count = 0
+    matches = []
+    for block in chunk:
+        fps = [(r, a if isinstance(a, addresscmp.Fingerprint)
+                else addresscmp.Fingerprint(a, country))
+               for r, a in block]
+        for n, (id_a, a) in enumerate(fps):
+            for id_b, b in fps[n + 1:]:
+                score = addresscmp.compare(a, b)
+                if score >= threshold:
+                    matches.append((id_a, id_b, score))
+            count += len(fps) - n - 1
+    return count, matches
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _run(fn, chunks, threshold, country, processes, progress):
+    count = 0
+    matched = 0
+    start = time.time()
+
+    def report(result):
+        n, matches = result
+        if progress is not None:
+            progress(count + n, matched + len(matches), time.time() - start)
+        return n, matches
+
+    if processes is not None and processes < 2:
+        for chunk in chunks:
+            n, matches = report(fn(chunk, threshold, country))
+            count += n
+            matched += len(matches)
+            for m in matches:
+                yield m
+        return
+
+    def submit(pool, chunk):
+        return pool.apply_async(fn, (chunk, threshold, country))
+
+    for result in submit_bounded(submit, chunks, processes):
+        n, matches = report(result.get())
+        count += n
+        matched += len(matches)
+        for m in matches:
+            yield m
+
+def score_pairs(pairs, threshold=0.65, country=None, processes=None,
+                chunksize=1000, progress=None):
+    """Score a stream of address pairs using :py:func:`vat.addresscmp.compare`
+    across a pool of worker processes, yielding (id_a, id_b, score) for
+    each pair scoring at least ``threshold``.
+
+    ``pairs`` is an iterable of (id_a, address_a, id_b, address_b) tuples;
+    the addresses can be strings or :py:class:`vat.addresscmp.Fingerprint`
+    objects, and are sent to the workers ``chunksize`` pairs at a time.
+
+    ``processes`` is the size of the pool (by default, the number of CPUs);
+    if it is less than 2, everything happens in this process.  ``progress``,
+    if given, is called after every chunk as
+    ``progress(pairs_scored, matches, elapsed_seconds)``; see
+    :py:class:`Throughput`.
+
+    Matches are yielded in the same order as the input, and no more than a
+    few chunks per process are read ahead of the output."""
+    return _run(_score_pairs, _chunks(pairs, chunksize), threshold, country,
+                processes, progress)
+
+def score_blocks(blocks, threshold=0.65, country=None, processes=None,
+                 chunksize=100, progress=None):
+    """Like :py:func:`score_pairs`, but takes an iterable of blocks, each a
+    sequence of (id, address) tuples, and scores every pair within each
+    block.  Each address is only fingerprinted once per block, and only the
+    blocks themselves need to be sent to the worker processes."""
+    return _run(_score_blocks, _chunks(blocks, chunksize), threshold, country,
+                processes, progress)
+
+class UnionFind (object):
+    """A disjoint-set forest, used to turn matching pairs into clusters."""
+    def __init__(self):
+        self.parent = {}
+        self.rank = {}
+
+    def find(self, x):
+        """Return the representative of the set containing x."""
+        parent = self.parent
+        if x not in parent:
+            parent[x] = x
+            self.rank[x] = 0
+            return x
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, x, y):
+        """Merge the sets containing x and y."""
+        x = self.find(x)
+        y = self.find(y)
+        if x == y:
+            return x
+        if self.rank[x] < self.rank[y]:
+            x, y = y, x
+        self.parent[y] = x
+        if self.rank[x] == self.rank[y]:
+            self.rank[x] += 1
+        return x
+
+    def groups(self):
+        """Return a list of sets, one per disjoint set."""
+        groups = {}
+        for x in self.parent:
+            groups.setdefault(self.find(x), set()).add(x)
+        return list(groups.values())
+
+def clusters(matches):
+    """Given an iterable of matches (tuples starting (id_a, id_b, ...), as
+    yielded by :py:func:`score_pairs`), return a list of clusters of ids that
+    are transitively linked by those matches.  Ids that were never matched
+    with anything do not appear."""
+    uf = UnionFind()
+    for m in matches:
+        uf.union(m[0], m[1])
+    return uf.groups()
+
+class Throughput (object):
+    """A ``progress`` callback that writes a throughput line to ``stream``
+    (by default, ``sys.stderr``) at most once every ``interval`` seconds."""
+    def __init__(self, stream=None, interval=5.0):
+        self.stream = stream
+        self.interval = interval
+        self.last = None
+
+    def __call__(self, pairs, matches, elapsed):
+        if self.last is not None and elapsed - self.last < self.interval:
+            return
+        self.last = elapsed
+        stream = self.stream or sys.stderr
+        rate = pairs / elapsed if elapsed > 0 else 0.0
+        stream.write('%d pairs scored, %d matches, %.0f pairs/s\n'
+                     % (pairs, matches, rate))
+        stream.flush()
@@ -6,6 +6,7 @@ from decimal import Decimal as d
 import datetime
 import re
 from .rates import RateCache
+from .vrws import STANDARD, REDUCED
 
 _alpha_2_map = {}
 _code_map = {}
@@ -79,27 +80,24 @@ class MemberState(object):
         _alpha_2_map[iso_alpha_2] = self
         _code_map[code] = self
 
+    def _rate_table(self):
+        return _rate_cache.table((self.code,))
+
     @property
     def standard_rate(self):
-        return _rate_cache.standard_rate(self.code).rate / 100
+        return self._rate_table().get(self.code, STANDARD)
 
     @property
     def reduced_rates(self):
-        return tuple([r.rate/100 for r in _rate_cache.reduced_rates(self.code) if r.detail not in ('Super Reduced', 'Parking')])
+        return tuple([rate for detail, rate in self._rate_table().details(self.code, REDUCED) if detail not in ('Super Reduced', 'Parking')])
 
     @property
     def super_reduced_rate(self):
-        for r in _rate_cache.reduced_rates(self.code):
-            if r.detail == 'Super Reduced':
-                return r.rate / 100
-        return None
+        return self._rate_table().get(self.code, REDUCED, detail='Super Reduced')
 
     @property
     def parking_rate(self):
-        for r in _rate_cache.reduced_rates(self.code):
-            if r.detail == 'Parking':
-                return r.rate / 100
-        return None
+        return self._rate_table().get(self.code, REDUCED, detail='Parking')
     
     @staticmethod
     def by_code(code):
@@ -1 +1,3 @@
-from .metaphone import doublemetaphone, dm
+from .metaphone import doublemetaphone, dm, doublemetaphone_many, \
+     cache_info, cache_clear, set_cache_size, set_dictionary
+from .index import PhoneticIndex
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed double metaphone codes, in a file that can be memory-mapped.
+
+A dictionary file is built from a word list with build() (or by running this
+module as a script), and installed with vat.metaphone.set_dictionary().  The
+encoder then looks words up in the file before running the algorithm.  The
+file is opened read-only, so any number of processes can share one copy.
+
+Only ASCII words are stored, keyed by their upper-case form; for those, the
+double metaphone codes depend only on that key, so a lookup always gives the
+same answer as running the algorithm would.
+
+The file holds the entries in sorted order, followed by an open-addressing
+hash table over them, so that a lookup normally touches only one entry:
+
+    header   magic (8 bytes), entry count (u32), slot count (u32)
+    entries  entry count x u32 offsets of each entry's data, in key order
+    slots    slot count x u32, each 0 (empty) or 1 + an entry number
+    data     key NUL primary NUL secondary NUL, for each entry
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import io
+import mmap
+import struct
+import sys
+import zlib
+
+from .metaphone import DoubleMetaphone
+from .._fileutil import write_atomically
+
+
+MAGIC = b'VATDMD01'
+
+_header = struct.Struct(str('<8sII'))
+_u32 = struct.Struct(str('<I'))
+
+
+def _key(word):
+    try:
+        if isinstance(word, bytes):
+            word.decode('ascii')
+            key = word.upper()
+        else:
+            key = word.encode('ascii').upper()
+    except (UnicodeDecodeError, UnicodeEncodeError):
+        return None
+    if not key or b'\0' in key:
+        return None
+    return key
+
+
+def _hash(key):
+    return zlib.crc32(key) & 0xffffffff
+
+
+def build(words, path):
+    """
+    Encode the ASCII words in the iterable words and write them to a
+    dictionary file at path (replacing any existing file atomically).
+    Non-ASCII words are skipped.  Returns the number of entries written.
+    """
+    keys = set()
+    for word in words:
+        key = _key(word)
+        if key is not None:
+            keys.add(key)
+    keys = sorted(keys)
+
+    encoder = DoubleMetaphone()
+    nslots = max(1, 2 * len(keys))
+    data_at = _header.size + _u32.size * (len(keys) + nslots)
+
+    offsets = []
+    slots = [0] * nslots
+    data = []
+    offset = data_at
+    for n, key in enumerate(keys):
+        primary, secondary = encoder.parse(key.decode('ascii'))
+        entry = b'\0'.join([key, primary.encode('ascii'),
+                            secondary.encode('ascii'), b''])
+        offsets.append(offset)
+        data.append(entry)
+        offset += len(entry)
+
+        slot = _hash(key) % nslots
+        while slots[slot]:
+            slot = (slot + 1) % nslots
+        slots[slot] = n + 1
+
+    write_atomically(path, [_header.pack(MAGIC, len(keys), nslots),
+                            struct.pack(str('<%dI' % len(offsets)), *offsets),
+                            struct.pack(str('<%dI' % nslots), *slots),
+                            b''.join(data)])
+    return len(keys)
+
+
+class PhoneticDictionary(object):
+    """
+    A read-only, memory-mapped dictionary file written by build().
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._nslots = _header.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError('%s is not a phonetic dictionary' % path)
+        self._entries_at = _header.size
+        self._slots_at = self._entries_at + _u32.size * self._count
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, n):
+        m = self._map
+        offset = _u32.unpack_from(m, self._entries_at + _u32.size * n)[0]
+        key_end = m.find(b'\0', offset)
+        primary_end = m.find(b'\0', key_end + 1)
+        secondary_end = m.find(b'\0', primary_end + 1)
+        return (m[offset:key_end],
+                m[key_end + 1:primary_end].decode('ascii'),
+                m[primary_end + 1:secondary_end].decode('ascii'))
+
+    def lookup(self, word):
+        """
+        Return the double metaphone codes for word, or None if it isn't in
+        the dictionary.
+        """
+        key = _key(word)
+        if key is None:
+            return None
+        m = self._map
+        unpack_from = _u32.unpack_from
+        nslots = self._nslots
+        slots_at = self._slots_at
+        entries_at = self._entries_at - 4
+        slot = _hash(key) % nslots
+        key += b'\0'
+        key_len = len(key)
+        while True:
+            n = unpack_from(m, slots_at + 4 * slot)[0]
+            if not n:
+                return None
+            offset = unpack_from(m, entries_at + 4 * n)[0]
+            if m[offset:offset + key_len] == key:
+                offset += key_len
+                primary_end = m.find(b'\0', offset)
+                secondary_end = m.find(b'\0', primary_end + 1)
+                return (m[offset:primary_end].decode('ascii'),
+                        m[primary_end + 1:secondary_end].decode('ascii'))
+            slot = (slot + 1) % nslots
+
+    def __contains__(self, word):
+        return self.lookup(word) is not None
+
+    def __iter__(self):
+        """
+        Yield (key, primary, secondary) for each entry, in key order.
+        """
+        for n in range(self._count):
+            key, primary, secondary = self._entry(n)
+            yield key.decode('ascii'), primary, secondary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Build a precomputed double metaphone dictionary.')
+    parser.add_argument('wordlist', nargs='+',
+                        help='files containing words, one per line')
+    parser.add_argument('-o', '--output', required=True,
+                        help='the dictionary file to write')
+    args = parser.parse_args(argv)
+
+    def words():
+        for path in args.wordlist:
+            with io.open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    word = line.strip()
+                    if word:
+                        yield word
+
+    count = build(words(), args.output)
+    print('Wrote %d words to %s' % (count, args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+An index for finding names that sound alike.
+
+Each word of a name is filed under its primary and secondary double metaphone
+codes, so a query only needs to look at the names that share a code with it,
+rather than encoding every stored name.  The index is backed by the same
+inverted index as vat.addresscmp.AddressIndex, and so can be saved to disk
+and memory-mapped back.
+
+Words that the encoder gives no code for (numbers, or words in non-Latin
+scripts) are ignored; names in other scripts should be transliterated before
+being added or queried.
+"""
+from __future__ import unicode_literals
+import re
+
+from .metaphone import doublemetaphone
+from .. import _postings
+
+
+_word_re = re.compile(r'\w+', re.UNICODE)
+
+
+def _codes(name):
+    """
+    Return the set of double metaphone codes for the words in name.
+    """
+    codes = set()
+    for word in _word_re.findall(name):
+        primary, secondary = doublemetaphone(word)
+        if primary:
+            codes.add(primary)
+        if secondary:
+            codes.add(secondary)
+    return codes
+
+
+class PhoneticIndex(_postings.BlockingIndex):
+    """
+    An index of names (for instance trader names) by their double metaphone
+    codes.
+
+    query() returns the stored names sharing codes with a given name, ranked
+    by the number of codes they share.  Codes shared by more than
+    max_block_size names (typically words like "LIMITED" or "GMBH") are
+    ignored when querying.
+
+    Indexes can be saved with save() and memory-mapped back with load(); a
+    loaded index may still be added to or removed from.
+    """
+    def add(self, record_id, name):
+        """
+        Add a name, replacing any existing entry for record_id, which must be
+        a string.
+        """
+        self._index.add(record_id, name, _codes(name))
+
+    def name(self, record_id):
+        """
+        Return the name stored for record_id.
+        """
+        return self._index.payload(record_id)
+
+    def query(self, name, limit=100):
+        """
+        Return up to limit (record_id, name, matched) tuples for the stored
+        names that share double metaphone codes with name, where matched is
+        the number of codes shared; the most matched codes come first.
+        """
+        return self._ranked(_codes(name), limit)
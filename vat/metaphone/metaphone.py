@@ -44,27 +44,35 @@ created by Andrew Collins on January 12, 2007, using the C source
   Updated 2013-06    - Enforced unicode literals (0.5; Ian Beaver)
 """
 from __future__ import unicode_literals
+import collections
+import itertools
+import threading
 from .word import Word
+from .._pool import submit_bounded
 
 
-VOWELS = ['A', 'E', 'I', 'O', 'U', 'Y']
-SILENT_STARTERS = ["GN", "KN", "PN", "WR", "PS"]
+VOWELS = frozenset(['A', 'E', 'I', 'O', 'U', 'Y'])
+SILENT_STARTERS = frozenset(["GN", "KN", "PN", "WR", "PS"])
 
 
 class DoubleMetaphone(object):
     """
+    Each process_* method looks at the character at the current position and
+    returns a tuple (primary, secondary, advance): the codes to add to the
+    primary and secondary encodings (either may be empty or None) and how
+    many characters to move forward.  A method that returns None leaves the
+    previous step's result in effect, as the original implementation did.
+
+    An instance can be reused for any number of calls to parse(), but not
+    from more than one thread at a time.
     """
+    __slots__ = ('word', 'position', 'primary', 'secondary')
+
     def __init__(self):
+        self.word = None
         self.position = 0
-        self.primary_phone = ""
-        self.secondary_phone = ""
-        # next is used set to a tuple of the next characters in the primary and
-        # secondary codes and to indicate how many characters to move forward
-        # in the string.  The secondary code letter is given only when it is
-        # different than the primary. This is just a trick to make the code
-        # easier to write and read. The default action is to add nothing and
-        # move to next char.
-        self.next = (None, 1)
+        self.primary = []
+        self.secondary = []
 
     def check_word_start(self):
         # skip these silent letters when at start of word
@@ -73,22 +81,21 @@ class DoubleMetaphone(object):
         # Initial 'X' is pronounced 'Z' e.g. 'Xavier'
         if self.word.get_letters(0) == 'X':
             # 'Z' maps to 'S'
-            self.primary_phone = self.secondary_phone = 'S'
+            self.primary.append('S')
+            self.secondary.append('S')
             self.position += 1
 
     def process_initial_vowels(self):
-        # XXX do we need this next set? it should already be done...
-        self.next = (None, 1)
         # all init vowels now map to 'A'
         if self.position == self.word.start_index:
-            self.next = ('A', 1)
+            return 'A', 'A', 1
+        return None, None, 1
 
     def process_b(self):
         # "-mb", e.g., "dumb", already skipped over... see 'M' below
         if self.word.buffer[self.position + 1] == 'B':
-            self.next = ('P', 2)
-        else:
-            self.next = ('P', 1)
+            return 'P', 'P', 2
+        return 'P', 'P', 1
 
     def process_c(self):
         buffer = self.word.buffer
@@ -97,115 +104,116 @@ class DoubleMetaphone(object):
         # various germanic
         if (position > start_index + 1
             and buffer[position - 2] not in VOWELS
-            and buffer[position - 1:self.position + 2] == 'ACH'
-            and buffer[position + 2] not in ['I']
-            and (buffer[position + 2] not in ['E']
-                 or buffer[position - 2:position + 4] in [
-                    'BACHER', 'MACHER'])):
-            self.next = ('K', 2)
+            and buffer[position - 1:position + 2] == 'ACH'
+            and buffer[position + 2] != 'I'
+            and (buffer[position + 2] != 'E'
+                 or buffer[position - 2:position + 4] in {
+                    'BACHER', 'MACHER'})):
+            return 'K', 'K', 2
         # special case 'CAESAR'
         elif (position == start_index
               and buffer[start_index:start_index + 6] == 'CAESAR'):
-            self.next = ('S', 2)
+            return 'S', 'S', 2
         # italian 'chianti'
         elif buffer[position:position + 4] == 'CHIA':
-            self.next = ('K', 2)
+            return 'K', 'K', 2
         elif buffer[position:position + 2] == 'CH':
             # find 'michael'
             if (position > start_index
                 and buffer[position:position + 4] == 'CHAE'):
-                self.next = ('K', 'X', 2)
+                return 'K', 'X', 2
             elif (position == start_index
-                  and (buffer[position + 1:position + 6] in ['HARAC', 'HARIS']
-                  or buffer[position + 1:position + 4] in ["HOR", "HYM", "HIA",
-                                                           "HEM"])
+                  and (buffer[position + 1:position + 6] in {'HARAC', 'HARIS'}
+                  or buffer[position + 1:position + 4] in {"HOR", "HYM", "HIA",
+                                                           "HEM"})
                   and buffer[start_index:start_index + 5] != 'CHORE'):
-                self.next = ('K', 2)
+                return 'K', 'K', 2
             # germanic, greek, or otherwise 'ch' for 'kh' sound
             elif (
-                buffer[start_index:start_index + 4] in ['VAN ', 'VON ']
+                buffer[start_index:start_index + 4] in {'VAN ', 'VON '}
                 or buffer[start_index:start_index + 3] == 'SCH'
-                or buffer[position - 2:position + 4] in ["ORCHES", "ARCHIT",
-                                                         "ORCHID"]
-                or buffer[position + 2] in ['T', 'S']
+                or buffer[position - 2:position + 4] in {"ORCHES", "ARCHIT",
+                                                         "ORCHID"}
+                or buffer[position + 2] in {'T', 'S'}
                 or (
-                    (buffer[position - 1] in ["A", "O", "U", "E"]
+                    (buffer[position - 1] in {"A", "O", "U", "E"}
                      or position == start_index)
-                    and (buffer[position + 2] in [
-                        "L", "R", "N", "M", "B", "H", "F", "V", "W"]))):
-                self.next = ('K', 2)
+                    and (buffer[position + 2] in {
+                        "L", "R", "N", "M", "B", "H", "F", "V", "W"}))):
+                return 'K', 'K', 2
             else:
                 if position > start_index:
                     if buffer[start_index:start_index + 2] == 'MC':
-                        self.next = ('K', 2)
+                        return 'K', 'K', 2
                     else:
-                        self.next = ('X', 'K', 2)
+                        return 'X', 'K', 2
                 else:
-                    self.next = ('X', 2)
+                    return 'X', 'X', 2
         # e.g, 'czerny'
         elif (buffer[position:position + 2] == 'CZ'
               and buffer[position - 2:position + 2] != 'WICZ'):
-            self.next = ('S', 'X', 2)
+            return 'S', 'X', 2
         # e.g., 'focaccia'
         elif buffer[position + 1:position + 4] == 'CIA':
-            self.next = ('X', 3)
+            return 'X', 'X', 3
         # double 'C', but not if e.g. 'McClellan'
         elif (
             buffer[position:position + 2] == 'CC'
             and not (position == (start_index + 1)
                      and buffer[start_index] == 'M')):
             #'bellocchio' but not 'bacchus'
-            if (buffer[position + 2] in ["I", "E", "H"]
+            if (buffer[position + 2] in {"I", "E", "H"}
                 and buffer[position + 2:position + 4] != 'HU'):
                 # 'accident', 'accede' 'succeed'
                 if (
                     (position == (start_index + 1)
                      and buffer[start_index] == 'A')
-                    or buffer[position - 1:position + 4] in [
-                        'UCCEE', 'UCCES']):
-                    self.next = ('KS', 3)
+                    or buffer[position - 1:position + 4] in {
+                        'UCCEE', 'UCCES'}):
+                    return 'KS', 'KS', 3
                 # 'bacci', 'bertucci', other italian
                 else:
-                    self.next = ('X', 3)
+                    return 'X', 'X', 3
             else:
-                self.next = ('K', 2)
-        elif buffer[position:position + 2] in ["CK", "CG", "CQ"]:
-            self.next = ('K', 2)
-        elif buffer[position:position + 2] in ["CI", "CE", "CY"]:
+                return 'K', 'K', 2
+        elif buffer[position:position + 2] in {"CK", "CG", "CQ"}:
+            return 'K', 'K', 2
+        elif buffer[position:position + 2] in {"CI", "CE", "CY"}:
             # italian vs. english
-            if buffer[position:position + 3] in ["CIO", "CIE", "CIA"]:
-                self.next = ('S', 'X', 2)
+            if buffer[position:position + 3] in {"CIO", "CIE", "CIA"}:
+                return 'S', 'X', 2
             else:
-                self.next = ('S', 2)
+                return 'S', 'S', 2
         else:
             # name sent in 'mac caffrey', 'mac gregor'
-            if buffer[position + 1:position + 3] in [" C", " Q", " G"]:
-                self.next = ('K', 3)
+            if buffer[position + 1:position + 3] in {" C", " Q", " G"}:
+                return 'K', 'K', 3
             else:
-                if (buffer[position + 1] in ["C", "K", "Q"]
-                    and buffer[position + 1:position + 3] not in ["CE", "CI"]):
-                    self.next = ('K', 2)
+                if (buffer[position + 1] in {"C", "K", "Q"}
+                    and buffer[position + 1:position + 3] not in {"CE", "CI"}):
+                    return 'K', 'K', 2
                 # default for 'C'
                 else:
-                    self.next = ('K', 1)
+                    return 'K', 'K', 1
 
     def process_d(self):
-        if self.word.buffer[self.position:self.position + 2] == 'DG':
+        buffer = self.word.buffer
+        position = self.position
+        if buffer[position:position + 2] == 'DG':
             # e.g. 'edge'
-            if self.word.buffer[self.position + 2] in ['I', 'E', 'Y']:
-                self.next = ('J', 3)
+            if buffer[position + 2] in {'I', 'E', 'Y'}:
+                return 'J', 'J', 3
             else:
-                self.next = ('TK', 2)
-        elif self.word.buffer[self.position:self.position + 2] in ['DT', 'DD']:
-            self.next = ('T', 2)
+                return 'TK', 'TK', 2
+        elif buffer[position:position + 2] in {'DT', 'DD'}:
+            return 'T', 'T', 2
         else:
-            self.next = ('T', 1)
+            return 'T', 'T', 1
 
     def process_f(self):
         if self.word.buffer[self.position + 1] == 'F':
-            self.next = ('F', 2)
-        else:
-            self.next = ('F', 1)
+            return 'F', 'F', 2
+        return 'F', 'F', 1
 
     def process_g(self):
         buffer = self.word.buffer
@@ -214,142 +222,142 @@ class DoubleMetaphone(object):
         if buffer[position + 1] == 'H':
             if (position > start_index
                 and buffer[position - 1] not in VOWELS):
-                self.next = ('K', 2)
+                return 'K', 'K', 2
             elif position < (start_index + 3):
                 # 'ghislane', ghiradelli
                 if position == start_index:
                     if buffer[position + 2] == 'I':
-                        self.next = ('J', 2)
+                        return 'J', 'J', 2
                     else:
-                        self.next = ('K', 2)
+                        return 'K', 'K', 2
             # Parker's rule (with some further refinements) - e.g., 'hugh'
             elif (
                 (position > (start_index + 1)
-                 and buffer[position - 2] in ['B', 'H', 'D'])
+                 and buffer[position - 2] in {'B', 'H', 'D'})
                 or (position > (start_index + 2)
-                 and buffer[position - 3] in ['B', 'H', 'D'])
+                 and buffer[position - 3] in {'B', 'H', 'D'})
                 or (position > (start_index + 3)
-                 and buffer[position - 4] in ['B', 'H'])):
-                self.next = (None, 2)
+                 and buffer[position - 4] in {'B', 'H'})):
+                return None, None, 2
             else:
                 # e.g., 'laugh', 'McLaughlin', 'cough', 'gough', 'rough',
                 # 'tough'
                 if (position > (start_index + 2)
                     and buffer[position - 1] == 'U'
-                    and buffer[position - 3] in [
-                        "C", "G", "L", "R", "T"]):
-                    self.next = ('F', 2)
+                    and buffer[position - 3] in {
+                        "C", "G", "L", "R", "T"}):
+                    return 'F', 'F', 2
                 else:
                     if (position > start_index
                         and buffer[position - 1] != 'I'):
-                        self.next = ('K', 2)
+                        return 'K', 'K', 2
         elif buffer[position + 1] == 'N':
             if (position == (start_index + 1)
                 and buffer[start_index] in VOWELS
                 and not self.word.is_slavo_germanic):
-                self.next = ('KN', 'N', 2)
+                return 'KN', 'N', 2
             else:
                 # not e.g. 'cagney'
                 if (buffer[position + 2:position + 4] != 'EY'
                     and buffer[position + 1] != 'Y'
                     and not self.word.is_slavo_germanic):
-                    self.next = ('N', 'KN', 2)
+                    return 'N', 'KN', 2
                 else:
-                    self.next = ('KN', 2)
+                    return 'KN', 'KN', 2
         # 'tagliaro'
         elif (buffer[position + 1:position + 3] == 'LI'
               and not self.word.is_slavo_germanic):
-            self.next = ('KL', 'L', 2)
+            return 'KL', 'L', 2
         # -ges-,-gep-,-gel-, -gie- at beginning
         elif (position == start_index
               and (buffer[position + 1] == 'Y'
-              or buffer[position + 1:position + 3] in [
+              or buffer[position + 1:position + 3] in {
                 "ES", "EP", "EB", "EL", "EY", "IB", "IL", "IN", "IE", "EI",
-                "ER"])):
-            self.next = ('K', 'J', 2)
+                "ER"})):
+            return 'K', 'J', 2
         # -ger-,  -gy-
         elif (
             (buffer[position + 1:position + 3] == 'ER'
              or buffer[position + 1] == 'Y')
-            and buffer[start_index:start_index + 6] not in [
-                "DANGER", "RANGER", "MANGER"]
-            and buffer[position - 1] not in ['E', 'I']
-            and buffer[position - 1:position + 2] not in ['RGY', 'OGY']):
-            self.next = ('K', 'J', 2)
+            and buffer[start_index:start_index + 6] not in {
+                "DANGER", "RANGER", "MANGER"}
+            and buffer[position - 1] not in {'E', 'I'}
+            and buffer[position - 1:position + 2] not in {'RGY', 'OGY'}):
+            return 'K', 'J', 2
         # italian e.g, 'biaggi'
         elif (
-            buffer[position + 1] in ['E', 'I', 'Y']
-            or buffer[position - 1:position + 3] in [
-                "AGGI", "OGGI"]):
+            buffer[position + 1] in {'E', 'I', 'Y'}
+            or buffer[position - 1:position + 3] in {
+                "AGGI", "OGGI"}):
             # obvious germanic
-            if (buffer[start_index:start_index + 4] in ['VON ', 'VAN ']
+            if (buffer[start_index:start_index + 4] in {'VON ', 'VAN '}
                 or buffer[start_index:start_index + 3] == 'SCH'
                 or buffer[position + 1:position + 3] == 'ET'):
-                self.next = ('K', 2)
+                return 'K', 'K', 2
             else:
                 # always soft if french ending
                 if buffer[position + 1:position + 5] == 'IER ':
-                    self.next = ('J', 2)
+                    return 'J', 'J', 2
                 else:
-                    self.next = ('J', 'K', 2)
+                    return 'J', 'K', 2
         elif buffer[position + 1] == 'G':
-            self.next = ('K', 2)
+            return 'K', 'K', 2
         else:
-            self.next = ('K', 1)
+            return 'K', 'K', 1
 
     def process_h(self):
+        buffer = self.word.buffer
+        position = self.position
         # only keep if self.word.start_index & before vowel or btw. 2 vowels
-        if ((self.position == self.word.start_index
-             or self.word.buffer[self.position - 1] in VOWELS)
-            and self.word.buffer[self.position + 1] in VOWELS):
-            self.next = ('H', 2)
+        if ((position == self.word.start_index
+             or buffer[position - 1] in VOWELS)
+            and buffer[position + 1] in VOWELS):
+            return 'H', 'H', 2
         # (also takes care of 'HH')
         else:
-            self.next = (None, 1)
+            return None, None, 1
 
     def process_j(self):
         buffer = self.word.buffer
         position = self.position
         start_index = self.word.start_index
         # obvious spanish, 'jose', 'san jacinto'
-        if (buffer[self.position:self.position + 4] == 'JOSE'
+        if (buffer[position:position + 4] == 'JOSE'
             or buffer[start_index:start_index + 4] == 'SAN '):
             if (
                 (position == start_index and buffer[position + 4] == ' ')
                 or buffer[start_index:start_index + 4] == 'SAN '):
-                self.next = ('H', )
+                primary = secondary = 'H'
             else:
-                self.next = ('J', 'H')
+                primary, secondary = 'J', 'H'
         # Yankelovich/Jankelowicz
         elif (position == start_index
-              and buffer[self.position:self.position + 4] != 'JOSE'):
-            self.next = ('J', 'A')
+              and buffer[position:position + 4] != 'JOSE'):
+            primary, secondary = 'J', 'A'
         else:
             # spanish pron. of e.g. 'bajador'
             if (buffer[position - 1] in VOWELS
                 and not self.word.is_slavo_germanic
-                and buffer[position + 1] in ['A', 'O']):
-                self.next = ('J', 'H')
+                and buffer[position + 1] in {'A', 'O'}):
+                primary, secondary = 'J', 'H'
             else:
                 if position == self.word.end_index:
-                    self.next = ('J', ' ')
+                    primary, secondary = 'J', ' '
                 else:
-                    if (buffer[position + 1] not in ["L", "T", "K", "S", "N",
-                                               "M", "B", "Z"]
-                        and buffer[position - 1] not in ["S", "K", "L"]):
-                        self.next = ('J',)
+                    if (buffer[position + 1] not in {"L", "T", "K", "S", "N",
+                                                     "M", "B", "Z"}
+                        and buffer[position - 1] not in {"S", "K", "L"}):
+                        primary = secondary = 'J'
                     else:
-                        self.next = (None, )
+                        primary = secondary = None
         if buffer[position + 1] == 'J':
-            self.next = self.next + (2,)
-        else:
-            self.next = self.next + (1,)
+            return primary, secondary, 2
+        return primary, secondary, 1
 
     def process_k(self):
         if self.word.buffer[self.position + 1] == 'K':
-            self.next = ('K', 2)
-        else:
-            self.next = ('K', 1)
+            return 'K', 'K', 2
+        return 'K', 'K', 1
 
     def process_l(self):
         buffer = self.word.buffer
@@ -358,16 +366,16 @@ class DoubleMetaphone(object):
         if buffer[position + 1] == 'L':
             # spanish e.g. 'cabrillo', 'gallegos'
             if ((position == (end_index - 2)
-                 and buffer[position - 1:position + 3] in [
-                    "ILLO", "ILLA", "ALLE"])
-                or ((buffer[end_index - 1:end_index + 1] in ["AS", "OS"]
-                     or buffer[end_index] in ["A", "O"])
+                 and buffer[position - 1:position + 3] in {
+                    "ILLO", "ILLA", "ALLE"})
+                or ((buffer[end_index - 1:end_index + 1] in {"AS", "OS"}
+                     or buffer[end_index] in {"A", "O"})
                     and buffer[position - 1:position + 3] == 'ALLE')):
-                self.next = ('L', '', 2)
+                return 'L', '', 2
             else:
-                self.next = ('L', 2)
+                return 'L', 'L', 2
         else:
-            self.next = ('L', 1)
+            return 'L', 'L', 1
 
     def process_m(self):
         buffer = self.word.buffer
@@ -376,30 +384,30 @@ class DoubleMetaphone(object):
              and (position + 1 == self.word.end_index
                   or buffer[position + 2:position + 4] == 'ER'))
             or buffer[position + 1] == 'M'):
-            self.next = ('M', 2)
+            return 'M', 'M', 2
         else:
-            self.next = ('M', 1)
+            return 'M', 'M', 1
 
     def process_n(self):
         if self.word.buffer[self.position + 1] == 'N':
-            self.next = ('N', 2)
-        else:
-            self.next = ('N', 1)
+            return 'N', 'N', 2
+        return 'N', 'N', 1
 
     def process_p(self):
-        if self.word.buffer[self.position + 1] == 'H':
-            self.next = ('F', 2)
+        buffer = self.word.buffer
+        position = self.position
+        if buffer[position + 1] == 'H':
+            return 'F', 'F', 2
         # also account for "campbell", "raspberry"
-        elif self.word.buffer[self.position + 1] in ['P', 'B']:
-            self.next = ('P', 2)
+        elif buffer[position + 1] in {'P', 'B'}:
+            return 'P', 'P', 2
         else:
-            self.next = ('P', 1)
+            return 'P', 'P', 1
 
     def process_q(self):
         if self.word.buffer[self.position + 1] == 'Q':
-            self.next = ('K', 2)
-        else:
-            self.next = ('K', 1)
+            return 'K', 'K', 2
+        return 'K', 'K', 1
 
     def process_r(self):
         buffer = self.word.buffer
@@ -409,14 +417,13 @@ class DoubleMetaphone(object):
         if (position == end_index
             and not self.word.is_slavo_germanic
             and buffer[position - 2:position] == 'IE'
-            and buffer[position - 4:position - 2] not in ['ME', 'MA']):
-            self.next = ('', 'R')
+            and buffer[position - 4:position - 2] not in {'ME', 'MA'}):
+            primary, secondary = '', 'R'
         else:
-            self.next = ('R',)
+            primary = secondary = 'R'
         if buffer[position + 1] == 'R':
-            self.next = self.next + (2,)
-        else:
-            self.next = self.next + (1,)
+            return primary, secondary, 2
+        return primary, secondary, 1
 
     def process_s(self):
         buffer = self.word.buffer
@@ -424,97 +431,94 @@ class DoubleMetaphone(object):
         start_index = self.word.start_index
         end_index = self.word.end_index
         # special cases 'island', 'isle', 'carlisle', 'carlysle'
-        if buffer[position - 1:position + 2] in ['ISL', 'YSL']:
-            self.next = (None, 1)
+        if buffer[position - 1:position + 2] in {'ISL', 'YSL'}:
+            return None, None, 1
         # special case 'sugar-'
         elif (position == start_index
               and buffer[start_index:start_index + 5] == 'SUGAR'):
-            self.next = ('X', 'S', 1)
+            return 'X', 'S', 1
         elif buffer[position:position + 2] == 'SH':
             # germanic
-            if buffer[position + 1:position + 5] in [
-                "HEIM", "HOEK", "HOLM", "HOLZ"]:
-                self.next = ('S', 2)
+            if buffer[position + 1:position + 5] in {
+                "HEIM", "HOEK", "HOLM", "HOLZ"}:
+                return 'S', 'S', 2
             else:
-                self.next = ('X', 2)
+                return 'X', 'X', 2
         # italian & armenian
-        elif (buffer[position:position + 3] in ["SIO", "SIA"]
+        elif (buffer[position:position + 3] in {"SIO", "SIA"}
               or buffer[position:position + 4] == 'SIAN'):
             if not self.word.is_slavo_germanic:
-                self.next = ('S', 'X', 3)
+                return 'S', 'X', 3
             else:
-                self.next = ('S', 3)
+                return 'S', 'S', 3
         # german & anglicisations, e.g. 'smith' match 'schmidt', 'snider'
         # match 'schneider' also, -sz- in slavic language altho in
         # hungarian it is pronounced 's'
         elif ((position == start_index
-               and buffer[position + 1] in ["M", "N", "L", "W"])
+               and buffer[position + 1] in {"M", "N", "L", "W"})
               or buffer[position + 1] == 'Z'):
-            self.next = ('S', 'X')
             if buffer[position + 1] == 'Z':
-                self.next = self.next + (2,)
+                return 'S', 'X', 2
             else:
-                self.next = self.next + (1,)
+                return 'S', 'X', 1
         elif buffer[position:position + 2] == 'SC':
             # Schlesinger's rule
             if buffer[position + 2] == 'H':
                 # dutch origin, e.g. 'school', 'schooner'
-                if buffer[position + 3:position + 5] in [
-                    "OO", "ER", "EN", "UY", "ED", "EM"]:
+                if buffer[position + 3:position + 5] in {
+                    "OO", "ER", "EN", "UY", "ED", "EM"}:
                     # 'schermerhorn', 'schenker'
-                    if buffer[position + 3:position + 5] in ['ER', 'EN']:
-                        self.next = ('X', 'SK', 3)
+                    if buffer[position + 3:position + 5] in {'ER', 'EN'}:
+                        return 'X', 'SK', 3
                     else:
-                        self.next = ('SK', 3)
+                        return 'SK', 'SK', 3
                 else:
                     if (position == start_index
                         and buffer[start_index + 3] not in VOWELS
                         and buffer[start_index + 3] != 'W'):
-                        self.next = ('X', 'S', 3)
+                        return 'X', 'S', 3
                     else:
-                        self.next = ('X', 3)
-            elif buffer[position + 2] in ['I', 'E', 'Y']:
-                self.next = ('S', 3)
+                        return 'X', 'X', 3
+            elif buffer[position + 2] in {'I', 'E', 'Y'}:
+                return 'S', 'S', 3
             else:
-                self.next = ('SK', 3)
+                return 'SK', 'SK', 3
         # french e.g. 'resnais', 'artois'
         elif (position == end_index
-              and buffer[position - 2:position] in ['AI', 'OI']):
-            self.next = ('', 'S', 1)
+              and buffer[position - 2:position] in {'AI', 'OI'}):
+            return '', 'S', 1
         else:
-            self.next = ('S', )
-            if buffer[position + 1] in ['S', 'Z']:
-                self.next = self.next + (2,)
+            if buffer[position + 1] in {'S', 'Z'}:
+                return 'S', 'S', 2
             else:
-                self.next = self.next + (1,)
+                return 'S', 'S', 1
 
     def process_t(self):
         buffer = self.word.buffer
         position = self.position
         start_index = self.word.start_index
         if buffer[position:position + 4] == 'TION':
-            self.next = ('X', 3)
-        elif buffer[position:position + 3] in ['TIA', 'TCH']:
-            self.next = ('X', 3)
+            return 'X', 'X', 3
+        elif buffer[position:position + 3] in {'TIA', 'TCH'}:
+            return 'X', 'X', 3
         elif (buffer[position:position + 2] == 'TH'
               or buffer[position:position + 3] == 'TTH'):
             # special case 'thomas', 'thames' or germanic
-            if (buffer[position + 2:position + 4] in ['OM', 'AM']
-                or buffer[start_index:start_index + 4] in ['VON ', 'VAN ']
+            if (buffer[position + 2:position + 4] in {'OM', 'AM'}
+                or buffer[start_index:start_index + 4] in {'VON ', 'VAN '}
                 or buffer[start_index:start_index + 3] == 'SCH'):
-                self.next = ('T', 2)
+                return 'T', 'T', 2
             else:
-                self.next = ('0', 'T', 2)
-        elif buffer[position + 1] in ['T', 'D']:
-            self.next = ('T', 2)
+                return '0', 'T', 2
+        elif buffer[position + 1] in {'T', 'D'}:
+            return 'T', 'T', 2
         else:
-            self.next = ('T', 1)
+            return 'T', 'T', 1
 
     def process_v(self):
         if self.word.buffer[self.position + 1] == 'V':
-            self.next = ('F', 2)
-        else:
-            self.next = ('F', 1)
+            return 'F', 'F', 2
+        return 'F', 'F', 1
 
     def process_w(self):
         buffer = self.word.buffer
@@ -522,128 +526,234 @@ class DoubleMetaphone(object):
         start_index = self.word.start_index
         # can also be in middle of word
         if buffer[position:position + 2] == 'WR':
-            self.next = ('R', 2)
+            return 'R', 'R', 2
         elif (position == start_index
             and (buffer[position + 1] in VOWELS
                  or buffer[position:position + 2] == 'WH')):
             # Wasserman should match Vasserman
             if buffer[position + 1] in VOWELS:
-                self.next = ('A', 'F', 1)
+                return 'A', 'F', 1
             else:
-                self.next = ('A', 1)
+                return 'A', 'A', 1
         # Arnow should match Arnoff
         elif ((position == self.word.end_index
                and buffer[position - 1] in VOWELS)
-              or buffer[position - 1:position + 4] in [
-                "EWSKI", "EWSKY", "OWSKI", "OWSKY"]
+              or buffer[position - 1:position + 4] in {
+                "EWSKI", "EWSKY", "OWSKI", "OWSKY"}
               or buffer[start_index:start_index + 3] == 'SCH'):
-            self.next = ('', 'F', 1)
+            return '', 'F', 1
         # polish e.g. 'filipowicz'
-        elif buffer[position:position + 4] in ["WICZ", "WITZ"]:
-            self.next = ('TS', 'FX', 4)
+        elif buffer[position:position + 4] in {"WICZ", "WITZ"}:
+            return 'TS', 'FX', 4
         else:  # default is to skip it
-            self.next = (None, 1)
+            return None, None, 1
 
     def process_x(self):
         buffer = self.word.buffer
         position = self.position
         # french e.g. breaux
-        self.next = (None, )
+        code = None
         if not (
             position == self.word.end_index
-            and (buffer[position - 3:position] in ["IAU", "EAU"]
-                 or buffer[position - 2:position] in ['AU', 'OU'])):
-            self.next = ('KS',)
-        if buffer[position + 1] in ['C', 'X']:
-            self.next = self.next + (2,)
-        else:
-            self.next = self.next + (1,)
+            and (buffer[position - 3:position] in {"IAU", "EAU"}
+                 or buffer[position - 2:position] in {'AU', 'OU'})):
+            code = 'KS'
+        if buffer[position + 1] in {'C', 'X'}:
+            return code, code, 2
+        return code, code, 1
 
     def process_z(self):
+        buffer = self.word.buffer
+        position = self.position
         # chinese pinyin e.g. 'zhao'
-        if self.word.buffer[self.position + 1] == 'H':
-            self.next = ('J', )
+        if buffer[position + 1] == 'H':
+            primary = secondary = 'J'
         elif (
-            self.word.buffer[self.position + 1:self.position + 3] in [
-                "ZO", "ZI", "ZA"]
+            buffer[position + 1:position + 3] in {"ZO", "ZI", "ZA"}
             or (self.word.is_slavo_germanic
-                and self.position > self.word.start_index
-                and self.word.buffer[self.position - 1] != 'T')):
-            self.next = ('S', 'TS')
-        else:
-            self.next = ('S', )
-        if (self.word.buffer[self.position + 1] == 'Z'
-            or self.word.buffer[self.position + 1] == 'H'):
-            self.next = self.next + (2,)
+                and position > self.word.start_index
+                and buffer[position - 1] != 'T')):
+            primary, secondary = 'S', 'TS'
         else:
-            self.next = self.next + (1,)
+            primary = secondary = 'S'
+        if buffer[position + 1] in {'Z', 'H'}:
+            return primary, secondary, 2
+        return primary, secondary, 1
+
+    _dispatch = {}
 
     def parse(self, input):
-        self.word = Word(input)
-        self.position = self.word.start_index
+        self.word = word = Word(input)
+        self.position = word.start_index
+        del self.primary[:]
+        del self.secondary[:]
         self.check_word_start()
+
+        buffer = word.buffer
+        end_index = word.end_index
+        dispatch = self._dispatch
+        primary = self.primary
+        secondary = self.secondary
+        step = (None, None, 1)
+
         # loop through chars in word.buffer
-        while self.position <= self.word.end_index:
-            character = self.word.buffer[self.position]
-            if character in VOWELS:
-                self.process_initial_vowels()
-            elif character == ' ':
+        while self.position <= end_index:
+            character = buffer[self.position]
+            if character == ' ':
                 self.position += 1
                 continue
-            elif character == 'B':
-                self.process_b()
-            elif character == 'C':
-                self.process_c()
-            elif character == 'D':
-                self.process_d()
-            elif character == 'F':
-                self.process_f()
-            elif character == 'G':
-                self.process_g()
-            elif character == 'H':
-                self.process_h()
-            elif character == 'J':
-                self.process_j()
-            elif character == 'K':
-                self.process_k()
-            elif character == 'L':
-                self.process_l()
-            elif character == 'M':
-                self.process_m()
-            elif character == 'N':
-                self.process_n()
-            elif character == 'P':
-                self.process_p()
-            elif character == 'Q':
-                self.process_q()
-            elif character == 'R':
-                self.process_r()
-            elif character == 'S':
-                self.process_s()
-            elif character == 'T':
-                self.process_t()
-            elif character == 'V':
-                self.process_v()
-            elif character == 'W':
-                self.process_w()
-            elif character == 'X':
-                self.process_x()
-            elif character == 'Z':
-                self.process_z()
-            if len(self.next) == 2:
-                if self.next[0]:
-                    self.primary_phone += self.next[0]
-                    self.secondary_phone += self.next[0]
-                self.position += self.next[1]
-            elif len(self.next) == 3:
-                if self.next[0]:
-                    self.primary_phone += self.next[0]
-                if self.next[1]:
-                    self.secondary_phone += self.next[1]
-                self.position += self.next[2]
-        if self.primary_phone == self.secondary_phone:
-            self.secondary_phone = ""
-        return (self.primary_phone, self.secondary_phone)
+            process = dispatch.get(character, None)
+            if process is not None:
+                step = process(self) or step
+            code, alt_code, advance = step
+            if code:
+                primary.append(code)
+            if alt_code:
+                secondary.append(alt_code)
+            self.position += advance
+
+        primary_phone = ''.join(primary)
+        secondary_phone = ''.join(secondary)
+        if primary_phone == secondary_phone:
+            secondary_phone = ""
+        return (primary_phone, secondary_phone)
+
+
+DoubleMetaphone._dispatch.update({
+    'B': DoubleMetaphone.process_b,
+    'C': DoubleMetaphone.process_c,
+    'D': DoubleMetaphone.process_d,
+    'F': DoubleMetaphone.process_f,
+    'G': DoubleMetaphone.process_g,
+    'H': DoubleMetaphone.process_h,
+    'J': DoubleMetaphone.process_j,
+    'K': DoubleMetaphone.process_k,
+    'L': DoubleMetaphone.process_l,
+    'M': DoubleMetaphone.process_m,
+    'N': DoubleMetaphone.process_n,
+    'P': DoubleMetaphone.process_p,
+    'Q': DoubleMetaphone.process_q,
+    'R': DoubleMetaphone.process_r,
+    'S': DoubleMetaphone.process_s,
+    'T': DoubleMetaphone.process_t,
+    'V': DoubleMetaphone.process_v,
+    'W': DoubleMetaphone.process_w,
+    'X': DoubleMetaphone.process_x,
+    'Z': DoubleMetaphone.process_z,
+    })
+DoubleMetaphone._dispatch.update((v, DoubleMetaphone.process_initial_vowels)
+                                 for v in VOWELS)
+
+# Encoders are reused, one per thread
+_local = threading.local()
+
+# A precomputed dictionary to consult before running the algorithm
+_dictionary = None
+
+
+def set_dictionary(dictionary):
+    """
+    Install a precomputed dictionary (a PhoneticDictionary, or the path of a
+    file written by vat.metaphone.dictionary.build()) for the encoders to
+    consult; None removes it.  Returns the previously installed dictionary.
+    """
+    global _dictionary
+    if dictionary is not None and not hasattr(dictionary, 'lookup'):
+        from .dictionary import PhoneticDictionary
+        dictionary = PhoneticDictionary(dictionary)
+    previous = _dictionary
+    _dictionary = dictionary
+    return previous
+
+
+def _encode(input):
+    dictionary = _dictionary
+    if dictionary is not None:
+        codes = dictionary.lookup(input)
+        if codes is not None:
+            return codes
+    try:
+        encoder = _local.encoder
+    except AttributeError:
+        encoder = _local.encoder = DoubleMetaphone()
+    return encoder.parse(input)
+
+
+CacheInfo = collections.namedtuple('CacheInfo',
+                                   ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class _LRUCache(object):
+    """
+    A thread-safe, bounded, least-recently-used cache of encoder results.
+    Keys include the type of the input, so that bytes and text are never
+    confused with one another.
+    """
+    def __init__(self, maxsize):
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, input):
+        key = (type(input), input)
+        with self.lock:
+            result = self.entries.pop(key, None)
+            if result is not None:
+                self.entries[key] = result
+                self.hits += 1
+                return result
+            self.misses += 1
+        result = _encode(input)
+        with self.lock:
+            if self.maxsize:
+                self.entries[key] = result
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+        return result
+
+    def info(self):
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize,
+                             len(self.entries))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def resize(self, maxsize):
+        with self.lock:
+            self.maxsize = maxsize
+            while len(self.entries) > maxsize:
+                self.entries.popitem(last=False)
+
+
+_cache = _LRUCache(4096)
+
+
+def cache_info():
+    """
+    Return a CacheInfo tuple (hits, misses, maxsize, currsize) describing
+    the doublemetaphone() cache.
+    """
+    return _cache.info()
+
+
+def cache_clear():
+    """
+    Empty the doublemetaphone() cache and reset its statistics.
+    """
+    _cache.clear()
+
+
+def set_cache_size(maxsize):
+    """
+    Set the maximum number of words held by the doublemetaphone() cache (the
+    default is 4096); 0 disables caching.
+    """
+    _cache.resize(maxsize)
 
 
 # backwards compatibility for the pre-OO implementation
@@ -652,8 +762,78 @@ def doublemetaphone(input):
     Given an input string, return a 2-tuple of the double metaphone codes for
     the provided string. The second element of the tuple will be an empty
     string if it is identical to the first element.
+
+    Results are kept in a bounded cache; see cache_info(), cache_clear() and
+    set_cache_size().
+    """
+    if not _cache.maxsize:
+        return _encode(input)
+    return _cache.lookup(input)
+
+
+def _encode_words(words):
+    encoder = DoubleMetaphone()
+    dictionary = _dictionary
+    if dictionary is None:
+        return [encoder.parse(word) for word in words]
+    result = []
+    for word in words:
+        codes = dictionary.lookup(word)
+        if codes is None:
+            codes = encoder.parse(word)
+        result.append(codes)
+    return result
+
+
+def _encode_chunk(words, pool):
+    # Encode each distinct word in the chunk once
+    index = {}
+    unique = []
+    for word in words:
+        key = (type(word), word)
+        if key not in index:
+            index[key] = len(unique)
+            unique.append(word)
+    if pool is None:
+        codes = _encode_words(unique)
+    else:
+        codes = pool.apply_async(_encode_words, (unique,))
+    return words, index, codes
+
+
+def _expand_chunk(words, index, codes):
+    if not isinstance(codes, list):
+        codes = codes.get()
+    for word in words:
+        yield codes[index[(type(word), word)]]
+
+
+def doublemetaphone_many(words, processes=1, chunksize=10000):
+    """
+    Given an iterable of words, yield a 2-tuple of double metaphone codes for
+    each, in order (see doublemetaphone()).
+
+    The words are read and encoded in chunks of chunksize words; each
+    distinct word in a chunk is only encoded once.  If processes is greater
+    than 1 (or None, meaning the number of CPUs), the chunks are encoded by a
+    pool of that many worker processes, with only a few chunks per process
+    read ahead of the output.
     """
-    return DoubleMetaphone().parse(input)
+    words = iter(words)
+    chunks = iter(lambda: list(itertools.islice(words, chunksize)), [])
+
+    if processes is not None and processes < 2:
+        for chunk in chunks:
+            for codes in _expand_chunk(*_encode_chunk(chunk, None)):
+                yield codes
+        return
+
+    def submit(pool, chunk):
+        return _encode_chunk(chunk, pool)
+
+    for pending in submit_bounded(submit, chunks, processes):
+        for codes in _expand_chunk(*pending):
+            yield codes
 
 
 # for backwards compatibility for the old name of the function
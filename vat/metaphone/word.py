@@ -1,38 +1,47 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import re
 import unicodedata
 
 
+_ascii_re = re.compile(r'[\x00-\x7f]*\Z')
+
+
 class Word(object):
     """
     """
+    __slots__ = ('original', 'decoded', 'normalized', 'upper', 'length',
+                 'prepad', 'start_index', 'end_index', 'postpad', 'buffer',
+                 'is_slavo_germanic')
+
     def __init__(self, input):
         self.original = input
         if isinstance(input, bytes):
             self.decoded = input.decode('utf-8', 'ignore')
         else:
             self.decoded = input
-        self.decoded = self.decoded.replace('\xc7', "s")
-        self.decoded = self.decoded.replace('\xe7', "s")
-        self.normalized = ''.join(
-            (c for c in unicodedata.normalize('NFD', self.decoded)
-            if unicodedata.category(c) != 'Mn'))
-        self.upper = self.normalized.upper()
-        self.length = len(self.upper)
+        if _ascii_re.match(self.decoded):
+            # nothing to strip, so skip the (expensive) normalization
+            self.normalized = self.decoded
+        else:
+            self.decoded = self.decoded.replace('\xc7', "s")
+            self.decoded = self.decoded.replace('\xe7', "s")
+            self.normalized = ''.join(
+                (c for c in unicodedata.normalize('NFD', self.decoded)
+                if unicodedata.category(c) != 'Mn'))
+        self.upper = upper = self.normalized.upper()
+        self.length = len(upper)
         self.prepad = "--"
         self.start_index = len(self.prepad)
         self.end_index = self.start_index + self.length - 1
         self.postpad = "------"
         # so we can index beyond the begining and end of the input string
-        self.buffer = self.prepad + self.upper + self.postpad
-
-    @property
-    def is_slavo_germanic(self):
-        return (
-            self.upper.find('W') > -1
-            or self.upper.find('K') > -1
-            or self.upper.find('CZ') > -1
-            or self.upper.find('WITZ') > -1)
+        self.buffer = self.prepad + upper + self.postpad
+        self.is_slavo_germanic = (
+            'W' in upper
+            or 'K' in upper
+            or 'CZ' in upper
+            or 'WITZ' in upper)
 
     def get_letters(self, start=0, end=None):
         if not end:
@@ -1,15 +1,303 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import bisect
 import datetime
 from decimal import Decimal as D
+import sys
+import threading
+import time
+import warnings
+
+try:
+    from time import perf_counter as _clock
+except ImportError:
+    from time import time as _clock
+
+import six
+from six.moves import queue, http_client
+from lxml import etree
 
 from . import vrws
 from . import tic
+from .ratestore import SQLiteRateStore
+from . import snapshot
+
+_missing = object()
+
+def _merge_rate_list(rates, changes):
+    result = list(rates)
+    for rate in changes:
+        for n, old in enumerate(result):
+            if old.application_date == rate.application_date \
+              and old.detail == rate.detail:
+                result[n] = rate
+                break
+        else:
+            result.append(rate)
+    return result
+
+def _merge_rate_dict(rates, changes):
+    result = dict(rates)
+    for key, rate_list in six.iteritems(changes):
+        result[key] = _merge_rate_list(rates.get(key, ()), rate_list)
+    return result
+
+def _merge_rates(rates, changes):
+    """Return a new Rates object with the changed rates from changes applied
+    to rates.  A changed rate replaces any rate with the same application
+    date and detail; neither argument is modified."""
+    regions = rates.regions
+    if changes.regions:
+        regions = dict(regions or {})
+        for name, rgn in six.iteritems(changes.regions):
+            old = regions.get(name, None)
+            if old is None:
+                old = vrws.Rates({}, {}, None)
+            regions[name] = _merge_rates(old, rgn)
+    return vrws.Rates(_merge_rate_dict(rates.types, changes.types),
+                      _merge_rate_dict(rates.categories, changes.categories),
+                      regions)
+
+class _History (object):
+    """The rates known to have applied to one member state, as a set of
+    non-overlapping date intervals per (kind, name, region) key, searched
+    with bisect.
+
+    Each interval runs from a rate's application date to the latest date on
+    which we have seen it in effect.  Lookups don't take a lock; additions
+    (made under RateCache._history_lock) replace the interval lists rather
+    than modifying them."""
+
+    def __init__(self):
+        self.intervals = {}
+        self.last = None
+        self.fetched = set()
+
+    def add(self, key, rate, date):
+        starts, ends, rates = self.intervals.get(key, ((), (), ()))
+        n = bisect.bisect_left(starts, rate.application_date)
+        if n < len(starts) and starts[n] == rate.application_date:
+            if ends[n] >= date:
+                return
+            ends = ends[:n] + (date,) + ends[n + 1:]
+        else:
+            starts = starts[:n] + (rate.application_date,) + starts[n:]
+            ends = ends[:n] + (date,) + ends[n:]
+            rates = rates[:n] + (rate,) + rates[n:]
+        self.intervals[key] = (starts, ends, rates)
+
+    def lookup(self, key, date):
+        starts, ends, rates = self.intervals.get(key, ((), (), ()))
+        n = bisect.bisect_right(starts, date) - 1
+        if n >= 0 and ends[n] >= date:
+            return rates[n]
+        return None
+
+class _MemberStats (object):
+    """Counters for one member state; see :py:meth:`RateCache.stats`."""
+    __slots__ = ('hits', 'stale_hits', 'misses', 'fetches', 'fetch_errors',
+                 'fetch_time', 'max_fetch_time', 'last_fetch_time',
+                 'last_source', 'source', 'fetched_at', 'last_error')
+
+    def __init__(self):
+        self.reset()
+        self.last_source = None
+        self.source = None
+        self.fetched_at = None
+
+    def reset(self):
+        """Reset the counters, but not what we know about the cached
+        entry."""
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.fetch_time = 0.0
+        self.max_fetch_time = 0.0
+        self.last_fetch_time = None
+        self.last_error = None
+
+    def record_fetch(self, elapsed, source=None, error=None):
+        self.fetches += 1
+        self.fetch_time += elapsed
+        self.last_fetch_time = elapsed
+        if elapsed > self.max_fetch_time:
+            self.max_fetch_time = elapsed
+        if error is not None:
+            self.fetch_errors += 1
+            self.last_error = error
+        else:
+            self.last_source = source
+
+class RateTable (object):
+    """An immutable table of the rates in effect on ``date``, as fractions
+    (e.g. ``Decimal('0.2')`` for 20%), keyed by member state code, region,
+    rate type or category, and detail.  Obtain one from
+    :py:meth:`RateCache.table`."""
+
+    __slots__ = ('date', '_lists', '_rates')
+
+    def __init__(self, date, entries):
+        self.date = date
+        self._lists = entries
+        rates = {}
+        for (ms, region, name), details in six.iteritems(entries):
+            for detail, rate in details:
+                rates.setdefault((ms, region, name, detail), rate)
+        self._rates = rates
+
+    def __getitem__(self, key):
+        """Look up a (member_state, region, type_or_category, detail)
+        tuple."""
+        return self._rates[key]
+
+    def __contains__(self, key):
+        return key in self._rates
+
+    def __len__(self):
+        return len(self._rates)
+
+    def get(self, member_state, kind=vrws.STANDARD, region=None,
+            detail=None, default=None):
+        """Return the rate of the given type or category (and detail) in
+        ``member_state``, or ``default`` if there isn't one."""
+        return self._rates.get((member_state, region, kind, detail), default)
+
+    def details(self, member_state, kind=vrws.STANDARD, region=None):
+        """Return a tuple of (detail, rate) for every rate of the given type
+        or category, most recent first.  There may be several reduced rates
+        with the same detail (usually none)."""
+        return self._lists.get((member_state, region, kind), ())
+
+    def member_states(self):
+        """Return the set of member state codes in the table."""
+        return frozenset(key[0] for key in self._lists)
+
+class SnapshotRatesWarning (UserWarning):
+    """Issued when a :py:class:`RateCache` has to use the rates in the
+    bundled snapshot because the web services can't be reached."""
+    pass
+
+class _Flight (object):
+    """A fetch in progress, which other threads can wait for."""
+    __slots__ = ('done', 'rates', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.rates = None
+        self.error = None
+
+class _Refresher (threading.Thread):
+    """The background thread run by :py:meth:`RateCache.start_refresher`.
+    ``errors`` maps member state codes to the exception raised by the most
+    recent failed attempt to refresh them."""
+
+    def __init__(self, cache, lead_time, interval):
+        super(_Refresher, self).__init__(name='vat-rate-refresher')
+        self.daemon = True
+        self.cache = cache
+        self.lead_time = lead_time
+        self.interval = interval
+        self.errors = {}
+        self._wake = threading.Event()
+        self._stopping = False
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        if threading.current_thread() is not self:
+            self.join()
+
+    def _renew(self, member_state, date):
+        try:
+            self.cache._renew(member_state, date)
+        except Exception as e:
+            self.errors[member_state] = e
+        else:
+            self.errors.pop(member_state, None)
+
+    def run(self):
+        while not self._stopping:
+            self._wake.clear()
+            now = datetime.datetime.now()
+            today = now.date()
+            tomorrow = today + datetime.timedelta(days=1)
+            midnight = datetime.datetime.combine(tomorrow, datetime.time())
+            ahead = (midnight - now).total_seconds() <= self.lead_time
+
+            for ms, rinfo in list(self.cache.rates.items()):
+                if self._stopping:
+                    break
+                if rinfo[1] < today or self.cache._retry_due(ms):
+                    self._renew(ms, today)
+                if ahead:
+                    arinfo = self.cache._ahead.get(ms, None)
+                    if arinfo is None or arinfo[1] != tomorrow:
+                        self._renew(ms, tomorrow)
+
+            self._wake.wait(self.interval)
+
+class Prefetch (object):
+    """Tracks the progress of :py:meth:`RateCache.prefetch`.
+
+    ``succeeded`` lists the member state codes fetched so far, ``failed``
+    maps codes to the exception raised while fetching them, and ``pending``
+    lists those not yet finished (or, once the deadline has passed, those
+    that never will be).  ``stale`` lists the failed member states whose
+    rates are nevertheless available, from the bundled snapshot."""
+
+    def __init__(self, codes, deadline):
+        self.deadline = deadline
+        self.succeeded = []
+        self.failed = {}
+        self.stale = []
+        self.pending = list(codes)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not codes:
+            self._done.set()
+
+    def _finished(self, code, exc=None, stale=False):
+        with self._lock:
+            self.pending.remove(code)
+            if exc is None:
+                self.succeeded.append(code)
+            else:
+                self.failed[code] = exc
+                if stale:
+                    self.stale.append(code)
+            if not self.pending:
+                self._done.set()
+
+    def done(self):
+        """Return True if every member state has been fetched (or failed)."""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Wait for the prefetch to finish, for at most ``timeout`` seconds
+        and in any case no later than its deadline.  Returns True if it
+        finished."""
+        if self.deadline is not None:
+            remaining = max(0.0, self.deadline - time.time())
+            if timeout is None or timeout > remaining:
+                timeout = remaining
+        return self._done.wait(timeout)
+
+    def __repr__(self):
+        return 'Prefetch(succeeded=%r, failed=%r, stale=%r, pending=%r)' \
+          % (self.succeeded, self.failed, self.stale, self.pending)
 
 class RateCache (object):
     """Manages a cache of VAT rates fetched from europa.eu's
        VATRateWebService.  Most queries will come from the cache, which will
-       only fetch new rates once per day per member state."""
+       only fetch new rates once per day per member state.
+
+       A RateCache may be shared between threads; if several want the same
+       member state's rates at once, only one of them fetches."""
     
     # Historic reduced rates - VRWS currently isn't supplying reduced rate
     # information
@@ -50,40 +338,530 @@ class RateCache (object):
         'GB': (D('5.0'),),
         }
         
-    def __init__(self):
+    def __init__(self, store=None, incremental=False):
+        """If store is given, it should be a :py:class:`SQLiteRateStore` (or
+        the path of an SQLite database to use as one); rates are then kept
+        there as well as in memory, so that they survive a restart and are
+        shared between processes using the same store.
+
+        If incremental is true, rates cached on a previous day are brought
+        up to date with a single :py:func:`vrws.get_changes` call covering
+        all member states, rather than being fetched again one by one."""
+        if isinstance(store, six.string_types):
+            store = SQLiteRateStore(store)
+        self.store = store
+        self.incremental = incremental
         self.rates = {}
+        self._sync_lock = threading.Lock()
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._ahead = {}
+        self._refresher = None
+        self._history = {}
+        self._history_lock = threading.Lock()
+        self._stale = {}
+        self._table = None
+        self._table_lock = threading.Lock()
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+        self._stats = {}
+
+    # How long to wait before trying the network again for a member state
+    # whose rates came from the bundled snapshot, in seconds
+    snapshot_retry_interval = 300
+
+    # The age, as a timedelta, beyond which the bundled snapshot is flagged as
+    # out of date when we fall back on it (or None never to flag it); rates
+    # change, so an old snapshot may well be wrong
+    snapshot_max_age = datetime.timedelta(days=180)
+
+    def _fetch(self, member_state, date):
+        stats = self._stats_for(member_state)
+        start = _clock()
+        try:
+            try:
+                rates = vrws.get_rates(member_state, date=date)
+                source = 'vrws'
+            except (vrws.VRWSException, EnvironmentError,
+                    http_client.HTTPException) as e:
+                stats.last_error = e
+                rates = tic.get_rates(member_state, date=date)
+                source = 'tic'
+        except Exception as e:
+            stats.record_fetch(_clock() - start, error=e)
+            raise
+        stats.record_fetch(_clock() - start, source)
+        return rates
+
+    def _stats_for(self, member_state):
+        try:
+            return self._stats[member_state]
+        except KeyError:
+            return self._stats.setdefault(member_state, _MemberStats())
+
+    def stats(self):
+        """Return a dictionary mapping member state codes to dictionaries of
+        statistics about the cached rates for that member state:
+
+          hits, stale_hits, misses
+             lookups answered from the cache, answered with out-of-date
+             rates (while the refresher fetches new ones), and not answered
+             from the cache
+          fetches, fetch_errors
+             attempts to fetch rates from the web services, and failures
+          fetch_time, max_fetch_time, last_fetch_time
+             total, maximum and most recent fetch durations, in seconds
+          source
+             where the cached rates came from: 'vrws', 'tic', 'snapshot',
+             'store' (another process's fetch), 'changes' (an incremental
+             refresh) or None
+          historic_reduced
+             True if the reduced rates come from the built-in table
+          date, age
+             the date the cached rates apply to, and the number of seconds
+             since they were stored, or None
+          last_error
+             the most recent exception raised while fetching, or None
+
+        This only reads counters, so it is cheap enough to poll."""
+        now = time.time()
+        result = {}
+        for ms, stats in list(self._stats.items()):
+            rinfo = self.rates.get(ms, None)
+            result[ms] = {
+                'hits': stats.hits,
+                'stale_hits': stats.stale_hits,
+                'misses': stats.misses,
+                'fetches': stats.fetches,
+                'fetch_errors': stats.fetch_errors,
+                'fetch_time': stats.fetch_time,
+                'max_fetch_time': stats.max_fetch_time,
+                'last_fetch_time': stats.last_fetch_time,
+                'source': stats.source,
+                'historic_reduced': (rinfo is not None
+                                     and vrws.REDUCED not in rinfo[0].types),
+                'date': rinfo[1] if rinfo is not None else None,
+                'age': (now - stats.fetched_at
+                        if stats.fetched_at is not None else None),
+                'last_error': stats.last_error,
+                }
+        return result
+
+    def reset_stats(self):
+        """Reset the hit, miss and fetch counters, and the last error."""
+        for stats in list(self._stats.values()):
+            stats.reset()
+
+    def _from_snapshot(self, member_state, today):
+        """Fall back to the bundled snapshot; must be called from an except
+        block, whose exception is re-raised if the snapshot has nothing for
+        this member state."""
+        exc_info = sys.exc_info()
+        try:
+            snap = snapshot.default()
+        except (EnvironmentError, ValueError):
+            snap = None
+        rates = snap.get(member_state) if snap is not None else None
+        if rates is None:
+            six.reraise(*exc_info)
+        self._stale[member_state] = (snap.date,
+                                     time.time()
+                                     + self.snapshot_retry_interval,
+                                     exc_info[1])
+        message = 'Unable to fetch VAT rates for %s (%s); using rates ' \
+          'from a snapshot taken on %s' % (member_state, exc_info[1],
+                                           snap.date)
+        if self.snapshot_max_age is not None \
+          and snap.age(today) > self.snapshot_max_age:
+            message += ', which is %d days old and may be out of date' \
+              % snap.age(today).days
+        warnings.warn(message, SnapshotRatesWarning, stacklevel=4)
+        self._set_rates(member_state, (rates, today), 'snapshot')
+        return rates
+
+    def _set_rates(self, member_state, rinfo, source=None):
+        stats = self._stats_for(member_state)
+        with self._generation_lock:
+            self.rates[member_state] = rinfo
+            self._generation += 1
+        stats.source = source or stats.last_source
+        stats.fetched_at = time.time()
+
+    def table(self, member_states=()):
+        """Return a :py:class:`RateTable` of today's rates for every cached
+        member state, first making sure that those in ``member_states`` (if
+        any) are cached.
+
+        The table is immutable; a new one is built (and swapped in
+        atomically) when the cache changes, so callers in tight loops can
+        fetch it once and use it without further locking."""
+        for ms in member_states:
+            self._get_rates(ms)
+        today = datetime.date.today()
+        current = self._table
+        if current is None or current[1] != self._generation \
+          or current[0].date != today:
+            with self._table_lock:
+                current = self._table
+                generation = self._generation
+                if current is None or current[1] != generation \
+                  or current[0].date != today:
+                    current = (RateTable(today, self._table_entries(today)),
+                               generation)
+                    self._table = current
+        return current[0]
+
+    def _table_entries(self, today):
+        entries = {}
+        for ms, (rates, date) in list(self.rates.items()):
+            for (kind, name, region), rate_list \
+                in self._rate_lists(ms, rates):
+                # Several reduced rates may apply at once, often without any
+                # detail to tell them apart, so keep the latest of each
+                # distinct reduced rate rather than one per detail
+                if name == vrws.REDUCED:
+                    key = lambda rate: (rate.detail, rate.rate)
+                else:
+                    key = lambda rate: rate.detail
+                current = {}
+                for rate in rate_list:
+                    if rate.application_date > today:
+                        continue
+                    best = current.get(key(rate), None)
+                    if best is None \
+                      or rate.application_date > best.application_date:
+                        current[key(rate)] = rate
+                # Most recent first, so that the first rate for each detail
+                # is the one RateTable.get() returns
+                current = sorted((rate for rate in rate_list
+                                  if current.get(key(rate), None) is rate),
+                                 key=lambda rate: rate.application_date,
+                                 reverse=True)
+                entries[(ms, region, name)] \
+                  = tuple((rate.detail, rate.rate / 100) for rate in current)
+        return entries
+
+    def _retry_due(self, member_state):
+        stale = self._stale.get(member_state, None)
+        return stale is not None and stale[1] <= time.time()
+
+    def stale(self):
+        """Return a dictionary mapping the codes of any member states whose
+        rates currently come from the bundled snapshot (because the web
+        services couldn't be reached) to the date the snapshot was taken."""
+        return dict((ms, stale[0])
+                    for ms, stale in list(self._stale.items()))
 
     def _get_rates(self, member_state):
-        if not isinstance(member_state, basestring):
+        if not isinstance(member_state, six.string_types):
             member_state = member_state.code
         today = datetime.date.today()
         rinfo = self.rates.get(member_state, None)
         if rinfo is not None:
-            if rinfo[1] == today:
+            if rinfo[1] == today and (member_state not in self._stale
+                                      or not self._retry_due(member_state)):
+                self._stats_for(member_state).hits += 1
                 return rinfo[0]
+            if self._refresher is not None:
+                # Use the rates fetched ahead of time if we have them;
+                # otherwise serve the old ones until the refresher has
+                # fetched new ones
+                ahead = self._ahead.get(member_state, None)
+                if ahead is not None and ahead[1] == today:
+                    self._promote(member_state, ahead)
+                    self._stats_for(member_state).hits += 1
+                    return ahead[0]
+                self._refresher.wake()
+                self._stats_for(member_state).stale_hits += 1
+                return rinfo[0]
+
+        self._stats_for(member_state).misses += 1
+
+        # Only one thread refreshes a given member state; any others that
+        # want it meanwhile wait for (and share) that thread's result
+        with self._flights_lock:
+            rinfo = self.rates.get(member_state, None)
+            if rinfo is not None and rinfo[1] == today \
+              and not self._retry_due(member_state):
+                return rinfo[0]
+            flight = self._flights.get(member_state, None)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[member_state] = flight
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.rates
+
+        try:
+            flight.rates = self._refresh(member_state, today, rinfo)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[member_state]
+            flight.done.set()
+        return flight.rates
+
+    def _refresh(self, member_state, today, rinfo):
+        rates = self._update(member_state, today, rinfo)
+        if rates is not None:
+            return rates
         try:
-            rates = vrws.get_rates(member_state, date=today)
-        except vrws.VRWSException:
-            rates = tic.get_rates(member_state, date=today)
+            return self._fetch_today(member_state, today)
+        except Exception:
+            return self._from_snapshot(member_state, today)
 
-        self.rates[member_state] = (rates, today)
+    def _update(self, member_state, today, rinfo):
+        """Bring an existing entry up to date from the store or, if the cache
+        is incremental, by applying the changes since it was fetched.
+        Returns None if it needs to be fetched in full."""
+        if rinfo is None or member_state in self._stale:
+            return None
+        if self.store is not None:
+            rates = self.store.get(member_state, today)
+            if rates is not None:
+                self._set_rates(member_state, (rates, today), 'store')
+                return rates
+        if self.incremental and self._sync(today):
+            return self.rates[member_state][0]
+        return None
+
+    def _fetch_today(self, member_state, today):
+        """Fetch today's rates for member_state, through the store if there
+        is one, and cache them."""
+        fetched = []
+        def fetch(member_state, date):
+            fetched.append(date)
+            return self._fetch(member_state, date)
+        if self.store is not None:
+            rates = self.store.fetch(member_state, today, fetch)
+        else:
+            rates = fetch(member_state, today)
+
+        self._stale.pop(member_state, None)
+        # If the store had the rates, another process fetched them
+        self._set_rates(member_state, (rates, today),
+                        None if fetched else 'store')
         return rates
 
+    def _sync(self, today):
+        """Apply the changes since the oldest cached rates were fetched to
+        every cached member state.  Returns False if the changes couldn't be
+        retrieved, in which case nothing is updated."""
+        with self._sync_lock:
+            stale = [(ms, rinfo) for ms, rinfo in list(self.rates.items())
+                     if rinfo[1] != today and ms not in self._stale]
+            if not stale:
+                return True
+            from_date = min(rinfo[1] for ms, rinfo in stale)
+            try:
+                changes = vrws.get_changes(from_date=from_date, to_date=today,
+                                           by_member_state=True)
+            except (vrws.VRWSException, ValueError, EnvironmentError,
+                    http_client.HTTPException, etree.XMLSyntaxError):
+                return False
+            for ms, (rates, date) in stale:
+                ms_changes = changes.get(ms, None)
+                if ms_changes is not None:
+                    rates = _merge_rates(rates, ms_changes)
+                self._set_rates(ms, (rates, today), 'changes')
+                if self.store is not None:
+                    self.store.put(ms, today, rates)
+            return True
+
+    def _promote(self, member_state, rinfo):
+        self._set_rates(member_state, rinfo)
+        self._ahead.pop(member_state, None)
+        self._stale.pop(member_state, None)
+        if self.store is not None:
+            self.store.put(member_state, rinfo[1], rinfo[0])
+
+    def _renew(self, member_state, date):
+        """Renew the rates for member_state as of date.  Today's are looked
+        up in the same way as on a cache miss, and replace the cached entry;
+        later dates are fetched and kept aside until needed."""
+        if date == datetime.date.today():
+            if self._update(member_state, date,
+                            self.rates.get(member_state, None)) is None:
+                self._fetch_today(member_state, date)
+            self._ahead.pop(member_state, None)
+        else:
+            self._ahead[member_state] = (self._fetch(member_state, date), date)
+
+    def start_refresher(self, lead_time=600, interval=60):
+        """Start a background thread that keeps the cache fresh, so that
+        lookups need not wait for the network.
+
+        From ``lead_time`` seconds before midnight, the thread fetches the
+        next day's rates for every cached member state; those are used from
+        midnight onwards.  If an entry nevertheless expires before new rates
+        arrive, lookups keep returning the old rates while the thread fetches
+        new ones.  The thread checks for work every ``interval`` seconds.
+
+        Member states that have never been fetched still block on first
+        use; see :py:meth:`prefetch`."""
+        if self._refresher is None:
+            self._refresher = _Refresher(self, lead_time, interval)
+            self._refresher.start()
+        return self._refresher
+
+    def stop_refresher(self):
+        """Stop the background refresher, if it is running."""
+        refresher = self._refresher
+        if refresher is not None:
+            self._refresher = None
+            refresher.stop()
+            self._ahead.clear()
+
+    def prefetch(self, member_states=None, max_workers=8, timeout=None,
+                 wait=True):
+        """Fetch today's rates for ``member_states`` (by default, all of
+        them) concurrently, using at most ``max_workers`` threads, so that
+        later queries are answered from the cache.
+
+        If ``timeout`` is given, no fetches are started more than that many
+        seconds from now.  If ``wait`` is true, this method blocks until the
+        fetches are done or the timeout expires; otherwise it returns at
+        once.  Either way it returns a :py:class:`Prefetch` object reporting
+        which member states succeeded and which failed (and why)."""
+        if member_states is None:
+            from .memberstate import member_states
+        codes = []
+        for ms in member_states:
+            if not isinstance(ms, six.string_types):
+                ms = ms.code
+            if ms not in codes:
+                codes.append(ms)
+
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        progress = Prefetch(codes, deadline)
+
+        todo = queue.Queue()
+        for code in codes:
+            todo.put(code)
+
+        def worker():
+            while True:
+                try:
+                    code = todo.get_nowait()
+                except queue.Empty:
+                    return
+                if deadline is not None and time.time() >= deadline:
+                    return
+                try:
+                    self._get_rates(code)
+                except Exception as e:
+                    progress._finished(code, e)
+                    continue
+                stale = self._stale.get(code, None)
+                if stale is not None:
+                    progress._finished(code, stale[2], stale=True)
+                else:
+                    progress._finished(code)
+
+        for n in range(min(max_workers, len(codes))):
+            t = threading.Thread(target=worker, name='vat-prefetch-%d' % n)
+            t.daemon = True
+            t.start()
+
+        if wait:
+            progress.wait()
+        return progress
+
+    warm = prefetch
+
     def regions(self, member_state):
         """Retrieve a list of regions for the given member state."""
         rates = self._get_rates(member_state)
         return rates.regions.keys()
 
-    def _best_rate(self, rates):
-        today = datetime.date.today()
+    def _best_rate(self, rates, date=None):
+        if date is None:
+            date = datetime.date.today()
         rate_date = None
         best_rate = None
         for rate in rates:
-            if rate.application_date > today or rate.detail is not None:
+            if rate.application_date > date or rate.detail is not None:
                 continue
             if rate_date is None or rate.application_date > rate_date:
+                rate_date = rate.application_date
                 best_rate = rate
         return best_rate
+
+    def _rate_lists(self, member_state, rates):
+        """Yield (key, list of rates) for each list in rates, where key is
+        (kind, name, region) and kind is 'type' or 'category'."""
+        regions = [(None, rates)]
+        if rates.regions:
+            regions.extend(sorted(rates.regions.items()))
+        for region, rgn in regions:
+            types = dict(rgn.types)
+            if vrws.REDUCED not in types:
+                types[vrws.REDUCED] = self._historic_reduced(member_state)
+            for name, rate_list in six.iteritems(types):
+                yield ('type', name, region), rate_list
+            for name, rate_list in six.iteritems(rgn.categories):
+                yield ('category', name, region), rate_list
+
+    def _record(self, member_state, rates, date):
+        """Add the rates in effect on date (according to rates, which were
+        fetched as of that date) to the history index."""
+        with self._history_lock:
+            history = self._history.setdefault(member_state,
+                                               _History())
+            if history.last == (rates, date):
+                return
+            for key, rate_list in self._rate_lists(member_state, rates):
+                rate = self._best_rate(rate_list, date)
+                if rate is not None:
+                    history.add(key, rate, date)
+            history.last = (rates, date)
+            history.fetched.add(date)
+
+    def rate_on(self, member_state, date, rate_type=vrws.STANDARD,
+                category=None, region=None):
+        """Return the ordinary rate of the given type (or, if ``category`` is
+        given, for that category) that applied in ``member_state`` (and
+        optionally ``region``) on ``date``, or None if there wasn't one.
+
+        Rates for past dates are fetched from VRWS when first needed, and
+        kept in an index of the periods over which each rate is known to
+        have applied; subsequent lookups within those periods are answered
+        from the index."""
+        if not isinstance(member_state, six.string_types):
+            member_state = member_state.code
+        if category is not None:
+            key = ('category', category, region)
+        else:
+            key = ('type', rate_type, region)
+
+        rates = self._get_rates(member_state)
+        rinfo = self.rates.get(member_state, None)
+        fetched_on = datetime.date.today()
+        if rinfo is not None and rinfo[0] is rates:
+            fetched_on = rinfo[1]
+
+        if date >= fetched_on:
+            # Rates due to apply in future are in the current set
+            for k, rate_list in self._rate_lists(member_state, rates):
+                if k == key:
+                    return self._best_rate(rate_list, date)
+            return None
+
+        self._record(member_state, rates, fetched_on)
+        history = self._history[member_state]
+        rate = history.lookup(key, date)
+        if rate is None and date not in history.fetched:
+            self._record(member_state, self._fetch(member_state, date), date)
+            rate = history.lookup(key, date)
+        return rate
     
     def standard_rates(self, member_state, region=None):
         """Retrieve the set of standard rates for the given member state,
@@ -96,7 +874,7 @@ class RateCache (object):
         rates = self._get_rates(member_state)
         if region is not None:
             rates = rates.regions[region]
-        return rates.types.get(vrws.STANDARD, [])
+        return rates.types.get(vrws.STANDARD, ())
 
     def standard_rate(self, member_state, region=None):
         """Return today’s ordinary standard rate for the given member state
@@ -127,12 +905,50 @@ class RateCache (object):
             rates = rates.regions[region]
         rates = rates.types.get(vrws.REDUCED, None)
         if rates is None:
-            rates = self.historic_reduced_rates.get(member_state, None)
-            if rates is None:
-                return []
-            the_date = datetime.date(2015,9,1)
-            rates = [self._to_rate(r, the_date) for r in rates]
+            rates = self._historic_reduced(member_state)
         return rates
+
+    def resolve_rates(self, keys, fractions=False):
+        """Resolve a column of rate keys in one pass, returning a list with
+        the corresponding ordinary :py:class:`vat.Rate` (or None) for each.
+
+        Each key is a tuple ``(member_state, kind, region, date)``, where
+        kind is :py:data:`vrws.STANDARD`, :py:data:`vrws.REDUCED` or a
+        category name, and the trailing region and date may be omitted or
+        None (meaning no region, and today).  Each distinct key is resolved
+        only once.  If fractions is true, the result contains the rates as
+        fractions (e.g. Decimal('0.2')) rather than Rate objects, as used by
+        :py:class:`vat.MemberState`."""
+        today = datetime.date.today()
+        resolved = {}
+        result = []
+        for key in keys:
+            value = resolved.get(key, _missing)
+            if value is _missing:
+                value = self._resolve(key, today)
+                if fractions and value is not None:
+                    value = value.rate / 100
+                resolved[key] = value
+            result.append(value)
+        return result
+
+    def _resolve(self, key, today):
+        member_state, kind = key[:2]
+        region = key[2] if len(key) > 2 else None
+        date = key[3] if len(key) > 3 else None
+        if date is None:
+            date = today
+        if kind in (vrws.STANDARD, vrws.REDUCED):
+            return self.rate_on(member_state, date, rate_type=kind,
+                                region=region)
+        return self.rate_on(member_state, date, category=kind, region=region)
+
+    def _historic_reduced(self, member_state):
+        rates = self.historic_reduced_rates.get(member_state, None)
+        if rates is None:
+            return []
+        the_date = datetime.date(2015,9,1)
+        return [self._to_rate(r, the_date) for r in rates]
     
     def reduced_rate(self, member_state, region=None):
         """Return today’s ordinary reduced rate for the given member state
@@ -150,7 +966,7 @@ class RateCache (object):
         rates = self._get_rates(member_state)
         if region is not None:
             rates = rates.regions[region]
-        return rates.categories.get(category, [])
+        return rates.categories.get(category, ())
     
     def category_rate(self, member_state, category, region=None):
         """Return today’s rate for the given member state, category and
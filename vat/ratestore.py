@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from decimal import Decimal as D
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import six
+
+from .vrws import Rate, Rates, _intern, _parse_date
+
+def _encode_rate_list(rates):
+    return [[six.text_type(r.rate), r.application_date.isoformat(), r.detail]
+            for r in rates]
+
+_values = {}
+_dates = {}
+
+def _decode_value(s):
+    try:
+        return _values[s]
+    except KeyError:
+        return _values.setdefault(s, D(s))
+
+def _decode_date(s):
+    try:
+        return _dates[s]
+    except KeyError:
+        return _dates.setdefault(s, _parse_date(s))
+
+def _decode_rate_list(data):
+    return [Rate(_decode_value(rate), _decode_date(date), detail)
+            for rate, date, detail in data]
+
+def _encode_rates(rates):
+    """Turn a Rates object into something json.dumps() can handle."""
+    result = {
+        'types': dict((k, _encode_rate_list(v))
+                      for k, v in six.iteritems(rates.types)),
+        'categories': dict((k, _encode_rate_list(v))
+                           for k, v in six.iteritems(rates.categories)),
+        }
+    if rates.regions is not None:
+        result['regions'] = dict((k, _encode_rates(v))
+                                 for k, v in six.iteritems(rates.regions))
+    return result
+
+def _decode_rates(data):
+    """The inverse of _encode_rates()."""
+    regions = data.get('regions', None)
+    if regions is not None:
+        regions = dict((_intern(k), _decode_rates(v))
+                       for k, v in six.iteritems(regions))
+    return Rates(dict((_intern(k), _decode_rate_list(v))
+                      for k, v in six.iteritems(data['types'])),
+                 dict((_intern(k), _decode_rate_list(v))
+                      for k, v in six.iteritems(data['categories'])),
+                 regions)
+
+class SQLiteRateStore (object):
+    """Persists the rates fetched by a :py:class:`vat.RateCache` in an SQLite
+    database, so that they survive a restart and can be shared between all
+    the processes on a host that use the same file.
+
+    When several processes want the same member state's rates at once, only
+    one of them fetches; it holds a claim on that member state (for at most
+    ``lease`` seconds) while the others wait for its result.  Claims are per
+    member state, so different member states are still fetched in
+    parallel."""
+
+    _schema = [
+        '''CREATE TABLE IF NOT EXISTS rates (
+             member_state TEXT NOT NULL,
+             date TEXT NOT NULL,
+             fetched REAL NOT NULL,
+             data TEXT NOT NULL,
+             PRIMARY KEY (member_state, date))''',
+        '''CREATE TABLE IF NOT EXISTS claims (
+             member_state TEXT NOT NULL,
+             date TEXT NOT NULL,
+             expires REAL NOT NULL,
+             PRIMARY KEY (member_state, date))''',
+        ]
+
+    def __init__(self, path, timeout=30.0, lease=60.0, poll_interval=0.1):
+        self.path = path
+        self.timeout = timeout
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        with self._transaction() as conn:
+            for statement in self._schema:
+                conn.execute(statement)
+
+    def _connection(self):
+        # SQLite connections can't be shared between threads, nor used on
+        # both sides of a fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   isolation_level=None)
+            try:
+                conn.execute('PRAGMA journal_mode=WAL')
+            except sqlite3.DatabaseError:
+                # e.g. on a network filesystem; the default journal will do
+                pass
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def get(self, member_state, date):
+        """Return the stored rates for ``member_state`` as of ``date``, or
+        ``None`` if there are none."""
+        row = self._connection().execute(
+            'SELECT data FROM rates WHERE member_state=? AND date=?',
+            (member_state, date.isoformat())).fetchone()
+        if row is None:
+            return None
+        return _decode_rates(json.loads(row[0]))
+
+    def put(self, member_state, date, rates):
+        """Store ``rates`` for ``member_state`` as of ``date``, discarding
+        anything stored for earlier dates."""
+        data = json.dumps(_encode_rates(rates), sort_keys=True)
+        with self._transaction() as conn:
+            self._put(conn, member_state, date.isoformat(), data)
+
+    def _put(self, conn, member_state, date, data):
+        conn.execute('INSERT OR REPLACE INTO rates VALUES (?, ?, ?, ?)',
+                     (member_state, date, time.time(), data))
+        conn.execute('DELETE FROM rates WHERE member_state=? AND date<?',
+                     (member_state, date))
+        conn.execute('DELETE FROM claims WHERE member_state=? AND date=?',
+                     (member_state, date))
+
+    def fetch(self, member_state, date, fetch):
+        """Return the stored rates for ``member_state`` as of ``date``; if
+        there are none, call ``fetch(member_state, date)`` to get them and
+        store the result.  At most one process fetches at a time for each
+        member state and date; the others wait for its result."""
+        key = (member_state, date.isoformat())
+        while True:
+            with self._transaction() as conn:
+                row = conn.execute('SELECT data FROM rates '
+                                   'WHERE member_state=? AND date=?',
+                                   key).fetchone()
+                if row is not None:
+                    return _decode_rates(json.loads(row[0]))
+                now = time.time()
+                row = conn.execute('SELECT expires FROM claims '
+                                   'WHERE member_state=? AND date=?',
+                                   key).fetchone()
+                if row is None or row[0] < now:
+                    conn.execute('INSERT OR REPLACE INTO claims '
+                                 'VALUES (?, ?, ?)',
+                                 key + (now + self.lease,))
+                    break
+            time.sleep(self.poll_interval)
+
+        try:
+            rates = fetch(member_state, date)
+        except:
+            with self._transaction() as conn:
+                conn.execute('DELETE FROM claims '
+                             'WHERE member_state=? AND date=?', key)
+            raise
+
+        data = json.dumps(_encode_rates(rates), sort_keys=True)
+        with self._transaction() as conn:
+            self._put(conn, member_state, key[1], data)
+        return rates
+
+    def clear(self):
+        """Remove all stored rates."""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM rates')
+            conn.execute('DELETE FROM claims')
+
+class _Transaction(object):
+    """Runs a block in an immediate (write-locked) transaction."""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
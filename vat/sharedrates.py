@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""A compact binary encoding of a rate set, for sharing between processes.
+
+One updater process (typically one running a :py:class:`vat.RateCache` with
+its background refresher) calls :py:func:`publish` to write the cached rates
+to disk; any number of worker processes open the same path with
+:py:class:`SharedRates` and read rates straight out of the memory-mapped
+file, without building any Rate objects.  Putting the files on a RAM-backed
+filesystem (e.g. /dev/shm) gives the same effect as shared memory.
+
+Each publication writes a new data file, ``<path>.<generation>``, and then
+atomically replaces the control file at ``<path>`` with one holding the new
+generation number, marking the old control file as superseded.  Readers
+check the mapped control file on each lookup, reopening it if it has been
+superseded, and switch to the new data file when the generation changes, so
+a refresh never exposes a partly written table.
+"""
+from __future__ import unicode_literals
+import datetime
+from decimal import Decimal as D
+import errno
+import mmap
+import os
+import struct
+
+from . import vrws
+from ._fileutil import write_atomically
+
+MAGIC = b'VATRTB01'
+CONTROL_MAGIC = b'VATRTC02'
+
+# On-disk layout of a data file (all integers little-endian):
+#
+#   header    magic (8 bytes), key count (u32), record count (u32)
+#   keys      (blob offset u32, key length u16, first record u32,
+#              record count u32) per key, sorted by key
+#   records   (application date ordinal u32, rate mantissa u32, rate
+#              exponent i8, detail offset u32, detail length u16) per rate
+#   blob      UTF-8 keys and details
+#
+# A key is member state, region and type or category joined with U+001F;
+# a detail length of 0xffff means "no detail".  The control file holds just
+# its magic, the current generation (u64) and a superseded flag (u8), which
+# is set once the file has been replaced.
+
+_header = struct.Struct(str('<8sII'))
+_key = struct.Struct(str('<IHII'))
+_record = struct.Struct(str('<IIbIH'))
+_control = struct.Struct(str('<8sQB'))
+_generation = struct.Struct(str('<Q'))
+
+_SUPERSEDED_AT = _control.size - 1
+
+_NO_DETAIL = 0xffff
+_SEP = '\x1f'
+
+def _key_bytes(member_state, region, kind):
+    return _SEP.join([member_state, region or '', kind]).encode('utf-8')
+
+def encode(cache):
+    """Encode the rates held by a :py:class:`vat.RateCache` as bytes.  Only
+    the cached rate lists are written, not the history that
+    :py:meth:`vat.RateCache.rate_on` builds up."""
+    entries = []
+    for ms, (rates, date) in sorted(cache.rates.items()):
+        for (kind, name, region), rate_list in cache._rate_lists(ms, rates):
+            entries.append((_key_bytes(ms, region, name), rate_list))
+    entries.sort(key=lambda e: e[0])
+
+    record_count = sum(len(rate_list) for key, rate_list in entries)
+    offset = (_header.size + len(entries) * _key.size
+              + record_count * _record.size)
+    keys = []
+    records = []
+    blob = []
+    for key, rate_list in entries:
+        keys.append(_key.pack(offset, len(key), len(records),
+                              len(rate_list)))
+        blob.append(key)
+        offset += len(key)
+        for rate in rate_list:
+            sign, digits, exponent = rate.rate.as_tuple()
+            mantissa = int(''.join(str(d) for d in digits))
+            if rate.detail is None:
+                detail_offset, detail_len = 0, _NO_DETAIL
+            else:
+                detail = rate.detail.encode('utf-8')
+                detail_offset, detail_len = offset, len(detail)
+                blob.append(detail)
+                offset += len(detail)
+            records.append(_record.pack(rate.application_date.toordinal(),
+                                        mantissa, exponent,
+                                        detail_offset, detail_len))
+
+    return b''.join([_header.pack(MAGIC, len(keys), len(records))]
+                    + keys + records + blob)
+
+def _read_generation(path):
+    try:
+        with open(path, 'rb') as f:
+            magic, generation, superseded \
+              = _control.unpack(f.read(_control.size))
+    except (IOError, OSError, struct.error):
+        return 0
+    if magic != CONTROL_MAGIC:
+        raise ValueError('%s is not a shared rate control file' % path)
+    return generation
+
+def publish(cache, path, keep=2):
+    """Publish the rates in ``cache`` at ``path``, returning the new
+    generation number.  Data files more than ``keep`` generations old are
+    removed (readers that still have them mapped are unaffected, except on
+    Windows, where removal is simply skipped).
+
+    Only one process should publish to a given path."""
+    generation = _read_generation(path) + 1
+    write_atomically('%s.%d' % (path, generation), encode(cache))
+
+    try:
+        old = open(path, 'r+b')
+    except (IOError, OSError):
+        old = None
+    try:
+        if old is not None and os.name == 'nt':
+            # Windows won't replace a file that readers have mapped, so
+            # update the counter in place
+            old.seek(len(CONTROL_MAGIC))
+            old.write(_generation.pack(generation))
+        else:
+            write_atomically(path, _control.pack(CONTROL_MAGIC, generation, 0))
+            if old is not None:
+                # Tell readers still mapping the old file to reopen it; a
+                # single byte can't be seen half written
+                old.seek(_SUPERSEDED_AT)
+                old.write(b'\x01')
+    finally:
+        if old is not None:
+            old.close()
+
+    directory, name = os.path.split(os.path.abspath(path))
+    for entry in os.listdir(directory):
+        suffix = entry[len(name) + 1:]
+        if entry.startswith(name + '.') and suffix.isdigit() \
+          and int(suffix) <= generation - keep:
+            try:
+                os.remove(os.path.join(directory, entry))
+            except OSError:
+                pass
+    return generation
+
+class _Data(object):
+    """A mapped data file."""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.key_count, self.record_count \
+          = _header.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError('%s is not a shared rate file' % path)
+        self.keys_at = _header.size
+        self.records_at = self.keys_at + self.key_count * _key.size
+        # Remembers where each key we've looked up is, not its contents
+        self._found = {}
+
+    def close(self):
+        self.map.close()
+
+    def _key(self, n):
+        off, klen, first, count = _key.unpack_from(self.map,
+                                                   self.keys_at
+                                                   + n * _key.size)
+        return self.map[off:off + klen], first, count
+
+    def find(self, key):
+        try:
+            return self._found[key]
+        except KeyError:
+            pass
+        result = self._find(key)
+        self._found[key] = result
+        return result
+
+    def _find(self, key):
+        lo = 0
+        hi = self.key_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.key_count:
+            k, first, count = self._key(lo)
+            if k == key:
+                return first, count
+        return None
+
+    def record(self, n):
+        ordinal, mantissa, exponent, doff, dlen \
+          = _record.unpack_from(self.map, self.records_at + n * _record.size)
+        if dlen == _NO_DETAIL:
+            detail = None
+        else:
+            detail = self.map[doff:doff + dlen].decode('utf-8')
+        return ordinal, mantissa, exponent, detail
+
+    def member_states(self):
+        result = set()
+        for n in range(self.key_count):
+            result.add(self._key(n)[0].split(b'\x1f', 1)[0].decode('utf-8'))
+        return frozenset(result)
+
+class SharedRates(object):
+    """Read-only access to the rates published at ``path``."""
+    def __init__(self, path):
+        self.path = path
+        self._control = None
+        self.generation = None
+        self._data = None
+        self._open_control()
+        self._check()
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        self._control.close()
+
+    def _open_control(self):
+        with open(self.path, 'rb') as f:
+            control = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if control[:len(CONTROL_MAGIC)] != CONTROL_MAGIC:
+            control.close()
+            raise ValueError('%s is not a shared rate control file'
+                             % self.path)
+        if self._control is not None:
+            self._control.close()
+        self._control = control
+
+    def _read_generation(self):
+        if self._control[_SUPERSEDED_AT:_SUPERSEDED_AT + 1] != b'\x00':
+            self._open_control()
+        return _generation.unpack_from(self._control, len(CONTROL_MAGIC))[0]
+
+    def _check(self):
+        generation = self._read_generation()
+        while generation != self.generation:
+            try:
+                data = _Data('%s.%d' % (self.path, generation))
+            except (IOError, OSError) as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                # The publisher may have moved on and removed the file since
+                # we read the generation; if so, use the latest one instead
+                latest = self._read_generation()
+                if latest == generation:
+                    raise
+                generation = latest
+                continue
+            old = self._data
+            self._data = data
+            self.generation = generation
+            if old is not None:
+                old.close()
+        return self._data
+
+    def _records(self, member_state, kind, region):
+        data = self._check()
+        found = data.find(_key_bytes(member_state, region, kind))
+        if found is None:
+            return data, ()
+        first, count = found
+        return data, range(first, first + count)
+
+    def get(self, member_state, kind=vrws.STANDARD, region=None, detail=None,
+            date=None):
+        """Return the rate (as a fraction, e.g. ``Decimal('0.2')``) of the
+        given type or category and detail that applies in ``member_state``
+        on ``date`` (by default, today), or None."""
+        if date is None:
+            date = datetime.date.today()
+        ordinal = date.toordinal()
+        data, records = self._records(member_state, kind, region)
+        best = None
+        for n in records:
+            r_ordinal, mantissa, exponent, r_detail = data.record(n)
+            if r_detail != detail or r_ordinal > ordinal:
+                continue
+            if best is None or r_ordinal > best[0]:
+                best = (r_ordinal, mantissa, exponent)
+        if best is None:
+            return None
+        return D(best[1]).scaleb(best[2] - 2)
+
+    def rates(self, member_state, kind=vrws.STANDARD, region=None):
+        """Return a list of :py:class:`vat.Rate` objects for the given type
+        or category, as :py:meth:`vat.RateCache.standard_rates` would."""
+        data, records = self._records(member_state, kind, region)
+        result = []
+        for n in records:
+            ordinal, mantissa, exponent, detail = data.record(n)
+            result.append(vrws.Rate(D(mantissa).scaleb(exponent),
+                                    datetime.date.fromordinal(ordinal),
+                                    detail))
+        return result
+
+    def member_states(self):
+        """Return the set of member state codes published."""
+        return self._check().member_states()
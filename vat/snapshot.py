@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""A snapshot of every member state's VAT rates, shipped with the package so
+that :py:class:`vat.RateCache` has something to fall back on when neither
+VRWS nor the TIC website can be reached.
+
+To regenerate the bundled snapshot from VRWS, run
+
+  python -m vat.snapshot
+
+or, to apply only the changes made since the snapshot was taken,
+
+  python -m vat.snapshot --changes
+"""
+from __future__ import unicode_literals, print_function
+
+import argparse
+import datetime
+import io
+import json
+import os
+import sys
+import threading
+
+import six
+
+from . import vrws
+from ._fileutil import write_atomically
+from .ratestore import _encode_rates, _decode_rates
+
+FORMAT = 1
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'resources', 'rates-snapshot.json')
+
+class Snapshot (object):
+    """A set of rates for every member state, as of ``date``."""
+    def __init__(self, date, rates):
+        self.date = date
+        self.rates = rates
+
+    def get(self, member_state):
+        """Return the Rates for ``member_state``, or None."""
+        return self.rates.get(member_state, None)
+
+    def age(self, today=None):
+        """Return the age of the snapshot as a timedelta."""
+        if today is None:
+            today = datetime.date.today()
+        return today - self.date
+
+    def to_json(self):
+        return {
+            'format': FORMAT,
+            'date': self.date.isoformat(),
+            'rates': dict((ms, _encode_rates(r))
+                          for ms, r in six.iteritems(self.rates)),
+            }
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get('format', None) != FORMAT:
+            raise ValueError('unsupported rate snapshot format %r'
+                             % data.get('format', None))
+        return cls(vrws._parse_date(data['date']),
+                   dict((ms, _decode_rates(r))
+                        for ms, r in six.iteritems(data['rates'])))
+
+def load(path=DEFAULT_PATH):
+    """Read a snapshot file."""
+    with io.open(path, 'r', encoding='utf-8') as f:
+        return Snapshot.from_json(json.load(f))
+
+def save(snapshot, path=DEFAULT_PATH):
+    """Write a snapshot file (replacing any existing file atomically)."""
+    data = snapshot.to_json()
+    def dumps(obj):
+        return six.text_type(json.dumps(obj, sort_keys=True,
+                                        separators=(',', ':')))
+    # One member state per line, so that changes are easy to review
+    lines = ['{"date":%s,"format":%d,"rates":{'
+             % (dumps(data['date']), data['format'])]
+    lines.append(',\n'.join('%s:%s' % (dumps(ms), dumps(r))
+                            for ms, r in sorted(data['rates'].items())))
+    lines.append('}}')
+    write_atomically(path, ('\n'.join(lines) + '\n').encode('utf-8'))
+
+_default = None
+_default_lock = threading.Lock()
+
+def default():
+    """Return the snapshot bundled with the package, loading it on first
+    use."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = load()
+    return _default
+
+def generate(date=None, member_states=None):
+    """Fetch the rates for every member state from VRWS and return them as
+    a :py:class:`Snapshot`."""
+    if date is None:
+        date = datetime.date.today()
+    if member_states is None:
+        from .memberstate import member_states
+    rates = {}
+    for ms in member_states:
+        if not isinstance(ms, six.string_types):
+            ms = ms.code
+        rates[ms] = vrws.get_rates(ms, date=date)
+    return Snapshot(date, rates)
+
+def apply_changes(snapshot, date=None):
+    """Return a new :py:class:`Snapshot` with the changes reported by VRWS
+    since ``snapshot`` was taken applied to it."""
+    from .rates import _merge_rates
+    if date is None:
+        date = datetime.date.today()
+    changes = vrws.get_changes(from_date=snapshot.date, to_date=date,
+                               by_member_state=True)
+    rates = dict(snapshot.rates)
+    for ms, ms_changes in six.iteritems(changes):
+        old = rates.get(ms, None)
+        if old is None:
+            old = vrws.Rates({}, {}, {})
+        rates[ms] = _merge_rates(old, ms_changes)
+    return Snapshot(date, rates)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Regenerate the bundled VAT rate snapshot.')
+    parser.add_argument('-o', '--output', default=DEFAULT_PATH,
+                        help='the snapshot file to write')
+    parser.add_argument('--changes', action='store_true',
+                        help='apply the changes since the existing snapshot '
+                        'rather than fetching every member state')
+    args = parser.parse_args(argv)
+
+    if args.changes:
+        snapshot = apply_changes(load(args.output))
+    else:
+        snapshot = generate()
+    save(snapshot, args.output)
+    print('Wrote rates for %d member states as of %s to %s'
+          % (len(snapshot.rates), snapshot.date, args.output))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -101,6 +101,6 @@ def get_rates(country, date=None):
         raise TICException("didn't understand rate %s" % std_rate)
 
     rate = Rate(D(m.group(1)), date)
-    rates = Rates({ 'Standard': rate }, {}, {})
+    rates = Rates({ 'Standard': [rate] }, {}, {})
 
     return rates
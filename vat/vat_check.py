@@ -76,7 +76,8 @@ def check_details(vat_number, vat_info={}, requester=None,
                 user_address.append(info)
         user_address = ' '.join(user_address)
 
-        score = addresscmp.compare(vies_address, user_address)
+        score = addresscmp.compare(vies_address, user_address,
+                                   vat_number[:2])
         if score >= address_threshold:
             return (True, response)
 
@@ -87,7 +88,8 @@ def check_details(vat_number, vat_info={}, requester=None,
                 user_address.append(info)
         user_address = ' '.join(user_address)
 
-        score = addresscmp.compare(vies_address, user_address)
+        score = addresscmp.compare(vies_address, user_address,
+                                   vat_number[:2])
         if score >= address_threshold:
             return (True, response)
         
@@ -8,6 +8,11 @@ import time
 import datetime
 import six
 from six.moves import http_client
+try:
+    from types import MappingProxyType as _ReadOnlyDict
+except ImportError:
+    # Python 2 has no read-only view of a dictionary
+    _ReadOnlyDict = dict
 from lxml import etree
 
 # Standard Rate types
@@ -85,17 +90,60 @@ class VRWSHTTPException(VRWSException):
     def __str__(self):
         return str(self.__unicode__())
 
+# Category, region and detail strings repeat across thousands of rates once
+# history is kept, so we share a single copy of each
+_strings = {}
+
+def _intern(s):
+    if s is None:
+        return None
+    return _strings.setdefault(s, s)
+
+def _set(obj, name, value):
+    object.__setattr__(obj, name, value)
+
+def _freeze(rate_dict):
+    return _ReadOnlyDict(dict((_intern(k), tuple(v))
+                              for k, v in six.iteritems(rate_dict)))
+
 class Rate(object):
-    """Represents an individual VAT rate."""
+    """Represents an individual VAT rate.  Rates are immutable, and compare
+    (and hash) by value."""
+    __slots__ = ('rate', 'application_date', 'detail')
+
     def __init__(self, rate, application_date, detail=None):
         # The VAT rate, as a decimal percentage
-        self.rate = rate
+        _set(self, 'rate', rate)
 
         # The date from which this rate applies
-        self.application_date = application_date
+        _set(self, 'application_date', application_date)
 
         # Detail, if any; this might indicate a special rate (for instance)
-        self.detail = detail
+        _set(self, 'detail', _intern(detail))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Rate objects are immutable')
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+        return (Rate, (self.rate, self.application_date, self.detail))
+
+    def __eq__(self, other):
+        if not isinstance(other, Rate):
+            return NotImplemented
+        return (self.rate == other.rate
+                and self.application_date == other.application_date
+                and self.detail == other.detail)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash((self.rate, self.application_date, self.detail))
 
     def __repr__(self):
         return 'Rate(%r, %r, %r)' % (self.rate, self.application_date,
@@ -110,18 +158,74 @@ class Rate(object):
 
     def __str__(self):
         return str(self.__unicode__())
-        
+
 class Rates(object):
+    """The rates for a member state (or region).  Rates objects are
+    immutable: the dictionaries they hold are read-only, and the rates in
+    them are tuples.  They compare (and hash) by value."""
+    __slots__ = ('types', 'categories', 'regions', '_hash')
+
     def __init__(self, types, categories, regions):
         # A dictionary indexed by rate type
-        self.types = types
+        _set(self, 'types', _freeze(types))
 
         # A dictionary that contains rates organised by category
-        self.categories = categories
+        _set(self, 'categories', _freeze(categories))
 
         # A dictionary that contains any regional rates that may apply
-        self.regions = regions
-    
+        if regions is not None:
+            regions = _ReadOnlyDict(dict((_intern(k), v)
+                                         for k, v in six.iteritems(regions)))
+        _set(self, 'regions', regions)
+
+        _set(self, '_hash', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Rates objects are immutable')
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+        regions = self.regions
+        if regions is not None:
+            regions = dict(regions)
+        return (Rates, (dict(self.types), dict(self.categories), regions))
+
+    def __eq__(self, other):
+        if not isinstance(other, Rates):
+            return NotImplemented
+        if self is other:
+            return True
+        return (hash(self) == hash(other)
+                and self.types == other.types
+                and self.categories == other.categories
+                and self.regions == other.regions)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        result = self._hash
+        if result is None:
+            regions = self.regions
+            if regions is not None:
+                regions = frozenset(six.iteritems(regions))
+            result = hash((frozenset(six.iteritems(self.types)),
+                           frozenset(six.iteritems(self.categories)),
+                           regions))
+            _set(self, '_hash', result)
+        return result
+
+    def __repr__(self):
+        regions = self.regions
+        if regions is not None:
+            regions = dict(regions)
+        return 'Rates(%r, %r, %r)' % (dict(self.types), dict(self.categories),
+                                      regions)
+
 SOAP_NS = '{http://schemas.xmlsoap.org/soap/envelope/}'
 VRWS_NS = '{urn:ec.europa.eu:taxud:tic:services:VatRateWebService:types}'
 VRWS_NSM = '{urn:ec.europa.eu:taxud:tic:services:VatRateWebService}'
@@ -180,58 +284,142 @@ def send_message(message):
 
     return response
 
-def parse_response(response, kind):
-    tree = etree.parse(response)
-    root = tree.getroot()
+def _new_rates():
+    """Return the (types, categories, regions) dictionaries that _add_rate()
+    fills in and _make_rates() turns into a Rates object."""
+    return ({}, {}, {})
+
+def _add_rate(parts, robj, rtype, rcat, rrgn):
+    types, categories, regions = parts
+    if rrgn:
+        rgn = regions.get(rrgn, None)
+        if rgn is None:
+            rgn = regions[rrgn] = ({}, {}, None)
+        types, categories = rgn[:2]
+    if rcat:
+        categories.setdefault(rcat, []).append(robj)
+    else:
+        types.setdefault(rtype, []).append(robj)
+
+def _make_rates(parts):
+    types, categories, regions = parts
+    if regions is not None:
+        regions = dict((name, _make_rates(rgn))
+                       for name, rgn in six.iteritems(regions))
+    return Rates(types, categories, regions)
+
+# Precompiled tag names for the streaming parser
+_ENVELOPE_TAG = SOAP_NS + 'envelope'
+_BODY_TAG = SOAP_NS + 'Body'
+_RATE_TAG = VRWS_NS + 'rate'
+_TYPE_TAG = VRWS_NS + 'type'
+_VALUE_TAG = VRWS_NS + 'value'
+_DATE_TAG = VRWS_NS + 'applicationDate'
+_REGION_TAG = VRWS_NS + 'region'
+_CATEGORY_TAG = VRWS_NS + 'category'
+_DETAIL_TAG = VRWS_NS + 'detail'
+_MEMBER_STATE_TAG = VRWS_NS + 'memberState'
+
+def _parse_date(text):
+    m = _date_re.match(text)
+    return datetime.date(int(m.group(1)),
+                         int(m.group(2)),
+                         int(m.group(3)))
+
+def _in_body(elem):
+    body = elem.getparent()
+    if body is None or body.tag != _BODY_TAG:
+        return False
+    envelope = body.getparent()
+    return (envelope is not None and envelope.getparent() is None
+            and envelope.tag.lower() == _ENVELOPE_TAG)
+
+def parse_response(response, kind, by_member_state=False):
+    """Parse a SOAP response of the given kind.  Returns a Rates object or,
+    if by_member_state is true, a dictionary mapping member state codes to
+    Rates objects.
+
+    The response is parsed incrementally, and each rate element is discarded
+    once it has been read, so memory use does not grow with the size of the
+    response."""
+    kind_tag = VRWS_NSM + kind
+    context = etree.iterparse(response, events=('start', 'end'),
+                              tag=(kind_tag, _RATE_TAG))
+
+    result = _new_rates()
+    by_ms = {}
+    resp = None
+    inside = False
+    # Responses repeat the same few dates and values many times over
+    dates = {}
+    values = {}
+
+    for event, elem in context:
+        if elem.tag == kind_tag:
+            # Only the first response element directly inside the envelope's
+            # body counts, as with find('./Body/' + kind) on the whole tree
+            if event == 'start':
+                if resp is None and _in_body(elem):
+                    resp = elem
+                    inside = True
+            elif elem is resp:
+                inside = False
+            continue
+        if event == 'start' or not inside:
+            continue
+
+        rtype = rvalue = rdate = rrgn = rcat = rdetail = rms = None
+        for child in elem:
+            tag = child.tag
+            if tag == _TYPE_TAG:
+                rtype = child.text
+            elif tag == _VALUE_TAG:
+                text = child.text
+                rvalue = values.get(text, None)
+                if rvalue is None:
+                    rvalue = values[text] = D(text)
+            elif tag == _DATE_TAG:
+                text = child.text
+                rdate = dates.get(text, None)
+                if rdate is None:
+                    rdate = dates[text] = _parse_date(text)
+            elif tag == _REGION_TAG:
+                rrgn = child.text
+            elif tag == _CATEGORY_TAG:
+                rcat = child.text
+            elif tag == _DETAIL_TAG:
+                rdetail = child.text
+            elif tag == _MEMBER_STATE_TAG:
+                rms = child.text
+
+        if rtype is None or rvalue is None or rdate is None:
+            raise ValueError('Incomplete rate in "%s"' % etree.tostring(elem))
 
-    if root.tag.lower() != SOAP_NS + 'envelope':
-        raise ValueError('Bad SOAP reply "%s"' % etree.tostring(tree))
+        robj = Rate(rvalue, rdate, rdetail)
 
-    resp = root.find('./' + SOAP_NS + 'Body/' + VRWS_NSM + kind)
+        if by_member_state:
+            if rms is None:
+                raise ValueError('Rate without a member state in "%s"'
+                                 % etree.tostring(elem))
+            result = by_ms.get(rms, None)
+            if result is None:
+                result = by_ms[rms] = _new_rates()
 
-    if resp is None:
-        raise ValueError('Bad SOAP reply "%s"' % etree.tostring(tree))
+        _add_rate(result, robj, rtype, rcat, rrgn)
 
-    types = {}
-    categories = {}
-    regions = {}
-    
-    for rate in resp.iter(VRWS_NS + 'rate'):
-        rtype = rate.find('./' + VRWS_NS + 'type').text
-        rvalue = D(rate.find('./' + VRWS_NS + 'value').text)
-        rdate = rate.find('./' + VRWS_NS + 'applicationDate').text
-        m = _date_re.match(rdate)
-        rdate = datetime.date(int(m.group(1)),
-                              int(m.group(2)),
-                              int(m.group(3)))
-        rrgn = rate.find('./' + VRWS_NS + 'region')
-        if rrgn is not None:
-            rrgn = rrgn.text
-        rcat = rate.find('./' + VRWS_NS + 'category')
-        if rcat is not None:
-            rcat = rcat.text
-        rdetail = rate.find('./' + VRWS_NS + 'detail')
-        if rdetail is not None:
-            rdetail = rdetail.text
-            
-        robj = Rate(rvalue, rdate, rdetail)
-            
-        if rrgn:
-            rgn = regions.get(rrgn, None)
-            if rgn is None:
-                rgn = Rates({}, {}, None)
-                regions[rrgn] = rgn
-            if rcat:
-                rgn.categories.setdefault(rcat, []).append(robj)
-            else:
-                rgn.types.setdefault(rtype, []).append(robj)
-        else:
-            if rcat:
-                categories.setdefault(rcat, []).append(robj)
-            else:
-                types.setdefault(rtype, []).append(robj)
+        # Drop the rate, and any earlier siblings, now that we're done
+        elem.clear()
+        parent = elem.getparent()
+        while elem.getprevious() is not None:
+            del parent[0]
+
+    if resp is None:
+        raise ValueError('Bad SOAP reply "%s"' % etree.tostring(context.root))
 
-    return Rates(types, categories, regions)    
+    if by_member_state:
+        return dict((ms, _make_rates(parts))
+                    for ms, parts in six.iteritems(by_ms))
+    return _make_rates(result)
 
 def get_rates(country, date=None,
               fetch_reduced=True, fetch_category=True, fetch_region=True):
@@ -269,8 +457,11 @@ def get_rates(country, date=None,
 
     return parse_response(send_message(message), 'ratesResponse')
 
-def get_changes(from_date=None, to_date=None, country=None):
-    """Retrieve a list of VAT rate changes starting from `from_date`."""
+def get_changes(from_date=None, to_date=None, country=None,
+                by_member_state=False):
+    """Retrieve a list of VAT rate changes starting from `from_date`.  If
+       `by_member_state` is true, returns a dictionary mapping member state
+       codes to Rates objects holding the changes for that member state."""
 
     if from_date is None:
         from_date = datetime.date.today()
@@ -298,5 +489,6 @@ def get_changes(from_date=None, to_date=None, country=None):
 </env:Envelope>'''.format(from_date=format_date(from_date),
                           extras=''.join(extras))
 
-    return parse_response(send_message(message), 'changesResponse')
+    return parse_response(send_message(message), 'changesResponse',
+                          by_member_state)
     